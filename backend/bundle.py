@@ -0,0 +1,227 @@
+import os
+import json
+import time
+import hashlib
+
+import faiss
+import numpy as np
+from catalog import Catalog, build_catalog, write_catalog, write_catalog_binary
+from lexical import LexicalIndex, build_lexical_index, write_lexical_index
+from filters import FilterIndex
+from rerank import LocalReranker
+from index_factory import search_knobs
+from spell import SpellIndex
+
+MANIFEST_NAME = "manifest.json"
+CURRENT_NAME = "CURRENT"
+BUNDLE_FILES = ["faiss_index.idx", "catalog.json", "lexical_index.json"]
+CATALOG_BIN = "catalog_bin"
+
+
+class BundleError(Exception):
+    pass
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def bundle_files(directory):
+    """Relative paths of every file a reader may load: the BUNDLE_FILES and the columnar catalog."""
+    names = list(BUNDLE_FILES)
+    catalog_bin = os.path.join(directory, CATALOG_BIN)
+    if os.path.isdir(catalog_bin):
+        names += [f"{CATALOG_BIN}/{name}" for name in sorted(os.listdir(catalog_bin))]
+    return names
+
+
+def write_manifest(directory, **fields):
+    """Write manifest.json for a staged bundle, hashing the files readers validate."""
+    manifest = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        **fields,
+        "files": {name: file_sha256(os.path.join(directory, name)) for name in bundle_files(directory)},
+    }
+    with open(os.path.join(directory, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def build_bundle(bundles_dir, index, metadata, products, build_key, **fields):
+    """Write `index` and everything derived from the `metadata` rows it was built from as a new bundle.
+
+    Files are staged in a hidden directory and renamed into place, so a reader
+    never sees a partial bundle; `build_key` (the content the build depends on)
+    goes into the version name. `fields` (embedding_model, index_type, ...)
+    are recorded in the manifest. Returns the version; CURRENT is not touched.
+    """
+    if index.ntotal != len(metadata):
+        raise BundleError(f"FAISS has {index.ntotal} rows but the metadata {len(metadata)}")
+    catalog = build_catalog(metadata, products)
+    os.makedirs(bundles_dir, exist_ok=True)
+    staging = os.path.join(bundles_dir, f".rebuild-{os.getpid()}")
+    os.makedirs(staging, exist_ok=True)
+    faiss.write_index(index, os.path.join(staging, "faiss_index.idx"))
+    with open(os.path.join(staging, "index_metadata.json"), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+    write_catalog(catalog, os.path.join(staging, "catalog.json"))
+    write_catalog_binary(catalog, os.path.join(staging, CATALOG_BIN))
+    write_lexical_index(build_lexical_index(Catalog(catalog)), os.path.join(staging, "lexical_index.json"))
+
+    fingerprint = hashlib.sha256(build_key.encode("utf-8")).hexdigest()[:8]
+    version = f"{time.strftime('%Y%m%d-%H%M%S')}-{fingerprint}"
+    write_manifest(staging, version=version, dim=int(index.d), doc_count=int(index.ntotal), **fields)
+    os.rename(staging, os.path.join(bundles_dir, version))
+    return version
+
+
+def read_current(bundles_dir):
+    try:
+        with open(os.path.join(bundles_dir, CURRENT_NAME), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def set_current(bundles_dir, version):
+    # Readers only ever see the old or the new pointer, never a partial write.
+    tmp = os.path.join(bundles_dir, f".{CURRENT_NAME}.{os.getpid()}")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+    os.replace(tmp, os.path.join(bundles_dir, CURRENT_NAME))
+
+
+def read_index(path):
+    if os.getenv("INDEX_MMAP", "1") != "1":
+        return faiss.read_index(path)
+    # IVF lists are mapped with IO_FLAG_MMAP; flat codes only on faiss builds with IO_FLAG_MMAP_IFC.
+    # Either way the index is never written after load, so --preload workers share its pages.
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+    return faiss.read_index(path, flags)
+
+
+class IndexBundle:
+    """Everything derived from one index build: FAISS index, catalog, lexical index and manifest."""
+
+    def __init__(self, directory, manifest, hybrid=True, docstore_path=None, products_path=None):
+        self.directory = directory
+        self.manifest = manifest
+        self.version = manifest["version"]
+        self.embedding_model = manifest["embedding_model"]
+        self.index_type = manifest.get("index_type", "flat")
+        self.search_knobs = search_knobs(manifest.get("index_params"))
+        self.embedding_cache = None  # attached by the recommender
+        self.query_embedder = None  # attached by the recommender when queries are embedded in-process
+
+        self.index = read_index(os.path.join(directory, "faiss_index.idx"))
+
+        catalog_bin = os.path.join(directory, CATALOG_BIN)
+        catalog_json = os.path.join(directory, "catalog.json")
+        # Bundles whose manifest predates the catalog_bin checksums serve the checked catalog.json.
+        hashed = manifest.get("files")
+        bin_checked = hashed is None or any(name.startswith(CATALOG_BIN + "/") for name in hashed)
+        if os.getenv("CATALOG_MMAP", "1") == "1" and os.path.isdir(catalog_bin) and bin_checked:
+            self.catalog = Catalog.load(catalog_bin)
+        elif os.path.exists(catalog_json):
+            self.catalog = Catalog.load(catalog_json)
+        elif docstore_path:
+            print("⚠️ catalog.json not found, parsing index_metadata.json instead.")
+            self.catalog = Catalog.from_docstore(docstore_path, products_path)
+        else:
+            raise BundleError(f"No catalog in bundle {self.version}")
+
+        self.lexical = None
+        if hybrid:
+            lexical_path = os.path.join(directory, "lexical_index.json")
+            if os.path.exists(lexical_path):
+                self.lexical = LexicalIndex.load(lexical_path)
+            else:
+                print("⚠️ lexical_index.json not found, building BM25 index from the catalog.")
+                self.lexical = LexicalIndex.from_catalog(self.catalog)
+
+        self.filter_index = FilterIndex(self.catalog)
+        self.local_reranker = LocalReranker(self.catalog)
+        self.speller = SpellIndex.from_catalog(self.catalog)
+
+    @classmethod
+    def open(cls, directory, hybrid=True):
+        manifest_path = os.path.join(directory, MANIFEST_NAME)
+        if not os.path.exists(manifest_path):
+            raise BundleError(f"{directory} has no {MANIFEST_NAME}")
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        for name, digest in manifest.get("files", {}).items():
+            path = os.path.join(directory, name)
+            if not os.path.exists(path) or file_sha256(path) != digest:
+                raise BundleError(f"{name} in bundle {manifest.get('version')} is missing or incomplete")
+        return cls(directory, manifest, hybrid)
+
+    @classmethod
+    def legacy(cls, data_dir, embedding_model, hybrid=True):
+        """The pre-bundle layout: loose files in data/, described by a synthesized manifest."""
+        manifest = {"version": "legacy", "embedding_model": embedding_model, "index_type": "flat"}
+        products_path = os.path.join(data_dir, "shl_product_details_full.json")
+        bundle = cls(
+            data_dir, manifest, hybrid,
+            docstore_path=os.path.join(data_dir, "index_metadata.json"),
+            products_path=products_path if os.path.exists(products_path) else None,
+        )
+        manifest.update(dim=bundle.index.d, doc_count=bundle.index.ntotal)
+        return bundle
+
+    def validate(self, embedding_model=None):
+        """Raise BundleError unless every part agrees with the manifest and with each other."""
+        expected_rows = self.manifest.get("doc_count", self.index.ntotal)
+        if self.index.ntotal != expected_rows:
+            raise BundleError(f"FAISS index has {self.index.ntotal} vectors, manifest says {expected_rows}")
+        if self.index.d != self.manifest.get("dim", self.index.d):
+            raise BundleError(f"FAISS index dimension {self.index.d} != manifest dim {self.manifest['dim']}")
+        if len(self.catalog) != self.index.ntotal:
+            raise BundleError(f"Catalog has {len(self.catalog)} rows but FAISS index has {self.index.ntotal} vectors.")
+        if self.lexical is not None and len(self.lexical) != len(self.catalog):
+            raise BundleError(f"Lexical index has {len(self.lexical)} rows but catalog has {len(self.catalog)}.")
+        if embedding_model and embedding_model != self.embedding_model:
+            raise BundleError(
+                f"Bundle {self.version} was embedded with {self.embedding_model}, queries use {embedding_model}"
+            )
+        if self.index.ntotal:
+            _, indices = self._probe_search()
+            if indices[0][0] < 0:
+                raise BundleError(f"Bundle {self.version} returned no results for a probe search")
+
+    def _probe_search(self):
+        """Search for a stored vector, which its own list always holds.
+
+        IVF indexes without a direct map cannot reconstruct; they are probed
+        across every list instead, since the nearest list to an arbitrary
+        vector may be empty.
+        """
+        try:
+            probe = self.index.reconstruct(0).reshape(1, -1)
+        except RuntimeError:
+            probe = np.zeros((1, self.index.d), dtype="float32")
+        try:
+            ivf = faiss.extract_index_ivf(self.index)
+        except RuntimeError:
+            return self.index.search(probe, 1)
+        nprobe = ivf.nprobe
+        ivf.nprobe = ivf.nlist
+        try:
+            return self.index.search(probe, 1)
+        finally:
+            ivf.nprobe = nprobe
+
+    def describe(self):
+        return {
+            "version": self.version,
+            "embedding_model": self.embedding_model,
+            "dim": self.index.d,
+            "doc_count": self.index.ntotal,
+            "index_type": self.index_type,
+            "search_knobs": self.search_knobs,
+            "created": self.manifest.get("created"),
+        }
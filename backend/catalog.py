@@ -0,0 +1,281 @@
+import os
+import re
+import json
+
+import numpy as np
+
+CATALOG_VERSION = 1
+CATEGORIES = ["pre_packaged_solutions", "individual_test_solutions"]
+
+_DURATION_RE = re.compile(r"Completion Time in minutes\s*=\s*(\d+)", re.IGNORECASE)
+_DESCRIPTION_RE = re.compile(r"Description:\s*(.*?)\s*Job Levels:", re.DOTALL)
+
+
+def parse_duration(text):
+    match = _DURATION_RE.search(text or "")
+    return int(match.group(1)) if match else 0
+
+
+def record_from_product(item):
+    return {
+        "url": item.get("link", ""),
+        "name": item.get("name", ""),
+        "description": (item.get("description") or "No description found.").strip().replace("\n", " "),
+        "duration": parse_duration(item.get("assessment_length", "")),
+        "adaptive": item.get("adaptive_irt", "") == "Yes",
+        "remote": item.get("remote_testing", "") == "Yes",
+        "test_types": list(item.get("test_types", [])),
+        "job_levels": item.get("job_levels", ""),
+        "languages": item.get("languages", ""),
+    }
+
+
+def record_from_document(doc):
+    # Fallback for docstores built without the structured product file:
+    # parse the flattened text blob once, at load time.
+    text = doc["text"]
+    text_lower = text.lower()
+    match = _DESCRIPTION_RE.search(text)
+    test_types = text.split("Test Types:")[-1].split("Link:")[0] if "Test Types:" in text else ""
+    return {
+        "url": doc.get("source", ""),
+        "name": doc.get("name", ""),
+        "description": match.group(1).strip().replace("\n", " ") if match else "No description found.",
+        "duration": parse_duration(text),
+        "adaptive": "adaptive/irt: yes" in text_lower,
+        "remote": "remote testing: yes" in text_lower,
+        "test_types": [t.strip() for t in test_types.split(",") if t.strip()],
+        "job_levels": "",
+        "languages": "",
+    }
+
+
+def format_downloads(download_list):
+    if not download_list:
+        return "None"
+    return "\n".join(
+        f"- {item.get('title', '')}: {item.get('url', '')} ({item.get('language', '')})"
+        for item in download_list
+    )
+
+
+def product_document(item, doc_id):
+    """Docstore entry for a scraped product; the text is what gets embedded."""
+    lines = [
+        f"Name: {item.get('name', '')}",
+        f"Title: {item.get('title', '')}",
+        f"Description: {item.get('description', '')}",
+        f"Job Levels: {item.get('job_levels', '')}",
+        f"Languages: {item.get('languages', '')}",
+        f"Assessment Length: {item.get('assessment_length', '')}",
+        f"Remote Testing: {item.get('remote_testing', '')}",
+        f"Adaptive/IRT: {item.get('adaptive_irt', '')}",
+        f"Test Types: {', '.join(item.get('test_types', []))}",
+        f"Link: {item.get('link', '')}",
+        "Downloads:",
+        format_downloads(item.get("downloads", [])),
+    ]
+    # Same layout (and so the same content hashes) as the documents step0_rag.py always wrote.
+    text = "\n        ".join(lines).strip().replace("\n", " ")
+    return {
+        "id": doc_id,
+        "text": text,
+        "source": item.get("link", ""),
+        "name": item.get("name", ""),
+    }
+
+
+def iter_products(raw_data):
+    for category in CATEGORIES:
+        for item in raw_data.get(category, []):
+            yield item
+
+
+def build_catalog(documents, products=None):
+    """Build the columnar catalog for `documents`, row i matching FAISS row i.
+
+    Structured fields come from `products` (shl_product_details_full.json) when
+    a product with the same link exists, otherwise from the document text.
+    """
+    by_link = {item.get("link"): item for item in iter_products(products or {})}
+    records = []
+    for doc in documents:
+        product = by_link.get(doc.get("source"))
+        records.append(record_from_product(product) if product else record_from_document(doc))
+
+    labels = sorted({t for r in records for t in r["test_types"]})
+    label_ids = {label: i for i, label in enumerate(labels)}
+    return {
+        "version": CATALOG_VERSION,
+        "size": len(records),
+        "test_type_labels": labels,
+        "columns": {
+            "url": [r["url"] for r in records],
+            "name": [r["name"] for r in records],
+            "description": [r["description"] for r in records],
+            "duration": [r["duration"] for r in records],
+            "adaptive": [int(r["adaptive"]) for r in records],
+            "remote": [int(r["remote"]) for r in records],
+            "test_types": [[label_ids[t] for t in r["test_types"]] for r in records],
+            "job_levels": [r["job_levels"] for r in records],
+            "languages": [r["languages"] for r in records],
+        },
+    }
+
+
+def write_catalog(catalog, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(catalog, f, ensure_ascii=False, separators=(",", ":"))
+
+
+_STRING_COLUMNS = ["url", "name", "description", "job_levels", "languages"]
+
+
+def test_type_bits(test_types):
+    """One uint32 per row with bit t set when the row has label id t."""
+    bits = np.zeros(len(test_types), dtype="uint32")
+    for row, types in enumerate(test_types):
+        for t in types:
+            bits[row] |= np.uint32(1 << t)
+    return bits
+
+
+def write_catalog_binary(catalog, directory):
+    """Write `catalog` as flat .npy columns that Catalog.load can memory-map.
+
+    Strings are one UTF-8 blob plus offsets per column, test types are ragged
+    label ids plus a uint32 bitmask per row for filtering, so workers share the
+    page cache instead of each holding its own Python objects.
+    """
+    os.makedirs(directory, exist_ok=True)
+    columns = catalog["columns"]
+    for name in _STRING_COLUMNS:
+        encoded = [value.encode("utf-8") for value in columns[name]]
+        offsets = np.zeros(len(encoded) + 1, dtype="int64")
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+        np.save(os.path.join(directory, f"{name}.offsets.npy"), offsets)
+        np.save(os.path.join(directory, f"{name}.blob.npy"), np.frombuffer(b"".join(encoded), dtype="uint8"))
+    np.save(os.path.join(directory, "duration.npy"), np.asarray(columns["duration"], dtype="int32"))
+    np.save(os.path.join(directory, "adaptive.npy"), np.asarray(columns["adaptive"], dtype="uint8"))
+    np.save(os.path.join(directory, "remote.npy"), np.asarray(columns["remote"], dtype="uint8"))
+    test_types = columns["test_types"]
+    offsets = np.zeros(len(test_types) + 1, dtype="int64")
+    offsets[1:] = np.cumsum([len(types) for types in test_types])
+    np.save(os.path.join(directory, "test_types.offsets.npy"), offsets)
+    np.save(os.path.join(directory, "test_types.values.npy"), np.asarray([t for types in test_types for t in types], dtype="uint8"))
+    np.save(os.path.join(directory, "test_type_bits.npy"), test_type_bits(test_types))
+    with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "version": catalog["version"],
+            "size": catalog["size"],
+            "test_type_labels": catalog["test_type_labels"],
+        }, f, ensure_ascii=False)
+
+
+class StringColumn:
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+class RaggedColumn:
+    def __init__(self, values, offsets):
+        self.values = values
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.values[self.offsets[i]:self.offsets[i + 1]].tolist()
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+class Catalog:
+    """Pre-parsed assessment fields stored column-wise and addressed by FAISS row id."""
+
+    def __init__(self, catalog):
+        columns = catalog["columns"]
+        self.size = catalog["size"]
+        self.test_type_labels = catalog["test_type_labels"]
+        # The API has always returned test types lower-cased (the original parser read lower-cased text).
+        self.response_test_types = [label.lower() for label in self.test_type_labels]
+        self.url = columns["url"]
+        self.name = columns["name"]
+        self.description = columns["description"]
+        self.duration = columns["duration"]
+        self.adaptive = columns["adaptive"]
+        self.remote = columns["remote"]
+        self.test_types = columns["test_types"]
+        self.job_levels = columns["job_levels"]
+        self.languages = columns["languages"]
+        self.test_type_bits = catalog.get("test_type_bits")
+        if self.test_type_bits is None:
+            self.test_type_bits = test_type_bits(self.test_types)
+
+    @classmethod
+    def load(cls, path):
+        """Load catalog.json, or memory-map a directory written by write_catalog_binary."""
+        if os.path.isdir(path):
+            return cls.load_binary(path)
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @classmethod
+    def load_binary(cls, directory):
+        def column(name):
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        labels = meta["test_type_labels"]
+        columns = {
+            name: StringColumn(column(f"{name}.blob"), column(f"{name}.offsets"))
+            for name in _STRING_COLUMNS
+        }
+        columns.update({
+            "duration": column("duration"),
+            "adaptive": column("adaptive"),
+            "remote": column("remote"),
+            "test_types": RaggedColumn(column("test_types.values"), column("test_types.offsets")),
+        })
+        return cls({
+            "size": meta["size"],
+            "test_type_labels": labels,
+            "columns": columns,
+            "test_type_bits": column("test_type_bits"),
+        })
+
+    @classmethod
+    def from_docstore(cls, docstore_path, products_path=None):
+        with open(docstore_path, "r", encoding="utf-8") as f:
+            documents = json.load(f)
+        products = None
+        if products_path:
+            with open(products_path, "r", encoding="utf-8") as f:
+                products = json.load(f)
+        return cls(build_catalog(documents, products))
+
+    def __len__(self):
+        return self.size
+
+    def record(self, i):
+        return {
+            "url": self.url[i],
+            "adaptive_support": "Yes" if self.adaptive[i] else "No",
+            "description": self.description[i],
+            "duration": int(self.duration[i]),
+            "remote_support": "Yes" if self.remote[i] else "No",
+            "test_type": [self.response_test_types[t] for t in self.test_types[i]],
+        }
@@ -0,0 +1,127 @@
+import re
+from collections import deque
+
+from rerank import estimate_tokens, truncate
+
+# Fields of a docstore text blob, in the order step0_rag writes them.
+DOC_FIELDS = (
+    "Name", "Title", "Description", "Job Levels", "Languages", "Assessment Length",
+    "Remote Testing", "Adaptive/IRT", "Test Types", "Link", "Downloads",
+)
+_FIELD_RE = re.compile(r"(?:^|\s+)(" + "|".join(re.escape(f) for f in DOC_FIELDS) + r"):\s*")
+
+# Fields sent only when the question mentions one of their hints; Name, Description
+# and Test Types are always sent.
+FIELD_HINTS = {
+    "Job Levels": ("level", "graduate", "entry", "junior", "senior", "manager", "executive", "director", "supervisor"),
+    "Languages": ("language", "english", "spanish", "french", "german", "chinese", "portuguese", "dutch", "italian"),
+    "Assessment Length": ("long", "length", "minute", "duration", "time", "hour", "quick", "short"),
+    "Remote Testing": ("remote", "online", "home", "proctor"),
+    "Adaptive/IRT": ("adaptive", "irt"),
+    "Link": ("link", "url", "website", "where"),
+    "Downloads": ("download", "flyer", "fact sheet", "pdf", "brochure", "document"),
+}
+ALWAYS_FIELDS = ("Name", "Description", "Test Types")
+
+
+def document_fields(text):
+    """{field: value} of a flattened docstore text."""
+    parts = _FIELD_RE.split(text or "")
+    return {parts[i]: parts[i + 1].strip() for i in range(1, len(parts) - 1, 2)}
+
+
+class ContextTrimmer:
+    """Renders retrieved documents with only the fields a question needs, within a token budget each."""
+
+    def __init__(self, max_tokens_per_doc=200):
+        self.max_tokens_per_doc = max_tokens_per_doc
+        self._fields = {}  # doc id -> parsed fields; the docstore never changes while chatting
+
+    def fields(self, doc):
+        key = doc.get("id", doc.get("name"))
+        if key not in self._fields:
+            self._fields[key] = document_fields(doc["text"])
+        return self._fields[key]
+
+    def render(self, doc, query):
+        fields = self.fields(doc)
+        query_lower = query.lower()
+        wanted = [f for f in DOC_FIELDS if f in ALWAYS_FIELDS or any(h in query_lower for h in FIELD_HINTS.get(f, ()))]
+        lines = [f"{f}: {fields[f]}" for f in wanted if fields.get(f) and f != "Description"]
+        room = self.max_tokens_per_doc * 4 - sum(len(line) + 1 for line in lines)
+        if fields.get("Description") and room > 40:
+            lines.insert(1, f"Description: {truncate(fields['Description'], room - 13)}")
+        return "\n".join(lines)
+
+    def context(self, docs, query):
+        return "\n\n".join(self.render(doc, query) for doc in docs)
+
+
+class ChatMemory:
+    """Conversation history for the prompt, kept under a hard token budget.
+
+    The last `window_turns` turns are kept verbatim (questions and answers cut
+    to `answer_tokens`); older turns are folded, one line each, into a rolling
+    summary that itself keeps only its newest lines within `summary_tokens`.
+    Every turn is rendered once when added and the history text is cached,
+    so a turn costs the same however long the session gets.
+
+    With max_tokens=0 nothing is dropped or cut (the old buffer behaviour).
+    """
+
+    def __init__(self, max_tokens=800, window_turns=4, answer_tokens=150, summary_tokens=200):
+        self.max_tokens = max_tokens
+        self.window_turns = window_turns
+        self.answer_tokens = answer_tokens
+        self.summary_tokens = min(summary_tokens, max_tokens // 2) if max_tokens else 0
+        self.turns = deque()    # (rendered text, tokens, user, bot)
+        self.summary = deque()  # (line, tokens)
+        self.turn_tokens = 0
+        self.summary_size = 0
+        self.total_turns = 0
+        self._rendered = ""
+
+    def add_turn(self, user, bot):
+        self.total_turns += 1
+        if self.max_tokens:
+            # Each side gets at most half of the turn budget, so one turn always fits.
+            chars = min(self.answer_tokens, (self.max_tokens - self.summary_tokens) // 2) * 4
+            user, bot = truncate(user, chars), truncate(bot, chars)
+        text = f"User: {user}\nBot: {bot}"
+        self.turns.append((text, estimate_tokens(text), user, bot))
+        self.turn_tokens += self.turns[-1][1]
+        if self.max_tokens:
+            self._evict()
+        self._rendered = None
+
+    def _evict(self):
+        budget = self.max_tokens - self.summary_tokens
+        while len(self.turns) > 1 and (len(self.turns) > self.window_turns or self.turn_tokens > budget):
+            _, tokens, user, bot = self.turns.popleft()
+            self.turn_tokens -= tokens
+            self._summarize(user, bot)
+
+    def _summarize(self, user, bot):
+        if not self.summary_tokens:
+            return
+        answer = re.split(r"(?<=[.!?])\s+|\n", bot.strip(), maxsplit=1)[0]
+        line = f"- Asked: {truncate(user, 120)} | Answered: {truncate(answer, 160)}"
+        self.summary.append((line, estimate_tokens(line)))
+        self.summary_size += self.summary[-1][1]
+        while len(self.summary) > 1 and self.summary_size > self.summary_tokens:
+            self.summary_size -= self.summary.popleft()[1]
+
+    def render(self):
+        if self._rendered is None:
+            parts = []
+            if self.summary:
+                parts.append("Earlier in this conversation:\n" + "\n".join(line for line, _ in self.summary))
+            parts += [text for text, *_ in self.turns]
+            self._rendered = "\n".join(parts)
+        return self._rendered
+
+    def tokens(self):
+        return self.summary_size + self.turn_tokens
+
+    def __len__(self):
+        return len(self.turns)
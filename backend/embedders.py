@@ -0,0 +1,110 @@
+import os
+import hashlib
+import importlib
+
+import numpy as np
+from lexical import tokenize
+
+
+class GeminiEmbedder:
+    def __init__(self, model="models/embedding-001", task_type="RETRIEVAL_DOCUMENT"):
+        import google.generativeai as genai
+
+        if not os.getenv("GOOGLE_API_KEY"):
+            raise ValueError("❌ GOOGLE_API_KEY is missing in your environment")
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        self._genai = genai
+        self.name = model
+        self.task_type = task_type
+
+    def embed(self, texts):
+        response = self._genai.embed_content(model=self.name, content=list(texts), task_type=self.task_type)
+        return np.asarray(response["embedding"], dtype="float32")
+
+
+class HashingEmbedder:
+    """Deterministic feature-hashing embedder; needs no network, for tests and offline builds."""
+
+    def __init__(self, dim=768):
+        self.name = f"hashing-{dim}"
+        self.dim = dim
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype="float32")
+        for i, text in enumerate(texts):
+            for token in tokenize(text):
+                h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+                vectors[i, h % self.dim] += 1.0 if h >> 63 else -1.0
+            norm = np.linalg.norm(vectors[i])
+            if norm:
+                vectors[i] /= norm
+        return vectors
+
+
+class LocalEmbedder:
+    """sentence-transformers model run on this machine's CPU (default BAAI/bge-small-en-v1.5).
+
+    `quantize` applies torch dynamic int8 quantization to the Linear layers;
+    `backend="onnx"` uses sentence-transformers' ONNX Runtime backend instead.
+    Neither changes `name`, so an index built in fp32 serves int8 queries.
+    """
+
+    PREFIX = "local:"
+
+    def __init__(self, model=None, quantize=None, backend=None, threads=None, batch_size=64):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        model = model or os.getenv("LOCAL_EMBED_MODEL", "BAAI/bge-small-en-v1.5")
+        backend = backend or os.getenv("LOCAL_EMBED_BACKEND", "torch")
+        quantize = os.getenv("LOCAL_EMBED_QUANTIZE", "0") == "1" if quantize is None else quantize
+        threads = threads or int(os.getenv("LOCAL_EMBED_THREADS", "0"))
+        if threads:
+            torch.set_num_threads(threads)
+
+        kwargs = {} if backend == "torch" else {"backend": backend}
+        self.model = SentenceTransformer(model, device="cpu", **kwargs)
+        if quantize and backend == "torch":
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model.eval()
+        self.name = self.PREFIX + model
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.quantized = bool(quantize and backend == "torch")
+        self.batch_size = batch_size
+        self._torch = torch
+
+    def embed(self, texts):
+        with self._torch.inference_mode():
+            vectors = self.model.encode(
+                list(texts), batch_size=self.batch_size, convert_to_numpy=True, normalize_embeddings=True
+            )
+        return np.asarray(vectors, dtype="float32")
+
+
+EMBEDDERS = {
+    "gemini": GeminiEmbedder,
+    "hash": HashingEmbedder,
+    "local": LocalEmbedder,
+}
+
+
+def get_embedder(spec, **kwargs):
+    """Embedder by short name ("gemini", "hash", "local") or "package.module:ClassName".
+
+    An embedder has a `name` (stored with its vectors) and `embed(texts) -> float32 matrix`.
+    """
+    if spec in EMBEDDERS:
+        return EMBEDDERS[spec](**kwargs)
+    module_name, _, class_name = spec.partition(":")
+    if not class_name:
+        raise ValueError(f"Unknown embedder {spec!r}, expected one of {sorted(EMBEDDERS)} or module:Class")
+    return getattr(importlib.import_module(module_name), class_name)(**kwargs)
+
+
+def embedder_for_model(name):
+    """In-process embedder that reproduces the vectors of an index built by `name`, or None for remote models."""
+    if name.startswith(LocalEmbedder.PREFIX):
+        return LocalEmbedder(name[len(LocalEmbedder.PREFIX):])
+    if name.startswith("hashing-") and name[len("hashing-"):].isdigit():
+        return HashingEmbedder(int(name[len("hashing-"):]))
+    return None
@@ -0,0 +1,262 @@
+import os
+import time
+import queue
+import atexit
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_query(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class LRUCache:
+    def __init__(self, capacity=1024, ttl=None):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if self.ttl and time.time() - stored_at > self.ttl:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value, stored_at=None):
+        with self._lock:
+            self._items[key] = (value, stored_at or time.time())
+            self._items.move_to_end(key)
+            while len(self._items) > self.capacity:
+                self._items.popitem(last=False)
+
+    def items(self):
+        """(key, value) pairs that have not expired, least recently used first."""
+        now = time.time()
+        with self._lock:
+            return [
+                (key, value) for key, (value, stored_at) in self._items.items()
+                if not (self.ttl and now - stored_at > self.ttl)
+            ]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class EmbeddingCache:
+    """Two-tier (memory LRU + optional SQLite) cache of query embeddings.
+
+    Entries are keyed on the normalized query text and the embedding model, and
+    the disk tier is wiped whenever it was written for a different model or
+    vector dimension. Only the memory tier is touched on the event loop: disk
+    reads go through `asyncio.to_thread`, and disk writes are queued for a
+    background writer thread (dropped and counted when the queue is full),
+    which also keeps the table to its newest `max_rows` rows.
+    """
+
+    def __init__(self, model: str, dim: int, capacity=2048, ttl=None, path=None,
+                 max_rows=100000, queue_size=10000):
+        self.model = model
+        self.dim = dim
+        self.ttl = ttl
+        self.memory = LRUCache(capacity, ttl)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.dropped_writes = 0
+        self.path = path
+        self.max_rows = max_rows
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_pid = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._writer = None
+        self._writer_pid = None
+        self._closed = False
+        if path:
+            atexit.register(self.close)
+
+    @property
+    def db(self):
+        # Opened lazily per process: a connection made before a gunicorn --preload
+        # fork must not be shared with the workers.
+        if self.path and self._db_pid != os.getpid():
+            self._db = self._open_disk_tier(self.path)
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _open_disk_tier(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, created REAL NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS embeddings_created ON embeddings (created)")
+        meta = dict(db.execute("SELECT key, value FROM meta").fetchall())
+        if meta.get("model") != self.model or meta.get("dim") != str(self.dim):
+            # Vectors from another model or index dimension are useless to us.
+            db.execute("DELETE FROM embeddings")
+            db.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [("model", self.model), ("dim", str(self.dim))],
+            )
+        if self.ttl:
+            db.execute("DELETE FROM embeddings WHERE created < ?", (time.time() - self.ttl,))
+        self._evict(db)
+        return db
+
+    def _key(self, query: str) -> str:
+        raw = f"{self.model}|{self.dim}|{normalize_query(query)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get_async(self, query: str):
+        return (await self.get_many_async([query]))[0]
+
+    async def get_many_async(self, queries):
+        """Vectors (or None) for `queries`: memory first, then one disk read off the loop for the rest."""
+        keys = [self._key(q) for q in queries]
+        vectors = [self.memory.get(key) for key in keys]
+        self.hits += sum(v is not None for v in vectors)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing and self.path:
+            found = await asyncio.to_thread(self._read, [keys[i] for i in missing])
+            for i in missing:
+                row = found.get(keys[i])
+                if row is not None:
+                    vector, created = row
+                    self.memory.set(keys[i], vector, stored_at=created)
+                    vectors[i] = vector
+                    self.hits += 1
+                    self.disk_hits += 1
+        self.misses += sum(v is None for v in vectors)
+        return vectors
+
+    def _read(self, keys):
+        marks = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self.db.execute(
+                f"SELECT key, vector, created FROM embeddings WHERE key IN ({marks})", keys
+            ).fetchall()
+        return {
+            key: (np.frombuffer(vector, dtype="float32"), created)
+            for key, vector, created in rows
+            if not (self.ttl and time.time() - created > self.ttl)
+        }
+
+    def set(self, query: str, vector):
+        vector = np.asarray(vector, dtype="float32")
+        if vector.shape != (self.dim,):
+            return
+        key = self._key(query)
+        now = time.time()
+        self.memory.set(key, vector, stored_at=now)
+        if self.path and not self._closed:
+            if self._writer_pid != os.getpid():
+                self._start_writer()
+            try:
+                self._queue.put_nowait((key, vector.tobytes(), now))
+            except queue.Full:
+                self.dropped_writes += 1
+
+    def flush(self, timeout=5.0):
+        """Block until queued disk writes are committed (or `timeout` passes)."""
+        if self._writer_pid != os.getpid():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        if self._closed:
+            return
+        self.flush(timeout)
+        self._closed = True
+        if self._writer_pid == os.getpid():
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                return
+            self._writer.join(timeout)
+
+    # === Disk writer thread ===
+    def _start_writer(self):
+        with self._lock:
+            if self._writer_pid == os.getpid():
+                return
+            # A writer started before a fork did not survive it, and neither did its queue.
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._writer = threading.Thread(target=self._write_loop, name="embedding-cache-writer", daemon=True)
+            self._writer_pid = os.getpid()
+            self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 500:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [item for item in batch if isinstance(item, tuple)]
+            if rows:
+                try:
+                    with self._lock:
+                        db = self.db
+                        db.execute("BEGIN")
+                        db.executemany(
+                            "INSERT OR REPLACE INTO embeddings (key, vector, created) VALUES (?, ?, ?)", rows
+                        )
+                        self._evict(db)
+                        db.execute("COMMIT")
+                except sqlite3.Error as e:
+                    print(f"⚠️ Could not write the embedding cache {self.path}: {e}")
+                    self.dropped_writes += len(rows)
+                    with self._lock:
+                        if self._db is not None and self._db.in_transaction:
+                            self._db.execute("ROLLBACK")
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if None in batch:
+                return
+
+    def _evict(self, db):
+        # Keep the newest `max_rows` rows; `created` is indexed, so this is a range delete.
+        if self.max_rows:
+            db.execute(
+                "DELETE FROM embeddings WHERE created <= "
+                "(SELECT created FROM embeddings ORDER BY created DESC LIMIT 1 OFFSET ?)",
+                (self.max_rows,),
+            )
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "size": len(self.memory),
+            "disk_tier": bool(self.path),
+            "dropped_writes": self.dropped_writes,
+        }
@@ -0,0 +1,184 @@
+import re
+
+import faiss
+import numpy as np
+
+# Query words that point at a test type label
+TEST_TYPE_HINTS = {
+    "personality": "Personality & Behavior",
+    "behavior": "Personality & Behavior",
+    "behaviour": "Personality & Behavior",
+    "cognitive": "Ability & Aptitude",
+    "aptitude": "Ability & Aptitude",
+    "reasoning": "Ability & Aptitude",
+    "numerical": "Ability & Aptitude",
+    "verbal": "Ability & Aptitude",
+    "skills": "Knowledge & Skills",
+    "knowledge": "Knowledge & Skills",
+    "technical": "Knowledge & Skills",
+    "simulation": "Simulations",
+    "situational": "Biodata & Situational Judgement",
+    "biodata": "Biodata & Situational Judgement",
+    "competencies": "Competencies",
+    "competency": "Competencies",
+    "360": "Development & 360",
+    "exercise": "Assessment Exercises",
+}
+
+# Catalogue letter codes, as in scraping/step1.py
+TEST_TYPE_CODES = {
+    "A": "Ability & Aptitude",
+    "B": "Biodata & Situational Judgement",
+    "C": "Competencies",
+    "D": "Development & 360",
+    "E": "Assessment Exercises",
+    "K": "Knowledge & Skills",
+    "P": "Personality & Behavior",
+    "S": "Simulations",
+}
+
+_UNIT = r"(?:minutes|minute|mins|min|hours|hour|hrs|hr)\b"
+_MAX_DURATION_RES = [
+    re.compile(rf"(?:under|below|less than|within|at most|max(?:imum)?|up to|no more than|<=?)\s*(\d+)\s*({_UNIT})"),
+    re.compile(rf"(\d+)\s*({_UNIT})\s*(?:or less|or under|max(?:imum)?)"),
+]
+# Only phrasing that states a requirement on the assessment becomes a hard filter;
+# a bare "remote" or "adaptive" usually describes the job ("remote-first company",
+# "adaptive team lead") and is only a soft preference.
+_REMOTE_RE = re.compile(r"\bremote(?:ly)?\b")
+_ADAPTIVE_RE = re.compile(r"\badaptive\b")
+_REMOTE_CONSTRAINT_RE = re.compile(
+    r"\bremote(?:ly)?[\s-]+(?:test(?:s|ing)?|assessments?|administ\w+|proctor\w+|deliver\w+)\b"
+    r"|\b(?:taken|completed?|done|administered|sat)\s+remotely\b"
+    r"|\bsupports?\s+remote\b"
+)
+_ADAPTIVE_CONSTRAINT_RE = re.compile(
+    r"\badaptive[\s-]+(?:tests?|testing|assessments?|versions?)\b|\birt\b|\bsupports?\s+adaptive\b"
+)
+_TYPED_TEST_RE = re.compile(
+    r"\b(" + "|".join(map(re.escape, TEST_TYPE_HINTS)) + r")\s+(?:tests?|assessments?|exercises?|questionnaires?)\b"
+)
+# "personality test" names what the user is after; only "only personality tests" rules the other types out.
+_ONLY_BEFORE_RE = re.compile(r"\b(?:only|just|exclusively|solely|strictly)\s+(?:[\w-]+\s+){0,3}$")
+_ONLY_AFTER_RE = re.compile(r"\s+only\b")
+
+
+def parse_max_duration(text):
+    text = text.lower()
+    for pattern in _MAX_DURATION_RES:
+        match = pattern.search(text)
+        if match:
+            minutes = int(match.group(1))
+            return minutes * 60 if match.group(2).startswith("h") else minutes
+    return None
+
+
+def parse_query_filters(text):
+    """Pull simple constraints out of free text ("max 40 minutes, remote, personality tests")."""
+    lowered = text.lower()
+    filters = {}
+    max_duration = parse_max_duration(lowered)
+    if max_duration:
+        filters["max_duration"] = max_duration
+    if _REMOTE_CONSTRAINT_RE.search(lowered):
+        filters["remote"] = True
+    if _ADAPTIVE_CONSTRAINT_RE.search(lowered):
+        filters["adaptive"] = True
+    test_types = sorted({TEST_TYPE_HINTS[m.group(1)] for m in _TYPED_TEST_RE.finditer(lowered) if _only(lowered, m)})
+    if test_types:
+        filters["test_types"] = test_types
+    return filters
+
+
+def _only(lowered, match):
+    # "only/just ... <type> tests" or "<type> tests only"
+    return bool(_ONLY_BEFORE_RE.search(lowered, 0, match.start()) or _ONLY_AFTER_RE.match(lowered, match.end()))
+
+
+def resolve_filters(query, filters=None, parse=True):
+    # Explicit request filters win over anything parsed from the text.
+    resolved = parse_query_filters(query) if parse else {}
+    resolved.update({k: v for k, v in (filters or {}).items() if v is not None})
+    return resolved
+
+
+def parse_query_hints(text):
+    """Soft preferences: features mentioned without being stated as a requirement."""
+    lowered = text.lower()
+    hints = {}
+    if _REMOTE_RE.search(lowered):
+        hints["remote"] = True
+    if _ADAPTIVE_RE.search(lowered):
+        hints["adaptive"] = True
+    test_types = sorted({TEST_TYPE_HINTS[m.group(1)] for m in _TYPED_TEST_RE.finditer(lowered)})
+    if test_types:
+        hints["test_types"] = test_types
+    return hints
+
+
+def resolve_hints(query, resolved, parse=True):
+    # A feature already filtered on needs no boost.
+    return {k: v for k, v in parse_query_hints(query).items() if k not in resolved} if parse else {}
+
+
+class FilterIndex:
+    """Column arrays over the catalog for building row masks without touching Python records."""
+
+    def __init__(self, catalog):
+        self.size = len(catalog)
+        self.duration = np.asarray(catalog.duration, dtype="int32")
+        self.remote = np.asarray(catalog.remote, dtype=bool)
+        self.adaptive = np.asarray(catalog.adaptive, dtype=bool)
+        self.labels = {label.lower(): bit for bit, label in enumerate(catalog.test_type_labels)}
+        self.test_type_bits = catalog.test_type_bits
+
+    def _type_mask_bits(self, test_types):
+        bits = 0
+        for name in test_types:
+            label = TEST_TYPE_CODES.get(name.strip().upper(), name).strip().lower()
+            if label not in self.labels:
+                raise ValueError(f"Unknown test type {name!r}")
+            bits |= 1 << self.labels[label]
+        return np.uint32(bits)
+
+    def preferred(self, hints):
+        """Boolean mask of rows matching every soft hint, or None when there are none."""
+        if not hints:
+            return None
+        mask = np.ones(self.size, dtype=bool)
+        if "remote" in hints:
+            mask &= self.remote == bool(hints["remote"])
+        if "adaptive" in hints:
+            mask &= self.adaptive == bool(hints["adaptive"])
+        if hints.get("test_types"):
+            mask &= (self.test_type_bits & self._type_mask_bits(hints["test_types"])) != 0
+        return mask
+
+    def mask(self, filters):
+        """Boolean row mask for `filters`, or None when nothing is filtered."""
+        if not filters:
+            return None
+        mask = np.ones(self.size, dtype=bool)
+        if filters.get("max_duration"):
+            # Items without a published duration can't be shown to meet a time limit.
+            mask &= (self.duration > 0) & (self.duration <= filters["max_duration"])
+        if filters.get("min_duration"):
+            mask &= self.duration >= filters["min_duration"]
+        if filters.get("remote") is not None:
+            mask &= self.remote == bool(filters["remote"])
+        if filters.get("adaptive") is not None:
+            mask &= self.adaptive == bool(filters["adaptive"])
+        if filters.get("test_types"):
+            mask &= (self.test_type_bits & self._type_mask_bits(filters["test_types"])) != 0
+        return mask
+
+
+def search_params(mask, params_cls=None):
+    """FAISS search parameters restricting the search to rows where `mask` is True."""
+    bitmap = np.packbits(mask, bitorder="little")
+    selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+    selector.referenced_objects = [bitmap]  # keep the buffer alive as long as the selector
+    params = (params_cls or faiss.SearchParameters)()
+    params.sel = selector
+    params.referenced_objects = [selector]
+    return params
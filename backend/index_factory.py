@@ -0,0 +1,86 @@
+import os
+import math
+
+import faiss
+import numpy as np
+from filters import search_params
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq", "sq8", "fp16")
+
+DEFAULT_EF_SEARCH = 64
+DEFAULT_NPROBE = 16
+
+
+def default_params(index_type, n, dim):
+    """Build parameters sized for `n` vectors; anything passed explicitly wins."""
+    if index_type == "hnsw":
+        return {"M": 32, "ef_construction": 80, "ef_search": DEFAULT_EF_SEARCH}
+    if index_type in ("ivf_flat", "ivf_pq"):
+        # ~4*sqrt(n) lists, but no more than k-means can train well (39 points per centroid).
+        nlist = max(1, min(int(4 * math.sqrt(n)), n // 39))
+        params = {"nlist": nlist, "nprobe": min(DEFAULT_NPROBE, nlist)}
+        if index_type == "ivf_pq":
+            m = next(m for m in (dim // 8, dim // 16, dim // 32, dim // 64, 1) if m and dim % m == 0)
+            # Each sub-quantizer is a k-means over n points with 2**nbits centroids: same 39-point rule.
+            params.update(m=m, nbits=max(1, min(8, int(math.log2(max(n // 39, 2))))))
+        return params
+    return {}
+
+
+def factory_string(index_type, params):
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "hnsw":
+        return f"HNSW{params['M']}"
+    if index_type == "ivf_flat":
+        return f"IVF{params['nlist']},Flat"
+    if index_type == "ivf_pq":
+        # "np": skip polysemous training, which is very slow and only helps Hamming pre-filtering.
+        return f"IVF{params['nlist']},PQ{params['m']}x{params['nbits']}np"
+    if index_type == "sq8":
+        return "SQ8"
+    if index_type == "fp16":
+        return "SQfp16"
+    raise ValueError(f"Unknown index type {index_type!r}, expected one of {INDEX_TYPES}")
+
+
+def build_index(vectors, index_type="flat", **overrides):
+    """Train and fill a FAISS index of `index_type`; returns (index, parameters used).
+
+    The parameters are what the manifest stores, so search-time knobs
+    (ef_search, nprobe) travel with the bundle.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    n, dim = vectors.shape
+    params = {**default_params(index_type, n, dim), **overrides}
+    index = faiss.index_factory(dim, factory_string(index_type, params), faiss.METRIC_L2)
+    if index_type == "hnsw":
+        index.hnsw.efConstruction = int(params["ef_construction"])
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index, params
+
+
+def search_knobs(index_params=None):
+    """efSearch/nprobe for a bundle: env overrides, then the build-time manifest values."""
+    index_params = index_params or {}
+    return {
+        "ef_search": int(os.getenv("HNSW_EF_SEARCH") or index_params.get("ef_search", DEFAULT_EF_SEARCH)),
+        "nprobe": int(os.getenv("IVF_NPROBE") or index_params.get("nprobe", DEFAULT_NPROBE)),
+    }
+
+
+def search_parameters(index, knobs, k, mask=None):
+    """SearchParameters for one search, carrying the knobs and an optional row mask, or None."""
+    if isinstance(index, faiss.IndexHNSW):
+        params = search_params(mask, faiss.SearchParametersHNSW) if mask is not None else faiss.SearchParametersHNSW()
+        params.efSearch = max(knobs["ef_search"], k)  # efSearch below k truncates the result list
+        return params
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        params = search_params(mask, faiss.SearchParametersIVF) if mask is not None else faiss.SearchParametersIVF()
+        params.nprobe = min(knobs["nprobe"], ivf.nlist)
+        return params
+    return search_params(mask) if mask is not None else None
+
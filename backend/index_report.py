@@ -0,0 +1,142 @@
+# 📁 index_report.py — recall@k, size and latency of the ANN index types on synthetic catalogs
+#
+#   python index_report.py --sizes 10000 100000
+#   python index_report.py --sizes 50000 --types hnsw --ef-search 16 32 64 128
+#   python index_report.py --sizes 50000 --types ivf_flat ivf_pq --nprobe 4 16 64 --filter 0.2
+#
+# Catalogs are scaled up from the real index: every synthetic vector is a
+# noisy copy of a real one, so the clusters look like the production data.
+# Recall is measured against exact (flat) search over the same vectors.
+
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from index_factory import INDEX_TYPES, build_index, search_knobs, search_parameters
+
+
+def load_seed_vectors(path):
+    index = faiss.read_index(path)
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def synthetic_vectors(seed, n, noise, rng):
+    base = seed[rng.integers(0, len(seed), n)]
+    scale = noise * seed.std(axis=0, keepdims=True)
+    return (base + rng.standard_normal(base.shape).astype("float32") * scale).astype("float32")
+
+
+def index_bytes(index):
+    with tempfile.NamedTemporaryFile(suffix=".idx") as f:
+        faiss.write_index(index, f.name)
+        return os.path.getsize(f.name)
+
+
+def recall_at_k(found, exact):
+    hits = [len(set(f[f >= 0]) & set(e[e >= 0])) / max(1, (e >= 0).sum()) for f, e in zip(found, exact)]
+    return float(np.mean(hits))
+
+
+def measure(index, knobs, queries, exact, k, mask):
+    params = search_parameters(index, knobs, k, mask)
+    started = time.perf_counter()
+    _, found = index.search(queries, k, params=params)
+    batch_seconds = time.perf_counter() - started
+
+    latencies = []
+    for q in queries:
+        started = time.perf_counter()
+        index.search(q[None, :], k, params=params)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return {
+        "recall_at_k": round(recall_at_k(found, exact), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "batch_qps": round(len(queries) / batch_seconds, 1),
+    }
+
+
+def knob_grid(index_type, args):
+    if index_type == "hnsw":
+        return [{"ef_search": ef, "nprobe": 0} for ef in args.ef_search]
+    if index_type.startswith("ivf"):
+        return [{"ef_search": 0, "nprobe": nprobe} for nprobe in args.nprobe]
+    return [{"ef_search": 0, "nprobe": 0}]  # no search-time knobs
+
+
+def report(args):
+    rng = np.random.default_rng(args.seed)
+    seed = load_seed_vectors(args.seed_index)
+    print(f"🌱 {len(seed)} seed vectors (dim {seed.shape[1]}) from {args.seed_index}")
+    rows = []
+    for n in args.sizes:
+        vectors = synthetic_vectors(seed, n, args.noise, rng)
+        queries = synthetic_vectors(seed, args.queries, args.noise, rng)
+        mask = rng.random(n) < args.filter if args.filter else None
+
+        exact_index = faiss.IndexFlatL2(vectors.shape[1])
+        exact_index.add(vectors)
+        _, exact = exact_index.search(queries, args.k, params=search_parameters(exact_index, search_knobs(), args.k, mask))
+        del exact_index
+
+        for index_type in args.types:
+            started = time.perf_counter()
+            index, params = build_index(vectors, index_type)
+            build_seconds = time.perf_counter() - started
+            size = index_bytes(index)
+            if params:
+                print(f"🏗️ n={n:<8} {index_type:<9} built with {json.dumps(params)}")
+            for knobs in knob_grid(index_type, args):
+                row = {
+                    "n": n,
+                    "index_type": index_type,
+                    "params": params,
+                    "knobs": {key: value for key, value in knobs.items() if value},
+                    "build_s": round(build_seconds, 2),
+                    "size_mb": round(size / 2**20, 2),
+                    "bytes_per_vector": round(size / n, 1),
+                    **measure(index, knobs, queries, exact, args.k, mask),
+                }
+                rows.append(row)
+                print(
+                    f"n={n:<8} {index_type:<9} {json.dumps(row['knobs']):<20} "
+                    f"recall@{args.k}={row['recall_at_k']:.3f}  p50={row['p50_ms']:.3f}ms  "
+                    f"p95={row['p95_ms']:.3f}ms  {row['batch_qps']:.0f} qps  "
+                    f"{row['size_mb']} MB  build {row['build_s']}s"
+                )
+            del index
+    return rows
+
+
+def main():
+    base_path = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Compare FAISS index types on synthetic scaled-up catalogs.")
+    parser.add_argument("--seed-index", default=os.path.join(base_path, "../data/faiss_index.idx"))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=30, help="depth compared against exact search (RETRIEVAL_DEPTH)")
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[32, 64, 128])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--filter", type=float, default=0.0, help="fraction of rows eligible under a random filter mask")
+    parser.add_argument("--noise", type=float, default=0.5, help="noise added to seed vectors, relative to their spread")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the rows to this file")
+    args = parser.parse_args()
+
+    rows = report(args)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+        print(f"📝 Wrote {len(rows)} rows to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
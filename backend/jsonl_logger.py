@@ -0,0 +1,198 @@
+import os
+import gzip
+import json
+import queue
+import atexit
+import shutil
+import threading
+
+
+class JsonlLogger:
+    """Append-only JSONL log written by a background thread.
+
+    `log()` never blocks and never touches the disk: records go into a bounded
+    queue, and when it is full they are dropped and counted instead of
+    slowing the caller down. The writer thread drains the queue in batches,
+    keeps the file open between batches and rotates it at `max_bytes`
+    (path -> path.1 -> ... -> path.<backups>, gzipped when `compress`).
+    Queued records are written on `close()`, which also runs at exit.
+
+    The thread starts with the first record, and again in a forked child
+    (gunicorn --preload forks workers after import), where `{pid}` in the
+    path resolves to the child's pid so each worker writes its own file.
+    """
+
+    def __init__(self, path, max_bytes=0, backups=5, compress=False,
+                 queue_size=10000, batch_size=500, flush_interval=1.0):
+        self.template = path
+        self.path = path.replace("{pid}", str(os.getpid()))
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.compress = compress
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.rotations = 0
+        self.queue_size = queue_size
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._file = None
+        self._closed = False
+        self._thread = None
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._after_fork)
+        atexit.register(self.close)
+
+    def _after_fork(self):
+        # Only the forking thread survives: the writer is gone, and its queue and lock may be mid-use.
+        self.path = self.template.replace("{pid}", str(os.getpid()))
+        self.written = self.dropped = self.errors = self.rotations = 0
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._file = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"jsonl-{os.path.basename(self.path)}", daemon=True)
+                self._thread.start()
+
+    def log(self, record):
+        """Queue one JSON-serializable record; returns False if it was dropped."""
+        if self._closed:
+            self.dropped += 1
+            return False
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self, timeout=5.0):
+        """Block until everything queued so far is on disk (or `timeout` passes)."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        if self._closed:
+            return
+        self.flush(timeout)
+        self._closed = True
+        if self._thread is not None:
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                # The writer is stuck (e.g. on a hung disk); it is a daemon thread, so exit goes ahead.
+                return
+            self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "written": self.written,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "rotations": self.rotations,
+            "queued": self._queue.qsize(),
+        }
+
+    # === Writer thread ===
+    def _run(self):
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = self._write(batch)
+            if stop:
+                self._close_file()
+                return
+
+    def _write(self, batch):
+        lines, markers, stop = [], [], False
+        for item in batch:
+            if item is None:
+                stop = True
+            elif isinstance(item, threading.Event):
+                markers.append(item)
+            else:
+                try:
+                    lines.append(json.dumps(item, ensure_ascii=False, default=str) + "\n")
+                except (TypeError, ValueError):
+                    self.errors += 1
+        if lines:
+            data = "".join(lines).encode("utf-8")
+            try:
+                if self.max_bytes and self._size() + len(data) > self.max_bytes and self._size():
+                    self._rotate()
+                if self._file is None:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                    self._file = open(self.path, "ab")
+                self._file.write(data)
+                self._file.flush()
+                self.written += len(lines)
+            except OSError as e:
+                self.errors += len(lines)
+                print(f"⚠️ Could not write {self.path}: {e}")
+                self._close_file()
+        for marker in markers:
+            marker.set()
+        return stop
+
+    def _size(self):
+        if self._file is not None:
+            return self._file.tell()
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _backup(self, n):
+        return f"{self.path}.{n}" + (".gz" if self.compress else "")
+
+    def _rotate(self):
+        self._close_file()
+        if self.backups <= 0:
+            os.remove(self.path)
+            return
+        for n in range(self.backups - 1, 0, -1):
+            if os.path.exists(self._backup(n)):
+                os.replace(self._backup(n), self._backup(n + 1))
+        if self.compress:
+            with open(self.path, "rb") as src, gzip.open(self._backup(1), "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(self.path)
+        else:
+            os.replace(self.path, self._backup(1))
+        self.rotations += 1
+
+
+def from_env(path, prefix="LOG"):
+    """JsonlLogger configured by <prefix>_MAX_BYTES, <prefix>_BACKUPS, <prefix>_COMPRESS and <prefix>_QUEUE."""
+    return JsonlLogger(
+        path,
+        max_bytes=int(os.getenv(f"{prefix}_MAX_BYTES", str(50 * 1024 * 1024))),
+        backups=int(os.getenv(f"{prefix}_BACKUPS", "5")),
+        compress=os.getenv(f"{prefix}_COMPRESS", "0") == "1",
+        queue_size=int(os.getenv(f"{prefix}_QUEUE", "10000")),
+    )
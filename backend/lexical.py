@@ -0,0 +1,104 @@
+import re
+import math
+import json
+from collections import Counter, defaultdict
+
+LEXICAL_VERSION = 1
+
+_TOKEN_RE = re.compile(r"[a-z0-9+#.]+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "for", "from", "in", "is", "it",
+    "of", "on", "or", "that", "the", "this", "to", "who", "with", "will", "we", "our", "need",
+    "want", "looking", "test", "tests", "assessment", "assessments", "candidate", "candidates",
+}
+
+
+def tokenize(text):
+    # Keeps "c++", "c#", ".net" and "8.0" intact; trailing sentence dots are dropped.
+    tokens = (t.strip(".") for t in _TOKEN_RE.findall(text.lower()))
+    return [t for t in tokens if t and t not in _STOPWORDS]
+
+
+def document_terms(catalog, row):
+    # Name counts double: skill names ("Java 8", "SQL Server") live in the title.
+    labels = " ".join(catalog.test_type_labels[t] for t in catalog.test_types[row])
+    text = f"{catalog.name[row]} {catalog.name[row]} {catalog.description[row]} {labels} {catalog.job_levels[row]}"
+    return tokenize(text)
+
+
+def build_lexical_index(catalog, k1=1.2, b=0.75):
+    """BM25 postings for every catalog row, as a JSON-serialisable dict."""
+    postings = defaultdict(lambda: ([], []))
+    doc_len = []
+    for row in range(len(catalog)):
+        counts = Counter(document_terms(catalog, row))
+        doc_len.append(sum(counts.values()))
+        for term, tf in counts.items():
+            ids, tfs = postings[term]
+            ids.append(row)
+            tfs.append(tf)
+    return {
+        "version": LEXICAL_VERSION,
+        "k1": k1,
+        "b": b,
+        "doc_len": doc_len,
+        "postings": {term: [ids, tfs] for term, (ids, tfs) in postings.items()},
+    }
+
+
+def write_lexical_index(lexical, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(lexical, f, ensure_ascii=False, separators=(",", ":"))
+
+
+class LexicalIndex:
+    def __init__(self, lexical):
+        self.k1 = lexical["k1"]
+        self.b = lexical["b"]
+        self.doc_len = lexical["doc_len"]
+        self.size = len(self.doc_len)
+        avgdl = sum(self.doc_len) / max(1, self.size)
+        self.postings = lexical["postings"]
+        # Precompute idf and per-document length norms once so search is adds and multiplies only.
+        self.idf = {
+            term: math.log(1 + (self.size - len(ids) + 0.5) / (len(ids) + 0.5))
+            for term, (ids, _) in self.postings.items()
+        }
+        self.norm = [self.k1 * (1 - self.b + self.b * dl / avgdl) for dl in self.doc_len]
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        return cls(build_lexical_index(catalog))
+
+    def __len__(self):
+        return self.size
+
+    def scores(self, query):
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            entry = self.postings.get(term)
+            if entry is None:
+                continue
+            idf = self.idf[term]
+            for row, tf in zip(*entry):
+                scores[row] += idf * tf * (self.k1 + 1) / (tf + self.norm[row])
+        return scores
+
+    def search(self, query, k, mask=None):
+        scores = self.scores(query)
+        rows = scores if mask is None else [row for row in scores if mask[row]]
+        return sorted(rows, key=scores.__getitem__, reverse=True)[:k]
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse ranked row lists; rows ranked high by any list come first."""
+    fused = defaultdict(float)
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            fused[row] += 1.0 / (k + rank + 1)
+    return sorted(fused, key=fused.__getitem__, reverse=True)
@@ -1,8 +1,18 @@
-from fastapi import FastAPI
+import os
+import json
+import asyncio
+import time
+import secrets
+from fastapi import FastAPI, HTTPException, Response, Header
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional, Literal
 from recommender import SHLRecommender
+from upstream import close_clients, UpstreamError, BREAKERS
+from bundle import BundleError
+from metrics import REGISTRY, REQUESTS, Timings, gauge_lines
+from jsonl_logger import from_env as jsonl_logger
 
 app = FastAPI(title="SHL Assessment Recommender")
 
@@ -14,10 +24,105 @@ app.add_middleware(
 )
 
 recommender = SHLRecommender()
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "500"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+TRACE_LOG = os.getenv("TRACE_LOG", "logs/traces.jsonl")
+traces = jsonl_logger(TRACE_LOG, prefix="TRACE") if TRACE_LOG else None
+
+def trace(endpoint, outcome, query, timings, **fields):
+    """Queue one request trace; the background writer does the disk I/O."""
+    if traces is None:
+        return
+    traces.log({
+        "ts": time.time(),
+        "endpoint": endpoint,
+        "outcome": outcome,
+        "query": query,
+        "timings_ms": {stage: round(sec * 1000, 2) for stage, sec in timings.stages.items()},
+        **fields,
+    })
+
+def bundle_metrics():
+    # Read at scrape time from whichever bundle is being served.
+    bundle = recommender.bundle
+    cache = bundle.embedding_cache.stats()
+    return (
+        gauge_lines("shl_index_info", "Index bundle being served.",
+                    [({"version": bundle.version, "index_type": bundle.index_type}, 1)])
+        + gauge_lines("shl_index_vectors", "Vectors in the served FAISS index.", [({}, bundle.index.ntotal)])
+        + gauge_lines("shl_embedding_cache_hits_total", "Query embedding cache hits (memory or disk).",
+                      [({}, cache["hits"])], "counter")
+        + gauge_lines("shl_embedding_cache_disk_hits_total", "Query embedding cache hits served by the disk tier.",
+                      [({}, cache["disk_hits"])], "counter")
+        + gauge_lines("shl_embedding_cache_misses_total", "Query embedding cache misses.",
+                      [({}, cache["misses"])], "counter")
+        + gauge_lines("shl_embedding_cache_entries", "Entries in the in-memory embedding cache.",
+                      [({}, cache["size"])])
+        + response_cache_lines()
+    )
+
+def response_cache_lines():
+    if recommender.response_cache is None:
+        return []
+    stats = recommender.response_cache.stats()
+    return (
+        gauge_lines("shl_response_cache_requests_total", "Response cache lookups by result.",
+                    [({"result": "hit"}, stats["hits"]), ({"result": "miss"}, stats["misses"])], "counter")
+        + gauge_lines("shl_response_cache_entries", "Answers in the response cache.", [({}, stats["size"])])
+    )
+
+REGISTRY.add_collector(bundle_metrics)
+
+def trace_metrics():
+    if traces is None:
+        return []
+    stats = traces.stats()
+    return (
+        gauge_lines("shl_trace_records_total", "Request traces by outcome.",
+                    [({"outcome": k}, stats[k]) for k in ("written", "dropped", "errors")], "counter")
+        + gauge_lines("shl_trace_queue_size", "Traces waiting for the writer thread.", [({}, stats["queued"])])
+    )
+
+REGISTRY.add_collector(trace_metrics)
+
+def breaker_metrics():
+    states = ("closed", "half_open", "open")
+    return gauge_lines(
+        "shl_upstream_circuit_state", "Circuit breaker state per upstream (1 for the current state).",
+        [({"upstream": name, "state": state}, int(breaker.state == state))
+         for name, breaker in BREAKERS.items() for state in states],
+    ) + gauge_lines(
+        "shl_upstream_circuit_opened_total", "Times each upstream's circuit breaker opened.",
+        [({"upstream": name}, breaker.opened) for name, breaker in BREAKERS.items()], "counter",
+    )
+
+REGISTRY.add_collector(breaker_metrics)
+
+@app.on_event("startup")
+async def start_bundle_watcher():
+    # Per worker: with --preload the master's threads do not survive the fork.
+    recommender.start_bundle_watcher(float(os.getenv("BUNDLE_WATCH_INTERVAL", "0")))
+
+@app.on_event("shutdown")
+async def shutdown_upstream_clients():
+    await close_clients()
+    if traces is not None:
+        await asyncio.to_thread(traces.close)
+
+RerankStrategy = Literal["llm", "local", "llm_with_fallback", "none"]
+
+class SearchFilters(BaseModel):
+    max_duration: Optional[int] = Field(None, gt=0, description="Maximum duration in minutes")
+    min_duration: Optional[int] = Field(None, gt=0, description="Minimum duration in minutes")
+    remote: Optional[bool] = None
+    adaptive: Optional[bool] = None
+    test_types: Optional[List[str]] = Field(None, description="Test type labels or letter codes; any may match")
 
 # SHL Expected Input
 class QueryText(BaseModel):
     query: str
+    rerank: Optional[RerankStrategy] = None
+    filters: Optional[SearchFilters] = None
 
 # SHL Expected Output
 class Assessment(BaseModel):
@@ -31,15 +136,157 @@ class Assessment(BaseModel):
 class RecommendationResponse(BaseModel):
     recommended_assessments: List[Assessment]
 
+class BatchQuery(BaseModel):
+    queries: List[str] = Field(..., min_length=1)
+    rerank: Optional[RerankStrategy] = None
+    filters: Optional[SearchFilters] = None
+    explain: bool = Field(False, description="Also return each item's applied filters and soft preferences")
+
+class BatchItem(BaseModel):
+    query: str
+    recommended_assessments: List[Assessment] = []
+    error: Optional[str] = None
+    rerank: Optional[str] = None
+    degraded: Optional[str] = None
+    applied_filters: Optional[Dict[str, Any]] = None
+    preferences: Optional[Dict[str, Any]] = None
+
+class BatchRecommendationResponse(BaseModel):
+    results: List[BatchItem]
+
+class ReloadRequest(BaseModel):
+    version: Optional[str] = Field(None, description="Bundle to switch to; defaults to the CURRENT pointer")
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the SHL Assessment Recommender API!"}
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy"}
+    bundle = recommender.bundle
+    return {
+        "status": "healthy",
+        "index": bundle.describe(),
+        "embedding_cache": bundle.embedding_cache.stats(),
+        "query_embedder": bundle.query_embedder.stats() if bundle.query_embedder else "gemini",
+        "response_cache": recommender.response_cache.stats() if recommender.response_cache else None,
+        "coalescing": recommender.in_flight.stats() if recommender.in_flight else None,
+        "upstreams": {name: breaker.stats() for name, breaker in BREAKERS.items()},
+    }
 
 @app.post("/recommend", response_model=RecommendationResponse)
-def recommend_from_query(req: QueryText):
-    results = recommender.recommend_text(req.query)
+async def recommend_from_query(req: QueryText, response: Response):
+    filters = req.filters.model_dump(exclude_none=True) if req.filters else None
+    timings = Timings()
+    try:
+        results, meta = await recommender.recommend_with_meta_async(req.query, req.rerank, filters, timings)
+    except ValueError as e:
+        REQUESTS.inc("recommend", "invalid")
+        trace("recommend", "invalid", req.query, timings.finish(), rerank=req.rerank, filters=filters, error=str(e))
+        raise HTTPException(status_code=422, detail=str(e))
+    except UpstreamError as e:
+        REQUESTS.inc("recommend", "upstream_error")
+        trace("recommend", "upstream_error", req.query, timings.finish(), rerank=req.rerank, filters=filters, error=str(e))
+        raise HTTPException(status_code=503, detail=str(e), headers={"Server-Timing": timings.server_timing()})
+    REQUESTS.inc("recommend", "ok")
+    trace(
+        "recommend", "ok", req.query, timings, rerank=req.rerank, filters=filters,
+        rerank_path=meta["rerank"], applied_filters=meta["filters"], corrections=meta["corrections"],
+        index_version=meta["index_version"], cached=meta["cached"], coalesced=meta["coalesced"],
+        degraded=meta.get("degraded"), results=[r["url"] for r in results],
+    )
+    if meta.get("degraded"):
+        response.headers["X-Degraded"] = meta["degraded"]
+    response.headers["X-Cache"] = "HIT" if meta["cached"] else "SHARED" if meta["coalesced"] else "MISS"
+    response.headers["X-Rerank-Path"] = meta["rerank"]
+    response.headers["X-Applied-Filters"] = json.dumps(meta["filters"], separators=(",", ":"))
+    response.headers["X-Index-Version"] = meta["index_version"]
+    if meta["corrections"]:
+        response.headers["X-Spell-Corrections"] = json.dumps(meta["corrections"], separators=(",", ":"))
+    response.headers["Server-Timing"] = timings.server_timing()
+    if meta.get("preferences"):
+        response.headers["X-Query-Preferences"] = json.dumps(meta["preferences"], separators=(",", ":"))
     return {"recommended_assessments": results}
+
+
+@app.post("/recommend/stream")
+async def recommend_stream(req: QueryText):
+    """NDJSON: the retrieval results as soon as FAISS/BM25 answer, then the reranked list."""
+    filters = req.filters.model_dump(exclude_none=True) if req.filters else None
+    timings = Timings()
+    events = recommender.recommend_stream_async(req.query, req.rerank, filters, timings)
+    try:
+        # Produce the first event before answering, so bad filters and embed failures keep their status codes.
+        first = await events.__anext__()
+    except ValueError as e:
+        REQUESTS.inc("stream", "invalid")
+        trace("stream", "invalid", req.query, timings.finish(), rerank=req.rerank, filters=filters, error=str(e))
+        raise HTTPException(status_code=422, detail=str(e))
+    except UpstreamError as e:
+        REQUESTS.inc("stream", "upstream_error")
+        trace("stream", "upstream_error", req.query, timings.finish(), rerank=req.rerank, filters=filters, error=str(e))
+        raise HTTPException(status_code=503, detail=str(e))
+    REQUESTS.inc("stream", "ok")
+
+    async def ndjson():
+        last = first
+        yield json.dumps(first) + "\n"
+        async for event in events:
+            last = event
+            yield json.dumps(event) + "\n"
+        trace(
+            "stream", "ok", req.query, timings, rerank=req.rerank, filters=filters,
+            rerank_path=last.get("rerank", "none"), applied_filters=first["filters"], corrections=first["corrections"],
+            index_version=first["index_version"], cached=first.get("cached", False), degraded=first.get("degraded"),
+            results=[r["url"] for r in last["recommended_assessments"]],
+        )
+
+    headers = {"X-Degraded": first["degraded"]} if first.get("degraded") else {}
+    if first.get("preferences"):
+        headers["X-Query-Preferences"] = json.dumps(first["preferences"], separators=(",", ":"))
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson", headers={
+        **headers,
+        "X-Cache": "HIT" if first.get("cached") else "MISS",
+        "X-Index-Version": first["index_version"],
+        "X-Applied-Filters": json.dumps(first["filters"], separators=(",", ":")),
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # proxies must not hold the first line back
+    })
+
+
+@app.post("/recommend/batch", response_model=BatchRecommendationResponse, response_model_exclude_unset=True)
+async def recommend_batch(req: BatchQuery, response: Response):
+    if len(req.queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_QUERIES} queries per batch.")
+    filters = req.filters.model_dump(exclude_none=True) if req.filters else None
+    timings = Timings("batch_")
+    results = await recommender.recommend_batch_async(req.queries, req.rerank, filters, timings)
+    REQUESTS.inc("batch", "ok")
+    trace(
+        "batch", "ok", None, timings, rerank=req.rerank, filters=filters,
+        queries=len(req.queries), errors=sum(1 for item in results if item.get("error")),
+    )
+    response.headers["Server-Timing"] = timings.server_timing()
+    if not req.explain:
+        for item in results:
+            del item["applied_filters"], item["preferences"]
+    return {"results": results}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition of this worker's metrics."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/admin/reload")
+async def reload_index(req: Optional[ReloadRequest] = None, x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled (ADMIN_TOKEN is not set).")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+    try:
+        # Loading and validating a bundle is blocking I/O; keep it off the event loop.
+        return await asyncio.to_thread(recommender.reload, req.version if req else None)
+    except BundleError as e:
+        raise HTTPException(status_code=409, detail=str(e))
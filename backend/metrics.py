@@ -0,0 +1,206 @@
+import threading
+from bisect import bisect_left
+from time import perf_counter
+
+# Latency buckets in seconds: sub-millisecond FAISS/BM25 work up to slow LLM reranks.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [per-bucket counts (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][slot] += 1
+            series[1] += value
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1])) for k, v in self._series.items())
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), counts):
+                cumulative += n
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Metrics of this process in the Prometheus text format.
+
+    Collectors are callables returning extra exposition lines, for values that
+    are owned elsewhere (e.g. cache counters) and read at scrape time.
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        for collector in self.collectors:
+            lines += collector()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "shl_stage_seconds", "Time spent in each recommendation stage.", ["stage"]
+))
+REQUESTS = REGISTRY.register(Counter(
+    "shl_requests_total", "Recommendation requests by endpoint and outcome.", ["endpoint", "outcome"]
+))
+UPSTREAM_ERRORS = REGISTRY.register(Counter(
+    "shl_upstream_errors_total", "Failed upstream calls by upstream and kind.", ["upstream", "kind"]
+))
+RERANK_PATHS = REGISTRY.register(Counter(
+    "shl_rerank_path_total", "Rerank path that served each result list.", ["path"]
+))
+RERANK_FALLBACKS = REGISTRY.register(Counter(
+    "shl_rerank_fallback_total", "LLM reranks replaced by the local reranker or FAISS order.", ["reason"]
+))
+UPSTREAM_RETRIES = REGISTRY.register(Counter(
+    "shl_upstream_retries_total", "Upstream retries made, or refused because the retry budget was spent.",
+    ["upstream", "outcome"]
+))
+UPSTREAM_HEDGES = REGISTRY.register(Counter(
+    "shl_upstream_hedges_total", "Hedged embed requests sent, and how many answered first.", ["upstream", "outcome"]
+))
+UPSTREAM_SHORT_CIRCUITS = REGISTRY.register(Counter(
+    "shl_upstream_short_circuits_total", "Calls failed fast because the upstream's circuit breaker was open.",
+    ["upstream"]
+))
+DEGRADED = REGISTRY.register(Counter(
+    "shl_degraded_total", "Requests answered in a degraded mode instead of failing.", ["mode"]
+))
+COALESCED = REGISTRY.register(Counter(
+    "shl_coalesced_requests_total",
+    "Requests that computed an answer (leader) or shared one already in flight (follower).", ["role"]
+))
+COALESCED_SAVED_CALLS = REGISTRY.register(Counter(
+    "shl_coalesced_upstream_calls_saved_total",
+    "Upstream calls not made because a request shared an identical in-flight computation.", ["upstream"]
+))
+LOCAL_EMBED_BATCH = REGISTRY.register(Histogram(
+    "shl_local_embed_batch_size", "Queries per forward pass of the in-process embedder.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+))
+
+
+def gauge_lines(name, help, samples, kind="gauge"):
+    """Exposition lines for values read at scrape time; `samples` is [(labels dict, value)]."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(labels.keys(), labels.values())} {_number(value)}")
+    return lines
+
+
+class _Span:
+    __slots__ = ("timings", "stage", "started")
+
+    def __init__(self, timings, stage):
+        self.timings = timings
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timings.add(self.stage, perf_counter() - self.started)
+        return False
+
+
+class Timings:
+    """Stage durations of one request; every finished span is also observed in STAGE_SECONDS."""
+
+    __slots__ = ("stages", "started", "prefix")
+
+    def __init__(self, prefix=""):
+        self.stages = {}
+        self.started = perf_counter()
+        self.prefix = prefix  # e.g. "batch_", keeps batch stages apart in STAGE_SECONDS
+
+    def span(self, stage):
+        return _Span(self, stage)
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        STAGE_SECONDS.observe(seconds, self.prefix + stage)
+
+    def elapsed(self):
+        return perf_counter() - self.started
+
+    def finish(self):
+        self.add("total", self.elapsed())
+        return self
+
+    def server_timing(self):
+        """Value for the Server-Timing response header (durations in milliseconds)."""
+        return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in self.stages.items())
@@ -0,0 +1,99 @@
+# 📁 profile_workers.py — startup time and per-worker memory for the recommender
+#
+#   python profile_workers.py --workers 4            # simulate gunicorn --preload workers
+#   python profile_workers.py --pid <gunicorn master> # inspect a running server
+#
+# Compare layouts with INDEX_MMAP=0 / CATALOG_MMAP=0. Linux only (reads /proc).
+
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing as mp
+
+FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def memory_kb(pid="self"):
+    usage = {}
+    with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in FIELDS:
+                usage[key] = int(rest.split()[0])
+    usage["Private"] = usage.get("Private_Clean", 0) + usage.get("Private_Dirty", 0)
+    return usage
+
+
+def child_pids(pid):
+    pids = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children", "r") as f:
+            pids.extend(int(p) for p in f.read().split())
+    return pids
+
+
+def simulate_worker(recommender, barrier, queue, queries):
+    import numpy as np
+    # Touch what a serving worker touches: vector search, filters and catalog records.
+    rng = np.random.default_rng(os.getpid())
+    vectors = rng.standard_normal((queries, recommender.index.d)).astype("float32")
+    for rows in recommender.search_by_vectors(vectors, recommender.retrieval_depth):
+        [recommender.catalog.record(r) for r in rows]
+    recommender.filter_index.mask({"max_duration": 30, "remote": True})
+    barrier.wait()  # all workers alive, so PSS splits shared pages between them
+    queue.put({"pid": os.getpid(), **memory_kb()})
+    barrier.wait()
+
+
+def profile_preload(workers, queries):
+    started = time.perf_counter()
+    from recommender import SHLRecommender
+    imported = time.perf_counter()
+    recommender = SHLRecommender()
+    loaded = time.perf_counter()
+
+    ctx = mp.get_context("fork")
+    barrier = ctx.Barrier(workers + 1)
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=simulate_worker, args=(recommender, barrier, queue, queries)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    barrier.wait()
+    parent = memory_kb()
+    per_worker = [queue.get() for _ in procs]
+    barrier.wait()
+    for p in procs:
+        p.join()
+
+    return {
+        "index_mmap": os.getenv("INDEX_MMAP", "1") == "1",
+        "catalog_mmap": os.getenv("CATALOG_MMAP", "1") == "1",
+        "import_seconds": round(imported - started, 3),
+        "load_seconds": round(loaded - imported, 3),
+        "master_kb": parent,
+        "workers_kb": per_worker,
+        "total_pss_kb": parent["Pss"] + sum(w["Pss"] for w in per_worker),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure recommender startup time and RSS/PSS per worker.")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--queries", type=int, default=50, help="searches each simulated worker runs")
+    parser.add_argument("--pid", type=int, help="PID of a running gunicorn master to inspect instead")
+    args = parser.parse_args()
+
+    if args.pid:
+        report = {"master_kb": memory_kb(args.pid)}
+        report["workers_kb"] = [{"pid": pid, **memory_kb(pid)} for pid in child_pids(args.pid)]
+        report["total_pss_kb"] = report["master_kb"]["Pss"] + sum(w["Pss"] for w in report["workers_kb"])
+    else:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        report = profile_preload(args.workers, args.queries)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
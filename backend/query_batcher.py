@@ -0,0 +1,103 @@
+import time
+import asyncio
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from metrics import LOCAL_EMBED_BATCH
+
+
+class MicroBatcher:
+    """Coalesce concurrent query embeddings into one forward pass of an in-process embedder.
+
+    The first query waits up to `max_wait` seconds for company. While a batch
+    runs, new queries queue up and go together as the next batch, so under
+    load batches grow by themselves without adding latency when idle. Forward
+    passes run one at a time on a dedicated thread, off the event loop.
+    """
+
+    def __init__(self, embedder, max_batch=32, max_wait=0.002):
+        self.embedder = embedder
+        self.name = embedder.name
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="embed")
+        self._queues = weakref.WeakKeyDictionary()  # event loop -> _LoopQueue
+        self.batches = 0
+        self.texts = 0
+        self.seconds = 0.0
+
+    def warm_up(self):
+        """Run one forward pass so model loading and first-call overhead happen before traffic; returns the dim."""
+        started = time.perf_counter()
+        vectors = np.asarray(self.embedder.embed(["warm-up query"]), dtype="float32")
+        print(f"🔥 Warmed up {self.name} in {time.perf_counter() - started:.2f}s (dim {vectors.shape[1]})")
+        return vectors.shape[1]
+
+    async def embed(self, texts):
+        loop = asyncio.get_running_loop()
+        queue = self._queues.get(loop)
+        if queue is None:
+            queue = self._queues[loop] = _LoopQueue()
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            queue.pending.append((text, future))
+            futures.append(future)
+        if not queue.busy:
+            if len(queue.pending) >= self.max_batch:
+                self._dispatch(loop, queue)
+            elif queue.timer is None:
+                queue.timer = loop.call_later(self.max_wait, self._dispatch, loop, queue)
+        return await asyncio.gather(*futures)
+
+    def _dispatch(self, loop, queue):
+        if queue.timer is not None:
+            queue.timer.cancel()
+            queue.timer = None
+        # Requests cancelled while waiting (client gone, deadline) are not embedded.
+        queue.pending = [(text, future) for text, future in queue.pending if not future.done()]
+        if queue.busy or not queue.pending:
+            return
+        batch, queue.pending = queue.pending[:self.max_batch], queue.pending[self.max_batch:]
+        queue.busy = True
+        task = loop.run_in_executor(self._executor, self._run, [text for text, _ in batch])
+        task.add_done_callback(lambda done: self._finish(loop, queue, batch, done))
+
+    def _run(self, texts):
+        started = time.perf_counter()
+        vectors = np.asarray(self.embedder.embed(texts), dtype="float32")
+        self.seconds += time.perf_counter() - started
+        return vectors
+
+    def _finish(self, loop, queue, batch, done):
+        queue.busy = False
+        self.batches += 1
+        self.texts += len(batch)
+        LOCAL_EMBED_BATCH.observe(len(batch))
+        error = done.exception()
+        for i, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(done.result()[i])
+        if queue.pending:
+            self._dispatch(loop, queue)
+
+    def stats(self):
+        return {
+            "model": self.name,
+            "batches": self.batches,
+            "texts": self.texts,
+            "mean_batch": round(self.texts / self.batches, 2) if self.batches else 0,
+            "forward_seconds": round(self.seconds, 3),
+        }
+
+
+class _LoopQueue:
+    def __init__(self):
+        self.pending = []
+        self.busy = False
+        self.timer = None
@@ -1,128 +1,641 @@
 import os
-import json
-import faiss
+import time
+import asyncio
+import functools
+import threading
+from collections import namedtuple
 import numpy as np
-import re
-from openai import OpenAI
-import google.generativeai as genai
+from embedding_cache import EmbeddingCache
+from embedders import embedder_for_model
+from query_batcher import MicroBatcher
+from response_cache import ResponseCache, cache_key
+from singleflight import SingleFlight
+from bundle import IndexBundle, BundleError, read_current, CURRENT_NAME
+from lexical import reciprocal_rank_fusion
+from filters import resolve_filters, resolve_hints
+from index_factory import search_parameters
+from upstream import get_clients, UpstreamError
+from resilience import AttemptTimeout, CircuitOpen, DeadlineExceeded
+from metrics import Timings, RERANK_PATHS, RERANK_FALLBACKS, DEGRADED
+from rerank import (
+    RERANK_SYSTEM_PROMPT, RERANK_STRATEGIES,
+    build_rerank_prompt, parse_ranked_ids, estimate_tokens,
+)
 
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+
+# What retrieval hands to the rerank step (see _candidates_async).
+Candidates = namedtuple("Candidates", "filters preferences rows corrections degraded")
 
 
 class SHLRecommender:
-    def __init__(self, top_k=10, spell_threshold=0.7):
+    def __init__(self, top_k=10, spell_threshold=0.75, load_snapshot=True):
         base_path = os.path.dirname(os.path.abspath(__file__))
-        self.index_path = os.path.join(base_path, "../data/faiss_index.idx")
-        self.docstore_path = os.path.join(base_path, "../data/index_metadata.json")
+        self.data_dir = os.path.join(base_path, "../data")
+        self.bundles_dir = os.getenv("BUNDLES_DIR") or os.path.join(self.data_dir, "bundles")
         self.top_k = top_k
         self.spell_threshold = spell_threshold
 
-        self.index = faiss.read_index(self.index_path)
+        self.hybrid_search = os.getenv("HYBRID_SEARCH", "1") == "1"
+        self.retrieval_depth = max(self.top_k, int(os.getenv("RETRIEVAL_DEPTH", "30")))
+        self.parse_query_filters = os.getenv("PARSE_QUERY_FILTERS", "1") == "1"
+        self.spell_correction = os.getenv("SPELL_CORRECTION", "1") == "1"
+        # When the query cannot be embedded, answer from BM25 alone instead of failing.
+        self.degrade_to_lexical = os.getenv("DEGRADE_TO_LEXICAL", "1") == "1"
+
+        self.llm_model = "anthropic/claude-3-haiku"
+        self.rerank_token_budget = int(os.getenv("RERANK_TOKEN_BUDGET", "1200"))
+        self.rerank_strategy = os.getenv("RERANK_STRATEGY", "llm_with_fallback")
+        self.rerank_deadline = float(os.getenv("RERANK_DEADLINE", "4"))
+        if self.rerank_strategy not in RERANK_STRATEGIES:
+            raise ValueError(f"Unknown RERANK_STRATEGY {self.rerank_strategy!r}, expected one of {RERANK_STRATEGIES}")
+
+        self.batch_rerank_concurrency = int(os.getenv("BATCH_RERANK_CONCURRENCY", "8"))
+        # Identical concurrent /recommend requests share one embed/search/rerank computation.
+        self.in_flight = SingleFlight() if os.getenv("COALESCE_REQUESTS", "1") == "1" else None
+
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        version = read_current(self.bundles_dir)
+        if version:
+            bundle = IndexBundle.open(os.path.join(self.bundles_dir, version), self.hybrid_search)
+        else:
+            bundle = IndexBundle.legacy(
+                self.data_dir, os.getenv("EMBED_MODEL") or "models/embedding-001", self.hybrid_search
+            )
+        self.bundle = self._prepare(bundle)
+        print(f"📦 Serving index bundle {self.bundle.version} ({self.bundle.index.ntotal} vectors)")
+
+        cache_size = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+        cache_ttl = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+        self.response_cache = ResponseCache(cache_size, cache_ttl if cache_ttl > 0 else None) if cache_size > 0 else None
+        self.response_snapshot = os.getenv("RESPONSE_CACHE_SNAPSHOT") or os.path.join(self.data_dir, "response_cache.json")
+        # warm_cache.py builds a new snapshot from scratch, so it starts without the previous one.
+        self.load_snapshot = load_snapshot
+        self._load_response_snapshot(self.bundle)
+
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    # === Index bundle ===
+    # Requests read self.bundle once and use that object throughout, so a reload
+    # swapping the reference never mixes two index versions within one request.
+    @property
+    def index(self):
+        return self.bundle.index
 
-        with open(self.docstore_path, "r", encoding="utf-8") as f:
-            self.docstore = json.load(f)
+    @property
+    def catalog(self):
+        return self.bundle.catalog
 
-        self.llm_client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=os.getenv("OPENROUTER_API_KEY")
+    @property
+    def lexical(self):
+        return self.bundle.lexical
+
+    @property
+    def filter_index(self):
+        return self.bundle.filter_index
+
+    @property
+    def local_reranker(self):
+        return self.bundle.local_reranker
+
+    @property
+    def embedding_cache(self):
+        return self.bundle.embedding_cache
+
+    @property
+    def embed_model(self):
+        return self.bundle.embedding_model
+
+    def _prepare(self, bundle, previous=None):
+        """Validate `bundle` and give it an embedding cache (the previous one if still compatible)."""
+        bundle.validate(os.getenv("EMBED_MODEL") or None)
+        cache = previous.embedding_cache if previous is not None else None
+        if cache is None or cache.model != bundle.embedding_model or cache.dim != bundle.index.d:
+            ttl = float(os.getenv("EMBED_CACHE_TTL", "86400"))
+            cache = EmbeddingCache(
+                model=bundle.embedding_model,
+                dim=bundle.index.d,
+                capacity=int(os.getenv("EMBED_CACHE_SIZE", "2048")),
+                ttl=ttl if ttl > 0 else None,
+                path=os.getenv("EMBED_CACHE_PATH") or None,
+                max_rows=int(os.getenv("EMBED_CACHE_MAX_ROWS", "100000")),
+            )
+        bundle.embedding_cache = cache
+        bundle.query_embedder = self._query_embedder(bundle, previous)
+        return bundle
+
+    def _query_embedder(self, bundle, previous=None):
+        """Warmed-up MicroBatcher when `bundle` was embedded in-process (local model, hashing); None means Gemini."""
+        if previous is not None and previous.query_embedder is not None \
+                and previous.query_embedder.name == bundle.embedding_model:
+            return previous.query_embedder
+        embedder = embedder_for_model(bundle.embedding_model)
+        if embedder is None:
+            return None
+        batcher = MicroBatcher(
+            embedder,
+            max_batch=int(os.getenv("LOCAL_EMBED_MAX_BATCH", "32")),
+            max_wait=float(os.getenv("LOCAL_EMBED_WAIT_MS", "2")) / 1000,
         )
-        self.llm_model = "anthropic/claude-3-haiku"
+        dim = batcher.warm_up()
+        if dim != bundle.index.d:
+            raise BundleError(f"{bundle.embedding_model} produces {dim}-d vectors, bundle {bundle.version} has {bundle.index.d}")
+        return batcher
+
+    def reload(self, version=None):
+        """Load, validate and switch to bundle `version` (default: the CURRENT pointer).
 
+        In-flight requests finish on the bundle they started with. On any
+        BundleError the bundle being served is left untouched.
+        """
+        with self._reload_lock:
+            previous = self.bundle
+            version = version or read_current(self.bundles_dir)
+            if not version:
+                raise BundleError(f"No {CURRENT_NAME} bundle in {self.bundles_dir}")
+            if os.path.basename(version) != version or version.startswith("."):
+                raise BundleError(f"Invalid bundle version {version!r}")
+            if version == previous.version:
+                return {"previous": previous.version, "version": version, "changed": False}
+            directory = os.path.join(self.bundles_dir, version)
+            if not os.path.isdir(directory):
+                raise BundleError(f"Bundle {version} does not exist")
+            bundle = self._prepare(IndexBundle.open(directory, self.hybrid_search), previous)
+            self.bundle = bundle
+        print(f"🔄 Switched index bundle {previous.version} -> {bundle.version}")
+        self._load_response_snapshot(bundle)
+        return {"previous": previous.version, "version": bundle.version, "changed": True}
+
+    def start_bundle_watcher(self, interval):
+        """Poll the CURRENT pointer every `interval` seconds and reload when it changes."""
+        if interval <= 0 or self._watcher is not None:
+            return
+        pointer = os.path.join(self.bundles_dir, CURRENT_NAME)
+
+        def watch():
+            last = None
+            while True:
+                time.sleep(interval)
+                try:
+                    mtime = os.stat(pointer).st_mtime_ns
+                except FileNotFoundError:
+                    continue
+                if mtime == last:
+                    continue
+                last = mtime
+                try:
+                    self.reload()
+                except Exception as e:
+                    print(f"❌ Bundle reload failed, still serving {self.bundle.version}: {e}")
+
+        self._watcher = threading.Thread(target=watch, name="bundle-watcher", daemon=True)
+        self._watcher.start()
+
+    # === Response cache ===
+    def _load_response_snapshot(self, bundle):
+        if not self.load_snapshot or self.response_cache is None or not os.path.isfile(self.response_snapshot):
+            return
+        loaded = self.response_cache.load_snapshot(self.response_snapshot, bundle.version)
+        if loaded:
+            print(f"🔥 Warmed response cache with {loaded} answers from {self.response_snapshot}")
+
+    def _cached_response(self, query, strategy, filters, bundle, timings):
+        """(records, meta) of an earlier identical request, or None; a hit calls no upstream."""
+        if self.response_cache is None:
+            return None
+        with timings.span("cache"):
+            entry = self.response_cache.get(query, bundle.version, strategy, filters)
+        if entry is None:
+            return None
+        records, meta = entry
+        return list(records), {**meta, "cached": True, "coalesced": False}
+
+    def _store_response(self, query, strategy, filters, bundle, records, meta):
+        # Degraded answers (LLM deadline missed, rerank error, no embedding) are not worth repeating.
+        intended = meta["rerank"] == strategy or (strategy == "llm_with_fallback" and meta["rerank"] == "llm")
+        if self.response_cache is not None and intended and not meta.get("degraded"):
+            self.response_cache.set(query, bundle.version, strategy, filters, records, meta)
+
+    # === Sync wrappers (scripts) ===
+    def _run_sync(self, coro):
+        # Scripts share one private event loop so pooled connections are reused across calls.
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
 
     def _embed_query(self, query: str) -> list:
+        return self._run_sync(self._embed_query_async(query))
+
+    def recommend_text(self, query: str, rerank=None, filters=None):
+        return self._run_sync(self.recommend_text_async(query, rerank, filters))
+
+    def recommend_batch(self, queries, rerank=None, filters=None):
+        return self._run_sync(self.recommend_batch_async(queries, rerank, filters))
+
+    def _rerank_with_openrouter(self, query, rows):
+        return self._run_sync(self._rerank_with_openrouter_async(query, rows))
+
+    def warm(self, requests, concurrency=4):
+        """Answer (query, rerank, filters) requests, `concurrency` at a time, filling the response cache.
+
+        Returns one (meta, error) pair per request, in order; a failed request does not stop the others.
+        """
+        return self._run_sync(self._warm_async(requests, concurrency))
+
+    # === Async API ===
+    async def _embed_query_async(self, query: str, bundle=None):
+        bundle = bundle or self.bundle
+        cached = await bundle.embedding_cache.get_async(query)
+        if cached is not None:
+            return cached
+        if bundle.query_embedder is not None:
+            vector = (await self._embed_locally(bundle, [query]))[0]
+        else:
+            vector = await get_clients().embed(bundle.embedding_model, query, "RETRIEVAL_QUERY")
+        bundle.embedding_cache.set(query, vector)
+        return vector
+
+    async def _embed_locally(self, bundle, texts):
         try:
-            response = genai.embed_content(
-                model="models/embedding-001",
-                content=query,
-                task_type="RETRIEVAL_QUERY"
-            )
-            return response["embedding"]
+            return await bundle.query_embedder.embed(texts)
         except Exception as e:
-            print(f"❌ Gemini embedding failed: {e}")
-            return []
-
-
-    def search_by_vector(self, vector):
-        query_vec = np.array([vector], dtype="float32")
-        _, indices = self.index.search(query_vec, self.top_k)
-        return [self.docstore[i] for i in indices[0]]
-
-    def recommend_text(self, query: str):
-        embedded_vector = self._embed_query(query)
-        results = self.search_by_vector(embedded_vector)
-
-        final = []
-        for doc in results:
-            text_raw = doc["text"]
-            text_lower = text_raw.lower()
-
-            structured = {
-                "url": doc["source"],
-                "adaptive_support": "Yes" if "adaptive/irt: yes" in text_lower else "No",
-                "description": self._extract_description(text_raw),
-                "duration": self._extract_duration_int(text_raw),
-                "remote_support": "Yes" if "remote testing: yes" in text_lower else "No",
-                "test_type": self._extract_test_types(text_lower)
-            }
+            raise UpstreamError(f"Local embedding failed: {e!r}") from e
 
-            final.append(structured)
+    async def _embed_queries_async(self, queries, bundle=None):
+        bundle = bundle or self.bundle
+        cache = bundle.embedding_cache
+        vectors = await cache.get_many_async(queries)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            texts = [queries[i] for i in missing]
+            if bundle.query_embedder is not None:
+                try:
+                    embedded = await self._embed_locally(bundle, texts)
+                except UpstreamError as e:
+                    embedded = [e] * len(texts)
+            else:
+                embedded = await get_clients().embed_batch(bundle.embedding_model, texts, "RETRIEVAL_QUERY")
+            for i, vector in zip(missing, embedded):
+                if not isinstance(vector, UpstreamError):
+                    cache.set(queries[i], vector)
+                vectors[i] = vector
+        return vectors
 
-        reranked = self._rerank_with_openrouter(query, final)
-        return reranked
+    def search_by_vectors(self, vectors, k=None, mask=None, bundle=None):
+        """Top-k rows per query vector; `mask` restricts the search to eligible rows inside FAISS."""
+        bundle = bundle or self.bundle
+        index, k = bundle.index, k or self.top_k
+        if mask is not None and not mask.any():
+            return [[] for _ in vectors]
+        query_mat = np.asarray(vectors, dtype="float32").reshape(len(vectors), index.d)
+        params = search_parameters(index, bundle.search_knobs, k, mask)
+        _, indices = index.search(query_mat, k, params=params)
+        return [[int(i) for i in row if i >= 0] for row in indices]
 
-    def _extract_description(self, text):
-        match = re.search(r"Description:\s*(.*?)\s*Job Levels:", text, re.DOTALL)
-        return match.group(1).strip().replace("\n", " ") if match else "No description found."
+    def search_by_vector(self, vector, k=None, mask=None, bundle=None):
+        return self.search_by_vectors([vector], k, mask, bundle)[0]
 
-    def _extract_duration_int(self, text):
-        match = re.search(r"Completion Time in minutes\s*=\s*(\d+)", text, re.IGNORECASE)
-        return int(match.group(1)) if match else 0
+    def _dense_depth(self, bundle=None):
+        return self.retrieval_depth if (bundle or self.bundle).lexical is not None else self.top_k
 
-    def _extract_test_types(self, text):
-        test_type_block = ""
-        try:
-            test_type_block = text.split("test types:")[-1].split("link:")[0].strip()
-        except Exception:
-            return []
-        return [t.strip() for t in test_type_block.split(",") if t.strip()]
+    def _fuse(self, query, dense_rows, mask=None, bundle=None, hints=None):
+        # Reciprocal-rank fusion of FAISS and BM25 rankings, cut to the rerank candidate count.
+        bundle = bundle or self.bundle
+        rows = dense_rows
+        if bundle.lexical is not None:
+            sparse_rows = bundle.lexical.search(query, self.retrieval_depth, mask)
+            rows = reciprocal_rank_fusion([dense_rows, sparse_rows])
+        preferred = bundle.filter_index.preferred(hints)
+        if preferred is not None:
+            # Soft hints only add a vote for matching rows; nothing is filtered out.
+            rows = reciprocal_rank_fusion([rows, [r for r in rows if preferred[r]]])
+        return rows[:self.top_k]
 
-    def _rerank_with_openrouter(self, query, assessments):
+    def retrieve(self, query, vector, mask=None, bundle=None):
+        bundle = bundle or self.bundle
+        dense_rows = self.search_by_vector(vector, self._dense_depth(bundle), mask, bundle)
+        return self._fuse(self._spell(query, bundle)[0], dense_rows, mask, bundle)
+
+    def _spell(self, query, bundle):
+        """(BM25 query, {typo: fix}).
+
+        Fixes are appended to the query as extra BM25 terms, so a wrong fix
+        only adds a term and never loses one the user typed. The embedding
+        and the rerankers get the original text.
+        """
+        if not self.spell_correction:
+            return query, {}
+        _, corrections = bundle.speller.correct(query, self.spell_threshold)
+        if not corrections:
+            return query, corrections
+        return f"{query} {' '.join(corrections.values())}", corrections
+
+    def _filter_mask(self, query, filters=None, bundle=None):
+        """(hard filters, their row mask, soft hints) for `query` and the explicit `filters`."""
+        resolved = resolve_filters(query, filters, self.parse_query_filters)
+        hints = resolve_hints(query, resolved, self.parse_query_filters)
+        return resolved, (bundle or self.bundle).filter_index.mask(resolved), hints
+
+    async def recommend_text_async(self, query: str, rerank=None, filters=None):
+        results, _ = await self.recommend_with_meta_async(query, rerank, filters)
+        return results
+
+    async def _candidates_async(self, query, filters, bundle, timings):
+        """Filters, embedding, FAISS and BM25 fusion: the rerank candidates for `query`.
+
+        Returns Candidates; `degraded` is "lexical" when the embedding failed
+        and BM25 alone produced the rows.
+        """
+        with timings.span("filters"):
+            resolved, mask, hints = self._filter_mask(query, filters, bundle)
+        with timings.span("spell"):
+            lexical_query, corrections = self._spell(query, bundle)
+        degraded = None
         try:
-            prompt = f"""
-You are an assistant that reranks SHL assessments.
-
-Query: {query}
-
-Assessments:
-{json.dumps(assessments, indent=2)}
-
-Reorder and return only the **top 5 to 10 most relevant** assessments as valid JSON.
-If fewer than 10 are highly relevant, return fewer.
-Only include the sorted list as output.
-""".strip()
-
-            completion = self.llm_client.chat.completions.create(
-                extra_headers={
-                    "HTTP-Referer": "http://localhost",
-                    "X-Title": "shl-recommender"
-                },
-                model=self.llm_model,
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant trained on SHL assessments."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.4
-            )
+            with timings.span("embed"):
+                embedded_vector = await self._embed_query_async(query, bundle)
+        except UpstreamError as e:
+            if not (self.degrade_to_lexical and bundle.lexical is not None):
+                print(f"❌ {e}")
+                raise
+            print(f"❌ {e}; answering from BM25 alone")
+            DEGRADED.inc("lexical")
+            embedded_vector, degraded = None, "lexical"
+        with timings.span("search"):
+            dense_rows = [] if degraded else self.search_by_vector(embedded_vector, self._dense_depth(bundle), mask, bundle)
+        with timings.span("lexical"):
+            rows = self._fuse(lexical_query, dense_rows, mask, bundle, hints)
+        return Candidates(resolved, hints, rows, corrections, degraded)
+
+    async def _warm_async(self, requests, concurrency):
+        slots = asyncio.Semaphore(concurrency)
+
+        async def answer(query, strategy, filters):
+            async with slots:
+                try:
+                    _, meta = await self.recommend_with_meta_async(query, strategy, filters)
+                    return meta, None
+                except Exception as e:
+                    return None, e
+
+        return await asyncio.gather(*(answer(*request) for request in requests))
+
+    async def recommend_with_meta_async(self, query: str, rerank=None, filters=None, timings=None):
+        """Like recommend_text_async, also returning a dict describing how the answer was produced.
+
+        meta["timings"] holds the per-stage durations (see metrics.Timings).
+        """
+        bundle = self.bundle
+        timings = timings or Timings()
+        strategy = rerank or self.rerank_strategy
+        cached = self._cached_response(query, strategy, filters, bundle, timings)
+        if cached is not None:
+            records, meta = cached
+            meta["timings"] = timings.finish()
+            return records, meta
+
+        compute = functools.partial(self._answer_async, query, strategy, filters, bundle, timings)
+        if self.in_flight is None:
+            (records, meta), shared = await compute(), False
+        else:
+            # The leader's stages are timed in its own Timings; a follower only records its wait.
+            started = timings.elapsed()
+            (records, meta), shared = await self.in_flight.do(cache_key(query, bundle.version, strategy, filters), compute)
+            if shared:
+                timings.add("coalesced", timings.elapsed() - started)
+        meta = {**meta, "coalesced": shared, "timings": timings.finish()}
+        if shared:
+            records = list(records)
+        else:
+            self._store_response(query, strategy, filters, bundle, records, meta)
+        return records, meta
+
+    async def _answer_async(self, query, strategy, filters, bundle, timings):
+        found = await self._candidates_async(query, filters, bundle, timings)
+        with timings.span("rerank"):
+            reranked, path = await self._rerank_async(query, found.rows, strategy, bundle)
+        RERANK_PATHS.inc(path)
+        with timings.span("records"):
+            records = [bundle.catalog.record(i) for i in reranked]
+        meta = {
+            "rerank": path,
+            "filters": found.filters,
+            "preferences": found.preferences,
+            "corrections": found.corrections,
+            "index_version": bundle.version,
+            "cached": False,
+            "degraded": found.degraded,
+        }
+        return records, meta
+
+    async def recommend_stream_async(self, query: str, rerank=None, filters=None, timings=None):
+        """Yield the retrieval results as soon as they exist, then the reranked list.
+
+        Events are dicts with "event" = "retrieval" or "reranked" and "final"
+        set on the last one. Errors before the first event are raised
+        (ValueError, UpstreamError), so callers can still answer 422/503.
+        """
+        bundle = self.bundle
+        timings = timings or Timings()
+        strategy = rerank or self.rerank_strategy
+        cached = self._cached_response(query, strategy, filters, bundle, timings)
+        if cached is not None:
+            # The final list is already known: a single event.
+            records, meta = cached
+            timings.add("first_result", timings.elapsed())
+            timings.finish()
+            yield {
+                "event": "reranked",
+                "final": True,
+                "recommended_assessments": records,
+                "rerank": meta["rerank"],
+                "filters": meta["filters"],
+                "preferences": meta.get("preferences", {}),
+                "corrections": meta["corrections"],
+                "index_version": meta["index_version"],
+                "cached": True,
+                "elapsed_ms": round(timings.elapsed() * 1000, 2),
+            }
+            return
+
+        found = await self._candidates_async(query, filters, bundle, timings)
+        with timings.span("records"):
+            records = [bundle.catalog.record(i) for i in found.rows]
+        timings.add("first_result", timings.elapsed())
+        final = strategy == "none" or not found.rows
+        yield {
+            "event": "retrieval",
+            "final": final,
+            "recommended_assessments": records,
+            "filters": found.filters,
+            "preferences": found.preferences,
+            "corrections": found.corrections,
+            "index_version": bundle.version,
+            "degraded": found.degraded,
+            "elapsed_ms": round(timings.elapsed() * 1000, 2),
+        }
+        meta = {
+            "filters": found.filters, "preferences": found.preferences, "corrections": found.corrections,
+            "index_version": bundle.version, "degraded": found.degraded,
+        }
+        if final:
+            RERANK_PATHS.inc("none")
+            timings.finish()
+            self._store_response(query, strategy, filters, bundle, records, {**meta, "rerank": "none"})
+            return
 
-            content = completion.choices[0].message.content.strip()
+        with timings.span("rerank"):
+            reranked, path = await self._rerank_async(query, found.rows, strategy, bundle)
+        RERANK_PATHS.inc(path)
+        timings.finish()
+        records = [bundle.catalog.record(i) for i in reranked]
+        self._store_response(query, strategy, filters, bundle, records, {**meta, "rerank": path})
+        yield {
+            "event": "reranked",
+            "final": True,
+            "recommended_assessments": records,
+            "rerank": path,
+            "elapsed_ms": round(timings.elapsed() * 1000, 2),
+            "timings_ms": {stage: round(sec * 1000, 2) for stage, sec in timings.stages.items()},
+        }
+
+    async def _rerank_async(self, query, rows, strategy=None, bundle=None):
+        """Reorder `rows` with the chosen strategy; returns (rows, path that served them).
+
+        The path is "llm", "local", "none", or "faiss" when the LLM failed without a fallback.
+        """
+        bundle = bundle or self.bundle
+        strategy = strategy or self.rerank_strategy
+        if strategy == "none" or not rows:
+            return rows, "none"
+        if strategy == "local":
+            return bundle.local_reranker.rerank(query, rows), "local"
+
+        if strategy == "llm":
             try:
-                return json.loads(content)
-            except json.JSONDecodeError:
-                match = re.search(r"\[.*\]", content, re.DOTALL)
-                if match:
-                    return json.loads(match.group(0))
-                else:
-                    raise ValueError("Could not extract valid JSON from LLM response.")
+                return await self._rerank_with_openrouter_async(query, rows, bundle), "llm"
+            except Exception as e:
+                print(f"❌ Reranking failed: {str(e)}")
+                RERANK_FALLBACKS.inc("circuit_open" if isinstance(e, CircuitOpen) else "error")
+                return rows, "faiss"
+
+        try:
+            # The deadline bounds the upstream call itself, so a slow LLM times out inside
+            # resilient_call and counts against the breaker instead of being cancelled from outside.
+            reranked = await self._rerank_with_openrouter_async(query, rows, bundle, self.rerank_deadline)
+            return reranked, "llm"
+        except DeadlineExceeded:
+            print(f"⏱️ LLM rerank missed the {self.rerank_deadline}s deadline, using local reranker.")
+            RERANK_FALLBACKS.inc("deadline")
+        except AttemptTimeout as e:
+            print(f"⏱️ {e}, using local reranker.")
+            RERANK_FALLBACKS.inc("upstream_timeout")
+        except CircuitOpen:
+            # Fail fast: no point waiting for the deadline of an upstream known to be down.
+            RERANK_FALLBACKS.inc("circuit_open")
         except Exception as e:
-            print(f"❌ Reranking failed: {str(e)}")
-            return assessments
+            print(f"❌ Reranking failed, using local reranker: {str(e)}")
+            RERANK_FALLBACKS.inc("error")
+        return bundle.local_reranker.rerank(query, rows), "local"
+
+    async def recommend_batch_async(self, queries, rerank=None, filters=None, timings=None):
+        """Recommend for many queries at once; failures are reported per item."""
+        bundle = self.bundle
+        timings = timings or Timings("batch_")
+        results = [
+            {
+                "query": q, "recommended_assessments": [], "error": None, "rerank": None, "degraded": None,
+                "applied_filters": None, "preferences": None,
+            }
+            for q in queries
+        ]
+        masks, hints = {}, {}
+        with timings.span("filters"):
+            for i, query in enumerate(queries):
+                try:
+                    results[i]["applied_filters"], masks[i], hints[i] = self._filter_mask(query, filters, bundle)
+                    results[i]["preferences"] = hints[i]
+                except ValueError as e:
+                    results[i]["error"] = str(e)
+        with timings.span("spell"):
+            lexical_queries = [self._spell(query, bundle)[0] for query in queries]
+
+        with timings.span("embed"):
+            vectors = await self._embed_queries_async(queries, bundle)
+
+        # One FAISS search over the stacked query matrix per distinct filter set
+        groups = {}
+        rows_by_item = {}
+        for i, vector in enumerate(vectors):
+            if results[i]["error"]:
+                continue
+            if isinstance(vector, UpstreamError):
+                if not (self.degrade_to_lexical and bundle.lexical is not None):
+                    results[i]["error"] = str(vector)
+                    continue
+                DEGRADED.inc("lexical")
+                results[i]["degraded"] = "lexical"
+                rows_by_item[i] = self._fuse(lexical_queries[i], [], masks[i], bundle, hints[i])
+                continue
+            mask = masks[i]
+            key = None if mask is None else np.packbits(mask).tobytes()
+            groups.setdefault(key, (mask, []))[1].append(i)
+
+        for mask, items in groups.values():
+            with timings.span("search"):
+                dense = self.search_by_vectors(
+                    [vectors[i] for i in items], self._dense_depth(bundle), mask, bundle
+                )
+            with timings.span("lexical"):
+                for i, rows in zip(items, dense):
+                    rows_by_item[i] = self._fuse(lexical_queries[i], rows, mask, bundle, hints[i])
+        if not rows_by_item:
+            timings.finish()
+            return results
+
+        slots = asyncio.Semaphore(self.batch_rerank_concurrency)
+
+        async def rerank_item(i, rows):
+            async with slots:
+                reranked, path = await self._rerank_async(queries[i], rows, rerank, bundle)
+                RERANK_PATHS.inc(path)
+                results[i]["recommended_assessments"] = [bundle.catalog.record(r) for r in reranked]
+                results[i]["rerank"] = path
+
+        with timings.span("rerank"):
+            await asyncio.gather(*(rerank_item(i, rows) for i, rows in rows_by_item.items()))
+        timings.finish()
+        return results
+
+    async def _rerank_with_openrouter_async(self, query, rows, bundle=None, deadline=None):
+        """LLM rerank of `rows` within `deadline` seconds (default RERANK_TIMEOUT); raises on upstream or parse failure."""
+        if not rows:
+            return rows
+        catalog = (bundle or self.bundle).catalog
+        prompt = build_rerank_prompt(query, catalog, rows, self.rerank_token_budget)
+        completion = await get_clients().chat(
+            deadline=deadline,
+            extra_headers={
+                "HTTP-Referer": "http://localhost",
+                "X-Title": "shl-recommender"
+            },
+            model=self.llm_model,
+            messages=[
+                {"role": "system", "content": RERANK_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.4,
+            max_tokens=64
+        )
+
+        content = completion.choices[0].message.content.strip()
+        usage = getattr(completion, "usage", None)
+        print(
+            f"🧮 Rerank ~{estimate_tokens(RERANK_SYSTEM_PROMPT + prompt)} prompt / "
+            f"~{estimate_tokens(content)} completion tokens (estimated)"
+            + (f", {usage.prompt_tokens} / {usage.completion_tokens} reported" if usage else "")
+        )
+        return [rows[p] for p in parse_ranked_ids(content, len(rows))]
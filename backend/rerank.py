@@ -0,0 +1,113 @@
+import re
+import json
+from lexical import tokenize
+from filters import TEST_TYPE_HINTS, parse_max_duration
+
+RERANK_SYSTEM_PROMPT = "You are a helpful assistant trained on SHL assessments."
+RERANK_STRATEGIES = ("llm", "local", "llm_with_fallback", "none")
+
+_ID_LIST_RE = re.compile(r"\[[\d,\s]*\]")
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text; good enough for budgeting and logs.
+    return max(1, len(text) // 4)
+
+
+def truncate(text, max_chars):
+    """`text` cut to at most `max_chars` at a word boundary, with an ellipsis when cut."""
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(" ", 1)[0] + "…"
+
+
+def candidate_summary(catalog, row, max_tokens):
+    flags = []
+    if catalog.remote[row]:
+        flags.append("remote")
+    if catalog.adaptive[row]:
+        flags.append("adaptive")
+    test_types = ", ".join(catalog.test_type_labels[t] for t in catalog.test_types[row])
+    head = f"{catalog.name[row]} | {catalog.duration[row] or '?'} min | {test_types}"
+    if flags:
+        head += " | " + ", ".join(flags)
+    room = max_tokens * 4 - len(head) - 3
+    if room < 40:
+        return head
+    return f"{head} | {truncate(catalog.description[row], room)}"
+
+
+def build_rerank_prompt(query, catalog, rows, token_budget=1200):
+    """Prompt listing candidates as `<id>. <summary>`, where id is the 1-based position in `rows`."""
+    per_candidate = max(24, token_budget // max(1, len(rows)))
+    lines = [f"{n}. {candidate_summary(catalog, row, per_candidate)}" for n, row in enumerate(rows, 1)]
+    candidates = "\n".join(lines)
+    return f"""
+You are an assistant that reranks SHL assessments.
+
+Query: {query}
+
+Candidates:
+{candidates}
+
+Return only a JSON array of the ids of the **top 5 to 10 most relevant** candidates, most relevant first, e.g. [3, 1, 7].
+If fewer than 10 are highly relevant, return fewer. Output nothing else.
+""".strip()
+
+
+def parse_ranked_ids(content, count):
+    """Map the model's ordered id list back to positions 0..count-1, dropping unknown and repeated ids."""
+    try:
+        ids = json.loads(content)
+    except json.JSONDecodeError:
+        match = _ID_LIST_RE.search(content)
+        if not match:
+            raise ValueError("Could not extract an id list from LLM response.")
+        ids = json.loads(match.group(0))
+    if not isinstance(ids, list):
+        raise ValueError("LLM response is not a JSON array.")
+
+    order, seen = [], set()
+    for value in ids:
+        if isinstance(value, bool) or not isinstance(value, (int, str)) or not str(value).isdigit():
+            continue
+        position = int(value) - 1
+        if 0 <= position < count and position not in seen:
+            seen.add(position)
+            order.append(position)
+    if not order:
+        raise ValueError("LLM response contained no valid candidate ids.")
+    return order
+
+
+class LocalReranker:
+    """CPU-only feature scorer over catalog fields, used when the LLM rerank is off or late."""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.name_terms = [set(tokenize(name)) for name in catalog.name]
+        self.description_terms = [set(tokenize(text)) for text in catalog.description]
+
+    def score(self, terms, wanted_types, max_minutes, row, rank):
+        score = 1.0 / (rank + 1)  # keep some of the retrieval order as a prior
+        if terms:
+            score += 3.0 * len(terms & self.name_terms[row]) / len(terms)
+            score += 1.0 * len(terms & self.description_terms[row]) / len(terms)
+        if wanted_types:
+            labels = {self.catalog.test_type_labels[t] for t in self.catalog.test_types[row]}
+            score += 1.5 * len(wanted_types & labels) / len(wanted_types)
+        duration = self.catalog.duration[row]
+        if max_minutes and duration:
+            score += 0.5 if duration <= max_minutes else -1.0
+        return score
+
+    def rerank(self, query, rows):
+        terms = set(tokenize(query))
+        wanted_types = {TEST_TYPE_HINTS[t] for t in terms if t in TEST_TYPE_HINTS}
+        max_minutes = parse_max_duration(query)
+        scored = [
+            (self.score(terms, wanted_types, max_minutes, row, rank), row)
+            for rank, row in enumerate(rows)
+        ]
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [row for _, row in scored]
@@ -0,0 +1,183 @@
+import time
+import random
+import asyncio
+import threading
+
+from metrics import UPSTREAM_RETRIES, UPSTREAM_HEDGES, UPSTREAM_SHORT_CIRCUITS
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class AttemptTimeout(Exception):
+    """An upstream call ran out of its own time; unlike asyncio.TimeoutError, never a caller's deadline."""
+
+
+class DeadlineExceeded(AttemptTimeout):
+    """The try that timed out was cut short by the call's overall deadline, not its attempt timeout."""
+
+
+class RetryBudget:
+    """Retries allowed as a fraction of calls, so an outage cannot multiply upstream load.
+
+    Every call deposits `ratio` tokens, every retry or hedge withdraws one;
+    `reserve` tokens (also the cap) cover retries after a quiet period.
+    """
+
+    def __init__(self, ratio=0.2, reserve=10):
+        self.ratio = ratio
+        self.reserve = reserve
+        self.tokens = float(reserve)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.reserve, self.tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class CircuitBreaker:
+    """closed -> open after `failures` consecutive failures; open fails fast for `reset_after` seconds,
+    then half-open lets a single probe call through, which closes or reopens the circuit."""
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+    def __init__(self, name, failures=5, reset_after=30.0):
+        self.name = name
+        self.failures = failures
+        self.reset_after = reset_after
+        self.state = self.CLOSED
+        self.consecutive = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.opened = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """None to fail fast, else "call", or "probe" for the one call let through while half-open."""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_after:
+                self.state = self.HALF_OPEN
+            if self.state == self.CLOSED:
+                return "call"
+            if self.state == self.HALF_OPEN and not self.probing:
+                self.probing = True
+                return "probe"
+            return None
+
+    def success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                print(f"✅ {self.name} circuit closed")
+            self.state, self.consecutive, self.probing = self.CLOSED, 0, False
+
+    def failure(self):
+        with self._lock:
+            self.consecutive += 1
+            if self.state == self.HALF_OPEN or self.consecutive >= self.failures:
+                if self.state != self.OPEN:
+                    print(f"🔌 {self.name} circuit open after {self.consecutive} failures, failing fast for {self.reset_after}s")
+                    self.opened += 1
+                self.state, self.opened_at, self.probing = self.OPEN, time.monotonic(), False
+
+    def release(self):
+        # A probe that ended without an answer (caller cancelled) proves nothing either way.
+        with self._lock:
+            self.probing = False
+
+    def stats(self):
+        return {"state": self.state, "consecutive_failures": self.consecutive, "times_opened": self.opened}
+
+
+def backoff(attempt, base=0.1, cap=2.0):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^attempt)]."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def _retrieve(task):
+    if not task.cancelled():
+        task.exception()  # the losing attempt's error is expected, not an unhandled one
+
+
+async def hedged(name, attempt, hedge_after, budget):
+    """Run `attempt()`; if it has not answered after `hedge_after` seconds, race a second copy against it."""
+    first = asyncio.ensure_future(attempt())
+    first.add_done_callback(_retrieve)
+    tasks = [first]
+    try:
+        done, _ = await asyncio.wait({first}, timeout=hedge_after)
+        if done or not budget.withdraw():
+            return await first
+        UPSTREAM_HEDGES.inc(name, "sent")
+        second = asyncio.ensure_future(attempt())
+        second.add_done_callback(_retrieve)
+        tasks.append(second)
+        pending = {first, second}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is second:
+                        UPSTREAM_HEDGES.inc(name, "won")
+                    return task.result()
+        return await first  # both failed: raise the original error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def resilient_call(name, attempt, breaker, budget, deadline, attempt_timeout, retries=0,
+                         hedge_after=0.0, retryable=lambda e: True):
+    """Call `attempt()` (a coroutine function) under a breaker, an overall deadline and a retry budget.
+
+    Each try gets at most `attempt_timeout` seconds and the whole call at most
+    `deadline`. Retryable errors are retried with jittered backoff while
+    budget and deadline last. Only retryable errors count against the
+    breaker: an upstream answering 400 is up. Raises CircuitOpen without
+    calling when the breaker is open, AttemptTimeout when the last try ran
+    out of time and DeadlineExceeded when the deadline did. Timeouts count
+    against the breaker like any retryable error.
+    """
+    ticket = breaker.allow()
+    if ticket is None:
+        UPSTREAM_SHORT_CIRCUITS.inc(name)
+        raise CircuitOpen(f"{name} circuit is open")
+    budget.deposit()
+    loop = asyncio.get_running_loop()
+    give_up_at = loop.time() + deadline
+    try:
+        for n in range(retries + 1):
+            timeout = min(attempt_timeout, give_up_at - loop.time())
+            try:
+                call = hedged(name, attempt, hedge_after, budget) if hedge_after else attempt()
+                try:
+                    result = await asyncio.wait_for(call, max(timeout, 0.001))
+                except asyncio.TimeoutError:
+                    error = DeadlineExceeded if timeout < attempt_timeout else AttemptTimeout
+                    raise error(f"{name} did not answer within {max(timeout, 0):.2f}s") from None
+                breaker.success()
+                return result
+            except Exception as e:
+                if not retryable(e):
+                    breaker.success()
+                    raise
+                delay = backoff(n)
+                if n == retries or loop.time() + delay >= give_up_at:
+                    breaker.failure()
+                    raise
+                if not budget.withdraw():
+                    UPSTREAM_RETRIES.inc(name, "budget_exhausted")
+                    breaker.failure()
+                    raise
+                UPSTREAM_RETRIES.inc(name, "retried")
+                await asyncio.sleep(delay)
+    finally:
+        if ticket == "probe":
+            breaker.release()
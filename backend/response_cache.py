@@ -0,0 +1,89 @@
+import os
+import json
+import time
+
+from embedding_cache import LRUCache, normalize_query
+
+SNAPSHOT_VERSION = 1
+
+
+def cache_key(query, index_version, strategy, filters=None):
+    """Responses depend on the query text, the index served, the rerank strategy and the explicit filters."""
+    return (
+        normalize_query(query),
+        index_version,
+        strategy,
+        json.dumps(filters or {}, sort_keys=True, separators=(",", ":")),
+    )
+
+
+class ResponseCache:
+    """TTL + LRU cache of finished recommendation responses, (records, meta) per key.
+
+    Only answers produced the way the strategy intended are stored (a rerank
+    that fell back to FAISS order is not something to repeat for an hour).
+    Entries of an older index version are never hit again and simply age out.
+    """
+
+    def __init__(self, capacity=1024, ttl=3600):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.memory = LRUCache(capacity, ttl)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, query, index_version, strategy, filters=None):
+        entry = self.memory.get(cache_key(query, index_version, strategy, filters))
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def set(self, query, index_version, strategy, filters, records, meta):
+        key = cache_key(query, index_version, strategy, filters)
+        meta = {k: v for k, v in meta.items() if k not in ("timings", "cached", "coalesced")}
+        self.memory.set(key, (records, meta))
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.memory), "capacity": self.capacity}
+
+    # === Snapshots (see warm_cache.py) ===
+    def save_snapshot(self, path, index_version):
+        entries = []
+        for (query, version, strategy, filters), (records, meta) in self.memory.items():
+            if version == index_version:
+                entries.append({
+                    "query": query, "strategy": strategy, "filters": json.loads(filters),
+                    "records": records, "meta": meta,
+                })
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": SNAPSHOT_VERSION,
+                "created": time.time(),
+                "index_version": index_version,
+                "entries": entries,
+            }, f)
+        os.replace(tmp, path)
+        return len(entries)
+
+    def load_snapshot(self, path, index_version):
+        """Load the entries of a snapshot made for `index_version`; returns how many were loaded."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except ValueError as e:
+            print(f"⚠️ Ignoring unreadable response cache snapshot {path}: {e}")
+            return 0
+        if snapshot.get("version") != SNAPSHOT_VERSION or snapshot.get("index_version") != index_version:
+            print(f"⚠️ Ignoring response cache snapshot {path}: made for index {snapshot.get('index_version')}")
+            return 0
+        # Answers for the same index version stay valid; the TTL starts at load time.
+        for entry in snapshot["entries"][:self.capacity]:
+            self.set(entry["query"], index_version, entry["strategy"], entry["filters"],
+                     entry["records"], entry["meta"])
+        return min(len(snapshot["entries"]), self.capacity)
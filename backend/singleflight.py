@@ -0,0 +1,65 @@
+import asyncio
+import weakref
+from collections import Counter
+
+from upstream import counting_calls
+from metrics import COALESCED, COALESCED_SAVED_CALLS
+
+
+class SingleFlight:
+    """Run one computation per key at a time; concurrent callers with the same key share its result.
+
+    The computation runs in its own task, shielded from the callers: a client
+    that disconnects does not cancel it for the others. Exceptions reach every
+    caller. Upstream calls made by the computation are counted, and each
+    caller that shared it adds them to the calls saved. Flights are per event
+    loop, like the upstream clients, since tasks cannot be awaited across loops.
+    """
+
+    def __init__(self):
+        self._flights = weakref.WeakKeyDictionary()  # event loop -> {key: (task, calls)}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key, compute):
+        """Await `compute()` (a coroutine function) or join the identical call in flight; returns (result, shared)."""
+        loop = asyncio.get_running_loop()
+        flights = self._flights.get(loop)
+        if flights is None:
+            flights = self._flights[loop] = {}
+        flight = flights.get(key)
+        shared = flight is not None
+        if shared:
+            self.followers += 1
+            COALESCED.inc("follower")
+        else:
+            self.leaders += 1
+            COALESCED.inc("leader")
+            flight = flights[key] = self._start(loop, flights, key, compute)
+        task, calls = flight
+        result = await asyncio.shield(task)
+        if shared:
+            for upstream, n in calls.items():
+                COALESCED_SAVED_CALLS.inc(upstream, amount=n)
+        return result, shared
+
+    def _start(self, loop, flights, key, compute):
+        calls = Counter()
+
+        async def run():
+            counting_calls(calls)  # the task has its own context, so this counts only the computation's calls
+            return await compute()
+
+        task = loop.create_task(run())
+        task.add_done_callback(lambda done: self._land(flights, key, done))
+        return task, calls
+
+    @staticmethod
+    def _land(flights, key, task):
+        flights.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # retrieved here, so an error nobody waited for is not logged as unhandled
+
+    def stats(self):
+        in_flight = sum(len(flights) for flights in list(self._flights.values()))
+        return {"leaders": self.leaders, "followers": self.followers, "in_flight": in_flight}
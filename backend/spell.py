@@ -0,0 +1,225 @@
+import re
+from difflib import SequenceMatcher
+from collections import Counter
+
+_WORD_RE = re.compile(r"[A-Za-z]+")
+
+# Skills and technologies users ask for that the catalog may never mention: never
+# "corrected" into a catalog word (Rust -> must), and valid targets for typos (Jva -> java).
+SKILL_TERMS = frozenset("""
+    java javascript typescript python ruby rust scala swift kotlin golang go perl php sql nosql mysql
+    postgres postgresql oracle mongodb redis kafka spark hadoop hive tableau excel powerbi vba matlab
+    fortran cobol pascal haskell elixir erlang clojure julia dart flutter groovy lua bash shell powershell
+    linux unix windows android ios html css sass react angular vue node nodejs django flask spring
+    hibernate rails laravel dotnet net asp jquery ajax xml json rest graphql api aws azure gcp docker
+    kubernetes terraform ansible jenkins git selenium cucumber junit pytest sap salesforce sharepoint
+    jira agile scrum devops mlops etl tensorflow pytorch pandas numpy word outlook photoshop
+""".split())
+
+# Everyday words of hiring queries that are not catalog vocabulary but are not typos either.
+COMMON_WORDS = frozenset("""
+    hire hiring hired role roles job jobs team teams senior junior mid entry grad graduate graduates
+    intern interns fresher freshers year years minute minutes min mins hour hours within under less
+    than about around max maximum quick short long must should also like please want needs recommend
+    suggest find help someone people person company startup new good strong great best based
+    experienced background looking screen screening collaborate collaborative budget remote onsite
+    test tests testing assessment assessments candidate candidates
+""".split())
+
+_SUFFIXES = ("s", "es", "ed", "d", "er", "ers", "ing")
+
+
+def edit_distance(a, b, limit):
+    """Optimal-string-alignment distance between `a` and `b`, or limit + 1 once it exceeds `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        row = [i] + [0] * len(b)
+        best = i
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], prev2[j - 2] + 1)
+            best = min(best, row[j])
+        if best > limit:
+            return limit + 1
+        prev2, prev = prev, row
+    return prev[-1] if prev[-1] <= limit else limit + 1
+
+
+def _deletes(word, max_edit):
+    found, frontier = set(), {word}
+    for _ in range(max_edit):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - found
+        found |= frontier
+    return found
+
+
+class SpellIndex:
+    """SymSpell-style word corrector: every vocabulary word is stored under all
+    variants with up to `max_edit` characters deleted (of its first
+    `prefix_length` characters), so a lookup only generates the deletes of the
+    query word instead of comparing it against the whole vocabulary.
+
+    Used by the API to fix typos inside a query. It is kept apart from
+    NameIndex on purpose: it corrects single words, so it cannot tell which
+    product a garbled multi-word name meant.
+    """
+
+    def __init__(self, max_edit=2, prefix_length=7, min_length=4, min_count=2):
+        self.max_edit = max_edit
+        self.prefix_length = prefix_length
+        self.min_length = min_length
+        self.min_count = min_count
+        self.counts = Counter()
+        self.deletes = {}
+        self._memo = {}  # query words repeat a lot; bounded, cleared when full
+
+    @classmethod
+    def from_texts(cls, texts, **kwargs):
+        index = cls(**kwargs)
+        for text in texts:
+            index.counts.update(w.lower() for w in _WORD_RE.findall(text or "") if len(w) >= 3)
+        index.counts.update(SKILL_TERMS)
+        index.build()
+        return index
+
+    @classmethod
+    def from_catalog(cls, catalog, **kwargs):
+        texts = list(catalog.name) + list(catalog.description) + list(catalog.test_type_labels)
+        return cls.from_texts(texts, **kwargs)
+
+    def build(self):
+        self.deletes = {}
+        self._memo = {}
+        for word in self.counts:
+            prefix = word[:self.prefix_length]
+            for variant in _deletes(prefix, self.max_edit) | {prefix}:
+                self.deletes.setdefault(variant, []).append(word)
+
+    def __contains__(self, word):
+        return word in self.counts
+
+    def __len__(self):
+        return len(self.counts)
+
+    def known(self, word):
+        """Vocabulary words, skill terms, common query words and inflections of vocabulary words."""
+        word = word.lower()
+        if word in self.counts or word in COMMON_WORDS:
+            return True
+        stems = [word[:-len(suffix)] for suffix in _SUFFIXES if word.endswith(suffix)]
+        forms = stems + [word + suffix for suffix in _SUFFIXES] + [stem + "e" for stem in stems]
+        return any(form in self.counts for form in forms if len(form) >= 3)
+
+    def lookup(self, word, max_edit=None):
+        """Closest vocabulary word as (word, distance), preferring frequent words on ties; or None."""
+        word = word.lower()
+        max_edit = self.max_edit if max_edit is None else min(max_edit, self.max_edit)
+        if word in self.counts:
+            return word, 0
+        key = (word, max_edit)
+        if key in self._memo:
+            return self._memo[key]
+        if len(self._memo) >= 10000:
+            self._memo.clear()
+        self._memo[key] = result = self._search(word, max_edit)
+        return result
+
+    def _search(self, word, max_edit):
+        prefix = word[:self.prefix_length]
+        best, best_key, seen = None, None, set()
+        for variant in _deletes(prefix, max_edit) | {prefix}:
+            for candidate in self.deletes.get(variant, ()):
+                if candidate in seen or abs(len(candidate) - len(word)) > max_edit:
+                    continue
+                seen.add(candidate)
+                distance = edit_distance(word, candidate, max_edit)
+                if distance > max_edit:
+                    continue
+                key = (distance, -self.counts[candidate])
+                if best_key is None or key < best_key:
+                    best, best_key = (candidate, distance), key
+        return best
+
+    def correct(self, text, threshold=0.75):
+        """Replace unknown words by their closest vocabulary word.
+
+        Known words (see `known`) are never touched. A word is only changed
+        when 1 - distance / length >= `threshold`, the length being the longer
+        of typo and fix; words up to 7 letters get at most one edit, and words
+        shorter than `min_length` are only fixed into skill terms. The fix must
+        appear `min_count` times in the catalog, unless it is a skill term, so
+        rare words do not attract typos. Returns (text, {typo: fix}).
+        """
+        corrections = {}
+
+        def fix(match):
+            word = match.group(0)
+            lower = word.lower()
+            if len(word) < 3 or self.known(lower):
+                return word
+            found = self.lookup(lower, 1 if len(word) <= 7 else 2)
+            if found is None:
+                return word
+            candidate, distance = found
+            skill = candidate in SKILL_TERMS
+            if len(word) < self.min_length and not skill:
+                return word
+            if not skill and self.counts[candidate] < self.min_count:
+                return word
+            if 1 - distance / max(len(word), len(candidate)) < threshold:
+                return word
+            corrections[word] = candidate
+            return candidate
+
+        return _WORD_RE.sub(fix, text), corrections
+
+
+def _trigrams(text):
+    padded = f"  {text.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """Character-trigram index over names, for "did you mean <product>?" lookups.
+
+    Candidates are the names sharing the most trigrams with the query; only
+    those few are scored with difflib's ratio, so the cutoff means the same
+    as get_close_matches' but the cost no longer grows with the catalog.
+    Used by the chatbot, and kept apart from SpellIndex on purpose: it
+    scores the whole query against whole names, so it cannot fix one typo
+    inside a longer query.
+    """
+
+    def __init__(self, names, candidates=8):
+        self.names = list(dict.fromkeys(n for n in names if n))
+        self.candidates = candidates
+        self.postings = {}
+        for i, name in enumerate(self.names):
+            for gram in _trigrams(name):
+                self.postings.setdefault(gram, []).append(i)
+        # Trigrams found in a large share of names carry no signal and are the expensive ones.
+        self.max_posting = max(1000, len(self.names) // 20)
+
+    def best_match(self, query, cutoff=0.7):
+        """Most similar name with ratio >= `cutoff` (case-insensitive), or None."""
+        query_grams = _trigrams(query)
+        overlap = Counter()
+        for gram in query_grams:
+            posting = self.postings.get(gram, ())
+            if len(posting) <= self.max_posting:
+                overlap.update(posting)
+        best, best_ratio = None, cutoff
+        matcher = SequenceMatcher()
+        matcher.set_seq2(query.lower())
+        for i, _ in overlap.most_common(self.candidates):
+            matcher.set_seq1(self.names[i].lower())
+            if matcher.real_quick_ratio() < best_ratio or matcher.quick_ratio() < best_ratio:
+                continue
+            ratio = matcher.ratio()
+            if ratio >= best_ratio:
+                best, best_ratio = self.names[i], ratio
+        return best
@@ -2,20 +2,24 @@
 
 import json
 import os
-from sentence_transformers import SentenceTransformer
+import hashlib
 import faiss
-import numpy as np
-from tqdm import tqdm
+from catalog import iter_products, product_document
+from index_factory import build_index
+from embedders import LocalEmbedder
+from bundle import build_bundle, set_current, CURRENT_NAME
 
 # === Config ===
 EMBED_MODEL_NAME = "BAAI/bge-small-en-v1.5"
 INPUT_JSON_PATH = "data\shl_product_details_full.json"
 OUTPUT_INDEX_PATH = "data\\faiss_index.bin"
 OUTPUT_DOCSTORE_PATH = "data\docstore.json"
+OUTPUT_BUNDLES_DIR = "data\\bundles"
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")  # flat, hnsw, ivf_flat, ivf_pq, sq8, fp16
 
 # === Step 1: Load Model ===
 print("\n🔍 Loading embedding model...")
-model = SentenceTransformer(EMBED_MODEL_NAME)
+model = LocalEmbedder(EMBED_MODEL_NAME)  # same encoder the API uses for local:* bundles
 
 # === Step 2: Load Product JSON ===
 print("📖 Loading SHL products...")
@@ -23,55 +27,20 @@ with open(INPUT_JSON_PATH, "r", encoding="utf-8") as f:
     raw_data = json.load(f)
 
 # === Step 3: Convert to Flat List of Chunks ===
-documents = []
-doc_id = 0
-
-def format_downloads(download_list):
-    if not download_list:
-        return "None"
-    return "\n".join(
-        f"- {item.get('title', '')}: {item.get('url', '')} ({item.get('language', '')})"
-        for item in download_list
-    )
-
 print("\n🧱 Preparing documents for embedding...")
-for category in ["pre_packaged_solutions", "individual_test_solutions"]:
-    for item in raw_data[category]:
-        text = f"""
-        Name: {item.get('name', '')}
-        Title: {item.get('title', '')}
-        Description: {item.get('description', '')}
-        Job Levels: {item.get('job_levels', '')}
-        Languages: {item.get('languages', '')}
-        Assessment Length: {item.get('assessment_length', '')}
-        Remote Testing: {item.get('remote_testing', '')}
-        Adaptive/IRT: {item.get('adaptive_irt', '')}
-        Test Types: {', '.join(item.get('test_types', []))}
-        Link: {item.get('link', '')}
-        Downloads:
-        {format_downloads(item.get('downloads', []))}
-        """
-        text = text.strip().replace("\n", " ")
-        documents.append({
-            "id": doc_id,
-            "text": text,
-            "source": item.get("link", ""),
-            "name": item.get("name", "")
-        })
-        doc_id += 1
+documents = [product_document(item, doc_id) for doc_id, item in enumerate(iter_products(raw_data))]
 
 print(f"📚 Total documents to embed: {len(documents)}")
 
 # === Step 4: Embed Texts ===
 print("\n📌 Embedding documents...")
 texts = [doc["text"] for doc in documents]
-embeddings = model.encode(texts, show_progress_bar=True, convert_to_numpy=True)
+embeddings = model.embed(texts)
 
 # === Step 5: Build FAISS Index ===
-print("\n📦 Building FAISS index...")
-dim = embeddings.shape[1]
-index = faiss.IndexFlatL2(dim)
-index.add(embeddings)
+print(f"\n📦 Building FAISS index ({INDEX_TYPE})...")
+index, index_params = build_index(embeddings, INDEX_TYPE)
+print(f"⚙️ Index parameters: {index_params}")
 faiss.write_index(index, OUTPUT_INDEX_PATH)
 print(f"✅ Saved FAISS index to: {OUTPUT_INDEX_PATH}")
 
@@ -80,4 +49,18 @@ print(f"🧾 Saving docstore metadata to: {OUTPUT_DOCSTORE_PATH}")
 with open(OUTPUT_DOCSTORE_PATH, "w", encoding="utf-8") as f:
     json.dump(documents, f, indent=2, ensure_ascii=False)
 
+# === Step 7: Publish an API bundle ===
+# The catalog and BM25 index are derived from these documents, so they ship in a
+# bundle with this very index; the loose data/ files belong to faiss_index.idx.
+print(f"🗂️ Saving catalog, BM25 index and manifest to a bundle in: {OUTPUT_BUNDLES_DIR}")
+version = build_bundle(
+    OUTPUT_BUNDLES_DIR, index, documents, raw_data,
+    build_key=hashlib.sha256("\n".join(texts).encode("utf-8")).hexdigest() + INDEX_TYPE,
+    embedding_model=model.name,
+    index_type=INDEX_TYPE,
+    index_params=index_params,
+)
+set_current(OUTPUT_BUNDLES_DIR, version)
+print(f"📌 {CURRENT_NAME} -> {version}")
+
 print("\n✅ All Done! You can now use FAISS + docstore for RAG.")
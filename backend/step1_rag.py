@@ -1,15 +1,18 @@
-# 📁 step1_rag.py — SHL RAG chatbot with LangChain memory, feedback, multi-model scoring
+# 📁 step1_rag.py — SHL RAG chatbot with token-budgeted memory, feedback, multi-model scoring
 
 import os
 import json
+import time
 import faiss
 import numpy as np
 from datetime import datetime
-from difflib import get_close_matches
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, ALL_COMPLETED
 from sentence_transformers import SentenceTransformer
 from openai import OpenAI
-from langchain.memory import ConversationBufferMemory
-from langchain.schema import HumanMessage
+from spell import NameIndex
+from rerank import estimate_tokens
+from chat_memory import ChatMemory, ContextTrimmer
+from jsonl_logger import from_env as jsonl_logger
 
 # === Config ===
 EMBED_MODEL_NAME = "BAAI/bge-small-en-v1.5"
@@ -19,6 +22,11 @@ LOG_FILE = "chat_logs.json"
 FEEDBACK_FILE = "feedback.json"
 TOP_K = 5
 SPELL_THRESHOLD = 0.7
+TURN_DEADLINE = float(os.getenv("TURN_DEADLINE", "45"))      # seconds to wait for model answers per turn
+EARLY_STOP_SCORE = float(os.getenv("EARLY_STOP_SCORE", "0"))  # stop at the first answer scoring this high (0 = off)
+MEMORY_TOKENS = int(os.getenv("MEMORY_TOKENS", "800"))        # history budget per prompt (0 = keep everything)
+MEMORY_TURNS = int(os.getenv("MEMORY_TURNS", "4"))            # turns kept verbatim, older ones are summarized
+CONTEXT_DOC_TOKENS = int(os.getenv("CONTEXT_DOC_TOKENS", "200"))  # per retrieved document (0 = full text)
 
 OPENROUTER_MODELS = [
     "meta-llama/llama-3.3-70b-instruct:free",
@@ -29,6 +37,7 @@ OPENROUTER_MODELS = [
 # === OpenRouter Setup ===
 client = OpenAI(
     base_url="https://openrouter.ai/api/v1",
+    timeout=TURN_DEADLINE,
     api_key=os.getenv("OPENROUTER_API_KEY", "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"),
 )
 
@@ -38,28 +47,41 @@ index = faiss.read_index(INDEX_PATH)
 with open(DOCSTORE_PATH, "r", encoding="utf-8") as f:
     docstore = json.load(f)
 
+# Built once: a trigram index instead of a difflib scan over every name on each turn
+name_index = NameIndex(doc["name"] for doc in docstore)
+
 print("🔍 Loading embedding model...")
 embedding_model = SentenceTransformer(EMBED_MODEL_NAME)
 
+# === Logs ===
+# Written by a background thread: a turn no longer waits on three file appends.
+chat_log = jsonl_logger(LOG_FILE, prefix="CHAT_LOG")
+feedback_log = jsonl_logger(FEEDBACK_FILE, prefix="FEEDBACK_LOG")
+
 # === Memory ===
-memory = ConversationBufferMemory(return_messages=True)
+memory = ChatMemory(max_tokens=MEMORY_TOKENS, window_turns=MEMORY_TURNS)
+trimmer = ContextTrimmer(CONTEXT_DOC_TOKENS)
 
 # === Spell Correction ===
 def fuzzy_match(query):
-    names = [doc["name"] for doc in docstore]
-    match = get_close_matches(query, names, n=1, cutoff=SPELL_THRESHOLD)
-    return match[0] if match else None
+    return name_index.best_match(query, cutoff=SPELL_THRESHOLD)
 
 # === Similarity Search ===
-def search(query):
-    embeddings = np.array(embedding_model.encode([query]))
+def embed_query(query):
+    return np.array(embedding_model.encode([query]))
+
+def search(query_embed):
     # print(f"🔎 FAISS index type: {type(index)}")
-    _, indices = index.search(embeddings, TOP_K)
+    _, indices = index.search(query_embed, TOP_K)
     return [docstore[i] for i in indices[0]]
 
 # === Prompt Builder ===
-def build_prompt(query, memory_text, matches):
-    context = "\n\n".join(doc["text"] for doc in matches)
+def build_context(query, matches):
+    if not CONTEXT_DOC_TOKENS:
+        return "\n\n".join(doc["text"] for doc in matches)
+    return trimmer.context(matches, query)
+
+def build_prompt(query, memory_text, context):
     return f"""
 You are a helpful assistant trained on the SHL product catalog.
 
@@ -84,16 +106,14 @@ User: {query}
 Answer:
 """.strip()
 
-from sentence_transformers import util
+def is_error(response):
+    return response.startswith("[ERROR from")
 
-def rank_responses(query, responses):
-    query_embed = embedding_model.encode(query)
-    scores = [
-        (model, response, util.cos_sim(embedding_model.encode(response), query_embed).item())
-        for model, response in responses
-    ]
-    scores.sort(key=lambda x: x[2], reverse=True)
-    return scores[0]  # Return the best
+def score_responses(query_embed, responses):
+    """Cosine similarity of each response to the query, encoding all responses in one batch."""
+    response_embeds = embedding_model.encode([r for _, r in responses], normalize_embeddings=True)
+    query_vec = query_embed[0] / (np.linalg.norm(query_embed[0]) or 1.0)
+    return response_embeds @ query_vec
 
 # === OpenRouter Call ===
 def call_model(prompt, model_name):
@@ -116,27 +136,69 @@ Do not hallucinate facts unrelated to SHL. Politely refuse totally unrelated top
     except Exception as e:
         return f"[ERROR from {model_name}]: {str(e)}"
 
+# === Concurrent Fan-out ===
+def fan_out(query, prompt, query_embed):
+    """Ask every model at once and return (model, response, score) of the best answer, or None.
+
+    Waits at most TURN_DEADLINE seconds. Answers are scored as they arrive, with one
+    batched encode per arrival, and with EARLY_STOP_SCORE set the first answer
+    reaching it wins without waiting for slower models. Errors are logged, never scored.
+    """
+    pool = ThreadPoolExecutor(max_workers=len(OPENROUTER_MODELS))
+    futures = {pool.submit(call_model, prompt, model): model for model in OPENROUTER_MODELS}
+    pending = set(futures)
+    deadline = time.monotonic() + TURN_DEADLINE
+    best = None
+    try:
+        while pending:
+            done, pending = wait(
+                pending,
+                timeout=max(0.0, deadline - time.monotonic()),
+                return_when=FIRST_COMPLETED if EARLY_STOP_SCORE else ALL_COMPLETED,
+            )
+            if not done:
+                print(f"⏱️ No answer from {', '.join(futures[f] for f in pending)} within {TURN_DEADLINE:.0f}s")
+                break
+
+            answers = []
+            for future in done:
+                model, response = futures[future], future.result()
+                log_chat(query, response, model)
+                if is_error(response):
+                    print(f"⚠️ {response}")
+                else:
+                    answers.append((model, response))
+            if answers:
+                for (model, response), score in zip(answers, score_responses(query_embed, answers)):
+                    if best is None or score > best[2]:
+                        best = (model, response, float(score))
+
+            if EARLY_STOP_SCORE and best and best[2] >= EARLY_STOP_SCORE:
+                if pending:
+                    print(f"⚡ {best[0]} scored {best[2]:.2f}, not waiting for {len(pending)} slower model(s)")
+                break
+    finally:
+        # Calls still running finish in the background (bounded by the client timeout); queued ones are dropped.
+        pool.shutdown(wait=False, cancel_futures=True)
+    return best
+
 # === Logging ===
 def log_chat(user_query, response, model_used):
-    log = {
+    chat_log.log({
         "timestamp": datetime.now().isoformat(),
         "query": user_query,
         "model": model_used,
         "response": response
-    }
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(json.dumps(log) + "\n")
+    })
 
 def record_feedback(query, response, score, model):
-    feedback = {
+    feedback_log.log({
         "timestamp": datetime.now().isoformat(),
         "query": query,
         "model": model,
         "response": response,
         "score": score
-    }
-    with open(FEEDBACK_FILE, "a", encoding="utf-8") as f:
-        f.write(json.dumps(feedback) + "\n")
+    })
 
 # === Main Chat Loop ===
 print("\n🤖 SHL Chatbot ready! Ask anything about SHL. Type 'exit' to quit.\n")
@@ -151,26 +213,25 @@ while True:
         print(f"🤖 Bot: Did you mean **{best_match}**? Using best match.")
         query = best_match
 
-    memory_text = "\n".join(
-        f"User: {msg.content}" if isinstance(msg, HumanMessage) else f"Bot: {msg.content}"
-        for msg in memory.buffer
+    query_embed = embed_query(query)
+    top_docs = search(query_embed)
+    memory_text = memory.render()
+    context = build_context(query, top_docs)
+    prompt = build_prompt(query, memory_text, context)
+    print(
+        f"📏 Prompt ~{estimate_tokens(prompt)} tokens "
+        f"(memory {memory.tokens()} over {len(memory)}/{memory.total_turns} turns, context {estimate_tokens(context)})"
     )
 
-    top_docs = search(query)
-    prompt = build_prompt(query, memory_text, top_docs)
-
     print("🧠 Comparing model responses...\n")
-    responses = []
-    for model in OPENROUTER_MODELS:
-        response = call_model(prompt, model)
-        responses.append((model, response))
-        log_chat(query, response, model)
-
-    best_model, best_response, best_score = rank_responses(query, responses)
+    best = fan_out(query, prompt, query_embed)
+    if best is None:
+        print("🤖 Bot: Sorry, none of the models answered. Please try again.")
+        continue
 
+    best_model, best_response, best_score = best
     print(f"🤖 Bot (via {best_model}): {best_response}")
-    memory.chat_memory.add_user_message(query)
-    memory.chat_memory.add_ai_message(best_response)
+    memory.add_turn(query, best_response)
 
     # for model in OPENROUTER_MODELS:
     #     print(f"📡 Model: {model}")
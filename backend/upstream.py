@@ -0,0 +1,206 @@
+import os
+import asyncio
+import weakref
+import contextvars
+from collections import Counter
+
+import httpx
+from openai import AsyncOpenAI, APIConnectionError, APITimeoutError
+from metrics import UPSTREAM_ERRORS
+from resilience import AttemptTimeout, CircuitBreaker, CircuitOpen, RetryBudget, resilient_call
+
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+
+EMBED_TIMEOUT = float(os.getenv("EMBED_TIMEOUT", "10"))
+RERANK_TIMEOUT = float(os.getenv("RERANK_TIMEOUT", "30"))
+# Each try gets the attempt timeout; retries happen while the call's overall timeout above lasts.
+EMBED_ATTEMPT_TIMEOUT = float(os.getenv("EMBED_ATTEMPT_TIMEOUT", "3"))
+RERANK_ATTEMPT_TIMEOUT = float(os.getenv("RERANK_ATTEMPT_TIMEOUT", "15"))
+EMBED_RETRIES = int(os.getenv("EMBED_RETRIES", "2"))
+RERANK_RETRIES = int(os.getenv("RERANK_RETRIES", "1"))
+EMBED_HEDGE_AFTER = float(os.getenv("EMBED_HEDGE_AFTER", "0"))  # seconds; 0 = no hedged embeds
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "64"))
+RERANK_CONCURRENCY = int(os.getenv("RERANK_CONCURRENCY", "32"))
+MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+EMBED_BATCH_SIZE = 100  # batchEmbedContents limit
+
+
+class UpstreamError(Exception):
+    pass
+
+
+# Per process, shared by every event loop: one view of each upstream's health.
+BREAKERS = {
+    name: CircuitBreaker(
+        name,
+        failures=int(os.getenv("BREAKER_FAILURES", "5")),
+        reset_after=float(os.getenv("BREAKER_RESET", "30")),
+    )
+    for name in ("gemini", "openrouter")
+}
+BUDGETS = {
+    name: RetryBudget(float(os.getenv("RETRY_BUDGET_RATIO", "0.2")), int(os.getenv("RETRY_BUDGET_RESERVE", "10")))
+    for name in ("gemini", "openrouter")
+}
+
+
+# Upstream calls started on behalf of the current task and the tasks it spawns;
+# None unless someone is counting (see singleflight.py).
+CALLS = contextvars.ContextVar("upstream_calls", default=None)
+
+
+def counting_calls(calls=None):
+    """Count this task's upstream calls into `calls` (a new Counter by default) and return it."""
+    calls = Counter() if calls is None else calls
+    CALLS.set(calls)
+    return calls
+
+
+def _count(upstream, n=1):
+    calls = CALLS.get()
+    if calls is not None:
+        calls[upstream] += n
+
+
+def error_kind(error):
+    if isinstance(error, CircuitOpen):
+        return "circuit_open"
+    if isinstance(error, (AttemptTimeout, asyncio.TimeoutError, httpx.TimeoutException, APITimeoutError)):
+        return "timeout"
+    status = getattr(getattr(error, "response", None), "status_code", None) or getattr(error, "status_code", None)
+    if status:
+        return f"http_{status // 100}xx"
+    if isinstance(error, (httpx.TransportError, APIConnectionError)):
+        return "connection"
+    return "error"
+
+
+def retryable(error):
+    """Timeouts, connection errors, 429 and 5xx may succeed on another try; other errors will not."""
+    status = getattr(getattr(error, "response", None), "status_code", None) or getattr(error, "status_code", None)
+    if status:
+        return status == 429 or status >= 500
+    return error_kind(error) in ("timeout", "connection")
+
+
+class UpstreamClients:
+    """Keep-alive HTTP pools and per-upstream concurrency limits for one event loop."""
+
+    def __init__(self):
+        limits = httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_CONNECTIONS,
+            keepalive_expiry=60,
+        )
+        self.gemini = httpx.AsyncClient(
+            base_url=GEMINI_API_BASE,
+            headers={"x-goog-api-key": os.getenv("GOOGLE_API_KEY", "")},
+            limits=limits,
+            timeout=EMBED_TIMEOUT,
+        )
+        self.openrouter = AsyncOpenAI(
+            base_url=OPENROUTER_BASE_URL,
+            api_key=os.getenv("OPENROUTER_API_KEY"),
+            http_client=httpx.AsyncClient(limits=limits, timeout=RERANK_TIMEOUT),
+            max_retries=0,
+        )
+        self.embed_slots = asyncio.Semaphore(EMBED_CONCURRENCY)
+        self.rerank_slots = asyncio.Semaphore(RERANK_CONCURRENCY)
+
+    async def _embed(self, model, text, task_type):
+        async with self.embed_slots:
+            response = await self.gemini.post(
+                f"/{model}:embedContent",
+                json={"model": model, "content": {"parts": [{"text": text}]}, "taskType": task_type},
+            )
+        response.raise_for_status()
+        return response.json()["embedding"]["values"]
+
+    async def embed(self, model, text, task_type="RETRIEVAL_QUERY"):
+        _count("gemini")
+        try:
+            return await resilient_call(
+                "gemini", lambda: self._embed(model, text, task_type), BREAKERS["gemini"], BUDGETS["gemini"],
+                EMBED_TIMEOUT, EMBED_ATTEMPT_TIMEOUT, EMBED_RETRIES, EMBED_HEDGE_AFTER, retryable,
+            )
+        except Exception as e:
+            UPSTREAM_ERRORS.inc("gemini", error_kind(e))
+            raise UpstreamError(f"Gemini embedding failed: {e!r}") from e
+
+    async def _embed_batch(self, model, texts, task_type):
+        async with self.embed_slots:
+            response = await self.gemini.post(
+                f"/{model}:batchEmbedContents",
+                json={"requests": [
+                    {"model": model, "content": {"parts": [{"text": text}]}, "taskType": task_type}
+                    for text in texts
+                ]},
+            )
+        response.raise_for_status()
+        return [item["values"] for item in response.json()["embeddings"]]
+
+    async def embed_batch(self, model, texts, task_type="RETRIEVAL_QUERY"):
+        """Embed `texts` in chunks of EMBED_BATCH_SIZE sent concurrently.
+
+        Returns one entry per text: the vector, or the UpstreamError of its chunk.
+        """
+        chunks = [texts[i:i + EMBED_BATCH_SIZE] for i in range(0, len(texts), EMBED_BATCH_SIZE)]
+        _count("gemini", len(chunks))
+        timeout = EMBED_TIMEOUT * 2
+
+        def call(chunk):
+            return resilient_call(
+                "gemini", lambda: self._embed_batch(model, chunk, task_type), BREAKERS["gemini"], BUDGETS["gemini"],
+                timeout, timeout, EMBED_RETRIES, retryable=retryable,
+            )
+
+        outcomes = await asyncio.gather(*(call(chunk) for chunk in chunks), return_exceptions=True)
+        results = []
+        for chunk, outcome in zip(chunks, outcomes):
+            if isinstance(outcome, BaseException):
+                UPSTREAM_ERRORS.inc("gemini", error_kind(outcome))
+                error = UpstreamError(f"Gemini embedding failed: {outcome!r}")
+                results.extend([error] * len(chunk))
+            else:
+                results.extend(outcome)
+        return results
+
+    async def _chat(self, **kwargs):
+        async with self.rerank_slots:
+            return await self.openrouter.chat.completions.create(**kwargs)
+
+    async def chat(self, deadline=None, **kwargs):
+        """OpenRouter chat completion; `deadline` (seconds) shortens RERANK_TIMEOUT for a caller that cannot wait."""
+        _count("openrouter")
+        deadline = RERANK_TIMEOUT if deadline is None else min(deadline, RERANK_TIMEOUT)
+        try:
+            return await resilient_call(
+                "openrouter", lambda: self._chat(**kwargs), BREAKERS["openrouter"], BUDGETS["openrouter"],
+                deadline, RERANK_ATTEMPT_TIMEOUT, RERANK_RETRIES, retryable=retryable,
+            )
+        except Exception as e:
+            UPSTREAM_ERRORS.inc("openrouter", error_kind(e))
+            raise
+
+    async def aclose(self):
+        await self.gemini.aclose()
+        await self.openrouter.close()
+
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_clients() -> UpstreamClients:
+    # httpx pools and asyncio semaphores are bound to the loop that created them.
+    loop = asyncio.get_running_loop()
+    clients = _clients.get(loop)
+    if clients is None:
+        clients = _clients[loop] = UpstreamClients()
+    return clients
+
+
+async def close_clients():
+    clients = _clients.pop(asyncio.get_running_loop(), None)
+    if clients is not None:
+        await clients.aclose()
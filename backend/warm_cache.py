@@ -0,0 +1,127 @@
+# 📁 warm_cache.py — precompute answers for the most frequent queries into a response cache snapshot
+#
+#   python warm_cache.py                                   # chat logs + logs/traces.jsonl*
+#   python warm_cache.py --top 200 --min-count 3 --traces logs/traces-*.jsonl*
+#   python warm_cache.py --dry-run                         # only list the queries that would be warmed
+#
+# Queries are mined from data/chat_logs.json and the API request traces
+# (rotated .gz files included), counted per (query, rerank strategy, filters),
+# and the most frequent ones are answered through the normal recommender path.
+# The snapshot is written for the index version being served; the API loads
+# it at startup (RESPONSE_CACHE_SNAPSHOT) and ignores it after an index change.
+
+import os
+import sys
+import glob
+import gzip
+import json
+import argparse
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from embedding_cache import normalize_query
+from recommender import SHLRecommender
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+WARM_ENDPOINTS = {"recommend", "stream"}
+
+
+def read_jsonl(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def mine_chat_logs(path):
+    # The chatbot logs one line per model answer: consecutive lines with the same query are one turn.
+    previous = None
+    for record in read_jsonl(path):
+        query = (record.get("query") or "").strip()
+        if query and query != previous:
+            yield query, None, None
+        previous = query
+
+
+def mine_traces(paths):
+    for path in paths:
+        for record in read_jsonl(path):
+            if record.get("endpoint") in WARM_ENDPOINTS and record.get("outcome") == "ok" and record.get("query"):
+                yield record["query"], record.get("rerank"), record.get("filters")
+
+
+def frequent_queries(sources, default_strategy, top, min_count):
+    counts, originals = Counter(), {}
+    for query, strategy, filters in sources:
+        key = (normalize_query(query), strategy or default_strategy, json.dumps(filters or {}, sort_keys=True))
+        counts[key] += 1
+        originals.setdefault(key, query)
+    return [
+        (originals[key], key[1], json.loads(key[2]) or None, n)
+        for key, n in counts.most_common(top) if n >= min_count
+    ]
+
+
+def warm(recommender, queries, concurrency):
+    requests = [(query, strategy, filters) for query, strategy, filters, _ in queries]
+    failed = 0
+    for (query, strategy, _), (meta, error) in zip(requests, recommender.warm(requests, concurrency)):
+        if error is not None:
+            failed += 1
+            print(f"❌ {query!r}: {error}")
+        elif not meta["cached"] and meta["rerank"] not in (strategy, "llm"):
+            print(f"⚠️ {query!r}: rerank fell back to {meta['rerank']}, not cached")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm the /recommend response cache from chat logs and request traces.")
+    parser.add_argument("--chat-log", default=os.path.join(DATA_DIR, "chat_logs.json"))
+    parser.add_argument("--traces", nargs="*", default=[os.getenv("TRACE_LOG", "logs/traces.jsonl") + "*"],
+                        help="trace files or globs; {pid} matches every worker's file (rotated .gz files are read too)")
+    parser.add_argument("--top", type=int, default=100, help="how many of the most frequent queries to warm")
+    parser.add_argument("--min-count", type=int, default=2, help="ignore queries seen fewer times")
+    parser.add_argument("--concurrency", type=int, default=4, help="queries answered in parallel")
+    parser.add_argument("--out", help="snapshot path (default: RESPONSE_CACHE_SNAPSHOT or data/response_cache.json)")
+    parser.add_argument("--dry-run", action="store_true", help="list the queries without answering them")
+    args = parser.parse_args()
+
+    patterns = [pattern.replace("{pid}", "*") for pattern in args.traces if pattern]
+    trace_paths = sorted({p for pattern in patterns for p in glob.glob(pattern)})
+    sources = []
+    if os.path.exists(args.chat_log):
+        sources.append(mine_chat_logs(args.chat_log))
+    else:
+        print(f"⚠️ No chat log at {args.chat_log}")
+    if trace_paths:
+        sources.append(mine_traces(trace_paths))
+    else:
+        print(f"⚠️ No trace files match {', '.join(patterns) or '(no patterns)'}; is TRACE_LOG set the same as for the server?")
+    print(f"🔎 Mining {args.chat_log} and {len(trace_paths)} trace file(s)")
+
+    default_strategy = os.getenv("RERANK_STRATEGY", "llm_with_fallback")
+    queries = frequent_queries((item for source in sources for item in source), default_strategy, args.top, args.min_count)
+    for query, strategy, filters, n in queries:
+        print(f"  {n:>5}x  {query[:70]!r}  rerank={strategy}" + (f"  filters={filters}" if filters else ""))
+    if not queries or args.dry_run:
+        print(f"✅ {len(queries)} queries to warm" + ("" if queries else f" (none seen at least {args.min_count} times)"))
+        return
+
+    out = args.out or os.getenv("RESPONSE_CACHE_SNAPSHOT") or os.path.join(DATA_DIR, "response_cache.json")
+    # A response cache is required here, whatever the serving configuration says.
+    os.environ["RESPONSE_CACHE_SIZE"] = str(max(len(queries), int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))))
+    recommender = SHLRecommender(load_snapshot=False)  # start from scratch, not from the previous snapshot
+    failed = warm(recommender, queries, args.concurrency)
+
+    saved = recommender.response_cache.save_snapshot(out, recommender.bundle.version)
+    print(f"📝 Wrote {saved} answers for index {recommender.bundle.version} to {out} ({failed} failed)")
+
+
+if __name__ == "__main__":
+    main()
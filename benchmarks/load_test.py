@@ -0,0 +1,295 @@
+# 📁 load_test.py — drive the FastAPI backend at fixed concurrency levels against stub upstreams
+#
+#   python benchmarks/load_test.py                                   # 1, 8, 32 concurrent clients
+#   python benchmarks/load_test.py --concurrency 16 64 --requests 500 --chat-latency 2.0
+#   python benchmarks/load_test.py --env RERANK_STRATEGY=local --out benchmarks/results/local.json
+#   python benchmarks/load_test.py --stream                          # /recommend/stream, time to first result
+#   python benchmarks/load_test.py --target http://127.0.0.1:8000    # an already running server
+#
+# Unless --target is given, the stub upstream and `uvicorn main:app` are started
+# as subprocesses on free ports and stopped afterwards. Every level reports
+# p50/p95/p99 latency, requests/sec, errors, the rerank paths taken and the
+# upstream calls it caused, plus per-stage percentiles from Server-Timing.
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import platform
+import argparse
+import subprocess
+from collections import Counter
+
+import httpx
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(ROOT, "backend")
+
+QUERIES = [
+    "Java developer who can collaborate with business teams, under 40 minutes",
+    "Mid-level Python, SQL and JavaScript programmer",
+    "Entry level sales role for new graduates",
+    "Personality test for a customer service team lead",
+    "Bank administrative assistant with numerical reasoning",
+    "Senior data analyst with Excel, SQL and Tableau",
+    "COO for a company in China, cultural fit, about an hour",
+    "Content writer with strong English and SEO skills",
+    "Remote adaptive cognitive ability test for graduates",
+    "QA engineer with Selenium and manual testing experience",
+    "Call center agent with English comprehension, 20 minutes",
+    "Project manager leadership and situational judgement",
+]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(url, process, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode} before becoming ready")
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready in {timeout}s")
+
+
+def start_servers(args):
+    stub_port, app_port = free_port(), free_port()
+    stub = subprocess.Popen([
+        sys.executable, os.path.join(ROOT, "benchmarks", "stub_upstream.py"),
+        "--port", str(stub_port),
+        "--embed-latency", str(args.embed_latency),
+        "--chat-latency", str(args.chat_latency),
+        "--jitter", str(args.jitter),
+        "--error-rate", str(args.error_rate),
+    ])
+    env = {
+        **os.environ,
+        "GEMINI_API_BASE": f"http://127.0.0.1:{stub_port}/v1beta",
+        "OPENROUTER_BASE_URL": f"http://127.0.0.1:{stub_port}/api/v1",
+        "GOOGLE_API_KEY": "stub",
+        "OPENROUTER_API_KEY": "stub",
+        **dict(item.split("=", 1) for item in args.env),
+    }
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(app_port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+        stdout=None if args.verbose else subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(f"http://127.0.0.1:{stub_port}/stats", stub)
+        wait_ready(f"http://127.0.0.1:{app_port}/health", app)
+    except Exception:
+        stop_servers([stub, app])
+        raise
+    return f"http://127.0.0.1:{app_port}", f"http://127.0.0.1:{stub_port}", [stub, app]
+
+
+def stop_servers(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def make_payload(args, n):
+    query = QUERIES[n % len(QUERIES)]
+    if args.unique:
+        query = f"{query} #{n}"  # defeats the embedding cache
+    if args.stream:
+        return "/recommend/stream", {"query": query, "rerank": args.rerank}
+    if args.batch_size:
+        return "/recommend/batch", {"queries": [f"{query} ({i})" for i in range(args.batch_size)], "rerank": args.rerank}
+    return "/recommend", {"query": query, "rerank": args.rerank}
+
+
+def parse_server_timing(header):
+    """{stage: milliseconds} from a Server-Timing header value."""
+    stages = {}
+    for metric in filter(None, (part.strip() for part in header.split(","))):
+        name, _, params = metric.partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur":
+                stages[name.strip()] = float(value)
+    return stages
+
+
+def percentile_ms(latencies, q):
+    return round(float(np.percentile(latencies, q)) * 1000, 2) if latencies else None
+
+
+async def stream_request(client, path, payload, started, statuses, paths, first_results):
+    """One NDJSON request; records when the first event arrived and the final rerank path."""
+    async with client.stream("POST", path, json=payload) as response:
+        statuses[response.status_code] += 1
+        if response.status_code != 200:
+            await response.aread()
+            return
+        first = True
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            if first:  # the retrieval event, or the only event of a cached answer
+                first_results.append(time.perf_counter() - started)
+                first = False
+            if event["final"]:
+                paths[event.get("rerank", "none")] += 1
+
+
+async def run_level(client, args, concurrency, offset):
+    """Send args.requests requests with `concurrency` clients in flight; returns the level summary."""
+    latencies, first_results, statuses, paths, stages = [], [], Counter(), Counter(), {}
+    next_request = iter(range(offset, offset + args.requests))
+
+    async def worker():
+        for n in next_request:
+            path, payload = make_payload(args, n)
+            started = time.perf_counter()
+            try:
+                if args.stream:
+                    await stream_request(client, path, payload, started, statuses, paths, first_results)
+                    latencies.append(time.perf_counter() - started)
+                    continue
+                response = await client.post(path, json=payload)
+                statuses[response.status_code] += 1
+                paths[response.headers.get("X-Rerank-Path", "-")] += 1
+                if response.headers.get("X-Cache") == "HIT":
+                    paths["cache_hit"] += 1
+                elif response.headers.get("X-Cache") == "SHARED":
+                    paths["coalesced"] += 1
+                for stage, ms in parse_server_timing(response.headers.get("Server-Timing", "")).items():
+                    stages.setdefault(stage, []).append(ms / 1000)
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    ok = statuses.get(200, 0)
+    return {
+        "concurrency": concurrency,
+        "requests": args.requests,
+        "ok": ok,
+        "errors": args.requests - ok,
+        "statuses": {str(k): v for k, v in statuses.items()},
+        "rps": round(args.requests / elapsed, 2),
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+        "p99_ms": percentile_ms(latencies, 99),
+        "mean_ms": round(float(np.mean(latencies)) * 1000, 2) if latencies else None,
+        "max_ms": round(max(latencies) * 1000, 2) if latencies else None,
+        "first_result": {
+            "p50_ms": percentile_ms(first_results, 50),
+            "p95_ms": percentile_ms(first_results, 95),
+            "p99_ms": percentile_ms(first_results, 99),
+        } if first_results else None,
+        "rerank_paths": dict(paths),
+        "stages": {
+            stage: {"p50_ms": percentile_ms(v, 50), "p95_ms": percentile_ms(v, 95), "p99_ms": percentile_ms(v, 99)}
+            for stage, v in stages.items()
+        },
+    }
+
+
+def upstream_stats(stub_url):
+    if not stub_url:
+        return None
+    return httpx.get(f"{stub_url}/stats", timeout=5).json()
+
+
+async def drive(args, target, stub_url):
+    levels = []
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=target, limits=limits, timeout=args.timeout) as client:
+        for n in range(args.warmup):
+            path, payload = make_payload(args, -1 - n)
+            await client.post(path, json=payload)
+        offset = 0
+        for concurrency in args.concurrency:
+            before = upstream_stats(stub_url)
+            level = await run_level(client, args, concurrency, offset)
+            after = upstream_stats(stub_url)
+            if before and after:
+                level["upstream_calls"] = {k: after[k] - before[k] for k in ("embed", "batch_embed", "chat", "errors")}
+            offset += args.requests
+            levels.append(level)
+            if level["first_result"]:
+                ttfr = level["first_result"]
+                print(f"c={concurrency:<4} first result  p50={ttfr['p50_ms']}ms  p95={ttfr['p95_ms']}ms  p99={ttfr['p99_ms']}ms")
+            print(
+                f"c={concurrency:<4} {level['rps']:>8.1f} req/s  p50={level['p50_ms']}ms  "
+                f"p95={level['p95_ms']}ms  p99={level['p99_ms']}ms  errors={level['errors']}  "
+                f"rerank={level['rerank_paths']}"
+            )
+            for stage, p in level["stages"].items():
+                print(f"       {stage:<10} p50={p['p50_ms']}ms  p95={p['p95_ms']}ms  p99={p['p99_ms']}ms")
+    return levels
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test /recommend against stubbed Gemini/OpenRouter.")
+    parser.add_argument("--target", help="base URL of a running backend; skips starting servers")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--rerank", choices=["llm", "local", "llm_with_fallback", "none"])
+    parser.add_argument("--stream", action="store_true", help="use /recommend/stream and report time to first result")
+    parser.add_argument("--batch-size", type=int, default=0, help="use /recommend/batch with this many queries")
+    parser.add_argument("--repeat-queries", dest="unique", action="store_false",
+                        help="reuse the same query texts so the embedding cache can hit")
+    parser.add_argument("--embed-latency", type=float, default=0.08)
+    parser.add_argument("--chat-latency", type=float, default=0.9)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the started backend")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the started backend, e.g. RERANK_STRATEGY=local")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--out", help="write the results as JSON to this file")
+    parser.add_argument("--verbose", action="store_true", help="show backend output")
+    args = parser.parse_args()
+
+    processes, stub_url = [], None
+    if args.target:
+        target = args.target
+    else:
+        target, stub_url, processes = start_servers(args)
+    try:
+        levels = asyncio.run(drive(args, target, stub_url))
+    finally:
+        stop_servers(processes)
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        config = {k: v for k, v in vars(args).items() if k not in ("out", "verbose")}
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "python": platform.python_version(),
+                "config": config,
+                "levels": levels,
+            }, f, indent=2)
+        print(f"📝 Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
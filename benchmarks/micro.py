@@ -0,0 +1,154 @@
+# 📁 micro.py — micro-benchmarks for the CPU-side hot paths of the recommender
+#
+#   python benchmarks/micro.py --out benchmarks/results/micro.json
+#   python benchmarks/micro.py --compare benchmarks/results/micro.json   # exits 1 on a regression
+#
+# No network: vectors come from the index itself, and rerank parsing runs on
+# canned model replies.
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+import faiss
+from recommender import SHLRecommender
+from catalog import parse_duration, record_from_document
+from lexical import reciprocal_rank_fusion
+from rerank import build_rerank_prompt, parse_ranked_ids
+
+QUERY = "Java developer who can collaborate with business teams, under 40 minutes"
+
+
+def time_call(fn, min_time):
+    """Per-call timings (seconds) of `fn`, in rounds sized to take ~1ms each, for at least `min_time`."""
+    fn()
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        if time.perf_counter() - started > 1e-3 or loops >= 1 << 20:
+            break
+        loops *= 2
+    samples, deadline = [], time.perf_counter() + min_time
+    while time.perf_counter() < deadline or len(samples) < 5:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        samples.append((time.perf_counter() - started) / loops)
+    return samples
+
+
+def benchmarks(recommender):
+    bundle = recommender.bundle
+    catalog = bundle.catalog
+    rng = np.random.default_rng(0)
+    rows = rng.integers(0, bundle.index.ntotal, 32)
+    vector = bundle.index.reconstruct(int(rows[0]))
+    vectors = np.stack([bundle.index.reconstruct(int(r)) for r in rows])
+    mask = bundle.filter_index.mask({"max_duration": 40, "remote": True})
+    dense = recommender.search_by_vector(vector, recommender.retrieval_depth)
+    sparse = bundle.lexical.search(QUERY, recommender.retrieval_depth) if bundle.lexical else dense
+    candidates = recommender.retrieve(QUERY, vector)
+
+    with open(os.path.join(ROOT, "data", "index_metadata.json"), "r", encoding="utf-8") as f:
+        document = json.load(f)[0]
+    length_text = document["text"]
+    prompt_rows = list(candidates)
+    clean_reply = str(list(range(len(prompt_rows), 0, -1)))
+    noisy_reply = f"Here is the ranking you asked for:\n{clean_reply}\nLet me know if you need more."
+
+    return {
+        "search_by_vector": lambda: recommender.search_by_vector(vector, recommender.top_k),
+        "search_by_vector_depth": lambda: recommender.search_by_vector(vector, recommender.retrieval_depth),
+        "search_by_vector_filtered": lambda: recommender.search_by_vector(vector, recommender.retrieval_depth, mask),
+        "search_by_vectors_x32": lambda: recommender.search_by_vectors(vectors, recommender.retrieval_depth),
+        "filter_mask": lambda: bundle.filter_index.mask({"max_duration": 40, "remote": True, "test_types": ["K"]}),
+        "lexical_search": lambda: bundle.lexical.search(QUERY, recommender.retrieval_depth) if bundle.lexical else None,
+        "rrf_fusion": lambda: reciprocal_rank_fusion([dense, sparse]),
+        "parse_duration": lambda: parse_duration(length_text),
+        "record_from_document": lambda: record_from_document(document),
+        "catalog_record": lambda: [catalog.record(r) for r in candidates],
+        "build_rerank_prompt": lambda: build_rerank_prompt(QUERY, catalog, prompt_rows, recommender.rerank_token_budget),
+        "parse_ranked_ids_json": lambda: parse_ranked_ids(clean_reply, len(prompt_rows)),
+        "parse_ranked_ids_noisy": lambda: parse_ranked_ids(noisy_reply, len(prompt_rows)),
+        "local_rerank": lambda: bundle.local_reranker.rerank(QUERY, candidates),
+        "spell_correct": lambda: bundle.speller.correct("javva developr with sql skils", recommender.spell_threshold),
+        "spell_correct_cold": lambda: (bundle.speller._memo.clear(), bundle.speller.correct("pythn programer"))[1],
+    }
+
+
+def summarize(samples):
+    us = np.asarray(samples) * 1e6
+    return {
+        "median_us": round(float(np.median(us)), 3),
+        "p95_us": round(float(np.percentile(us, 95)), 3),
+        "ops_per_s": round(1e6 / float(np.median(us)), 1),
+        "rounds": len(samples),
+    }
+
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    regressions = 0
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["median_us"] / baseline[name]["median_us"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  ❌ regression"
+            regressions += 1
+        elif ratio < 1 - threshold:
+            flag = "  ✅ faster"
+        print(f"{name:<28} {baseline[name]['median_us']:>12.2f} -> {result['median_us']:>12.2f} us  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for search, field extraction and rerank parsing.")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds spent per benchmark")
+    parser.add_argument("--only", nargs="+", help="run only these benchmarks")
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative slowdown counted as a regression")
+    args = parser.parse_args()
+
+    recommender = SHLRecommender()
+    results = {}
+    for name, fn in benchmarks(recommender).items():
+        if args.only and name not in args.only:
+            continue
+        results[name] = summarize(time_call(fn, args.min_time))
+        print(f"{name:<28} {results[name]['median_us']:>12.2f} us  (p95 {results[name]['p95_us']:.2f})")
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "faiss": faiss.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "index": recommender.bundle.describe(),
+        "results": results,
+    }
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Results written to {args.out}")
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
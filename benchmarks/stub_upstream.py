@@ -0,0 +1,109 @@
+# 📁 stub_upstream.py — local stand-in for the Gemini embedding and OpenRouter chat APIs
+#
+#   python benchmarks/stub_upstream.py --port 9100 --embed-latency 0.08 --chat-latency 0.9
+#
+# Point the backend at it with
+#   GEMINI_API_BASE=http://127.0.0.1:9100/v1beta OPENROUTER_BASE_URL=http://127.0.0.1:9100/api/v1
+#
+# Latency is injected per call (mean seconds, +/- jitter fraction), errors with
+# --error-rate. Embeddings are deterministic per text; the chat endpoint
+# answers a rerank prompt with an id list of its candidates. GET /stats
+# returns call counters.
+
+import re
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+_CANDIDATE_RE = re.compile(r"^(\d+)\. ", re.MULTILINE)
+
+
+def stub_vector(text, dim):
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dim).astype("float32")
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def create_app(dim=768, embed_latency=0.0, chat_latency=0.0, jitter=0.2, error_rate=0.0):
+    app = FastAPI(title="Stub upstream")
+    stats = {"embed": 0, "batch_embed": 0, "batch_texts": 0, "chat": 0, "errors": 0, "started": time.time()}
+
+    async def delay(mean):
+        if mean > 0:
+            await asyncio.sleep(max(0.0, random.uniform(mean * (1 - jitter), mean * (1 + jitter))))
+
+    def failure():
+        if error_rate and random.random() < error_rate:
+            stats["errors"] += 1
+            return JSONResponse({"error": {"code": 503, "message": "injected failure"}}, status_code=503)
+        return None
+
+    @app.post("/v1beta/{target:path}")
+    async def embed(target: str, request: Request):
+        body = await request.json()
+        await delay(embed_latency)
+        error = failure()
+        if error:
+            return error
+        if target.endswith(":batchEmbedContents"):
+            stats["batch_embed"] += 1
+            stats["batch_texts"] += len(body["requests"])
+            texts = [r["content"]["parts"][0]["text"] for r in body["requests"]]
+            return {"embeddings": [{"values": stub_vector(t, dim)} for t in texts]}
+        stats["embed"] += 1
+        return {"embedding": {"values": stub_vector(body["content"]["parts"][0]["text"], dim)}}
+
+    @app.post("/api/v1/chat/completions")
+    async def chat(request: Request):
+        body = await request.json()
+        await delay(chat_latency)
+        error = failure()
+        if error:
+            return error
+        stats["chat"] += 1
+        prompt = body["messages"][-1]["content"]
+        ids = [int(n) for n in _CANDIDATE_RE.findall(prompt)]
+        random.Random(prompt).shuffle(ids)
+        content = str(ids[:10])
+        return {
+            "id": "stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                      "total_tokens": (len(prompt) + len(content)) // 4},
+        }
+
+    @app.get("/stats")
+    def get_stats():
+        return stats
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Gemini/OpenRouter server with injected latency.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--embed-latency", type=float, default=0.08, help="mean seconds per embed call")
+    parser.add_argument("--chat-latency", type=float, default=0.9, help="mean seconds per chat completion")
+    parser.add_argument("--jitter", type=float, default=0.2, help="latency varies by +/- this fraction")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    app = create_app(args.dim, args.embed_latency, args.chat_latency, args.jitter, args.error_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
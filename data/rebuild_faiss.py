@@ -1,60 +1,240 @@
+# 📁 rebuild_faiss.py — incremental, resumable rebuild of the FAISS index + catalog artifacts
+#
+#   python data/rebuild_faiss.py                      # Gemini embeddings
+#   python data/rebuild_faiss.py --embedder hash      # offline, deterministic (tests)
+#
+# Every document is content-hashed; vectors for unchanged documents are reused
+# from the vector store, only new/changed documents are embedded (in batches,
+# concurrently, with retries), and each finished batch is committed to the
+# store so a crashed run resumes where it stopped. Outputs are written to a
+# staging directory, sealed with a manifest (version, embedding model, dim,
+# row count, file hashes) and renamed to bundles/<version>; the CURRENT
+# pointer is switched last, so a serving backend only ever sees whole bundles.
+#
+#   python data/rebuild_faiss.py --no-activate        # build, switch later via /admin/reload
+#   python data/rebuild_faiss.py --index-type hnsw --index-param M=48
+#   python data/rebuild_faiss.py --changes data/shl_product_changes.json
+#
+# --changes applies a scraper change set (added/updated/removed product links)
+# to the docstore first, taking the new records from --products; only the
+# added and updated documents then get new content hashes and are embedded.
+
 import os
+import sys
 import json
-import faiss
+import time
+import random
+import shutil
+import sqlite3
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import numpy as np
 from tqdm import tqdm
-import google.generativeai as genai
 
-# Load environment variables
-GOOGLE_API_KEY=os.getenv("GOOGLE_API_KEY")
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(DATA_DIR, "..", "backend"))
+from catalog import iter_products, product_document
+from embedders import get_embedder
+from index_factory import INDEX_TYPES, build_index
+from bundle import build_bundle, read_current, set_current, CURRENT_NAME
 
-if not GOOGLE_API_KEY:
-    raise ValueError("❌ GOOGLE_API_KEY is missing in your .env file")
 
-# Configure Gemini SDK
-genai.configure(api_key=GOOGLE_API_KEY)
+def document_text(item):
+    return f"{item.get('name', '')}. {item.get('text', '')}"
 
-# Load the SHL docstore
-with open("shl/data/docstore.json", "r", encoding="utf-8") as f:
-    data = json.load(f)
 
-texts = []
-metadata = []
+def content_hash(embedder_name, text):
+    return hashlib.sha256(f"{embedder_name}\n{text}".encode("utf-8")).hexdigest()
 
-print(f"📄 Total items in docstore: {len(data)}")
 
-for item in data:
-    name = item.get("name", "")
-    description = item.get("text", "")
-    combined_text = f"{name}. {description}"
-    texts.append(combined_text)
-    metadata.append(item)
+class VectorStore:
+    """Content-hash -> vector, committed batch by batch; doubles as the resume checkpoint."""
 
-# Embed and build FAISS index
-vectors = []
-for text in tqdm(texts, desc="🔍 Embedding texts with Gemini"):
-    try:
-        response = genai.embed_content(
-            model="models/embedding-001",
-            content=text,
-            task_type="RETRIEVAL_DOCUMENT"
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS vectors "
+            "(hash TEXT PRIMARY KEY, model TEXT NOT NULL, dim INTEGER NOT NULL, vector BLOB NOT NULL)"
         )
-        vector = response['embedding']
-        vectors.append(vector)
-    except Exception as e:
-        print(f"❌ Error embedding {text[:40]}: {e}")
 
-if not vectors:
-    print("⚠️ No embeddings were generated. FAISS index not built.")
-    exit()
+    def get_many(self, hashes):
+        found = {}
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i:i + 500]
+            rows = self.db.execute(
+                f"SELECT hash, vector FROM vectors WHERE hash IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            found.update((h, np.frombuffer(v, dtype="float32")) for h, v in rows)
+        return found
+
+    def put_many(self, model, items):
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO vectors (hash, model, dim, vector) VALUES (?, ?, ?, ?)",
+                [(h, model, len(v), np.asarray(v, dtype="float32").tobytes()) for h, v in items],
+            )
+
+
+def embed_with_retry(embedder, texts, retries):
+    for attempt in range(retries + 1):
+        try:
+            vectors = embedder.embed(texts)
+            if len(vectors) != len(texts):
+                raise ValueError(f"embedder returned {len(vectors)} vectors for {len(texts)} texts")
+            return vectors
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = min(30, 2 ** attempt) * random.uniform(0.5, 1.5)
+            print(f"⚠️ Embedding batch failed ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def embed_missing(embedder, store, pending, batch_size, concurrency, retries):
+    """Embed (hash, text) pairs in concurrent batches; returns the hashes that still failed."""
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    failed = []
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {
+            pool.submit(embed_with_retry, embedder, [text for _, text in batch], retries): batch
+            for batch in batches
+        }
+        for future in tqdm(as_completed(futures), total=len(futures), desc="🔍 Embedding batches"):
+            batch = futures[future]
+            try:
+                vectors = future.result()
+            except Exception as e:
+                print(f"❌ Batch of {len(batch)} failed after {retries} retries: {e}")
+                failed.extend(h for h, _ in batch)
+                continue
+            store.put_many(embedder.name, [(h, v) for (h, _), v in zip(batch, vectors)])
+    return failed
+
+
+def apply_changes(documents, changes, products):
+    """Docstore with a scraper change set applied: updated in place, removed dropped, new links appended."""
+    by_link = {item.get("link"): item for item in iter_products(products)}
+    missing = [link for link in changes["added"] + changes["updated"] if link not in by_link]
+    if missing:
+        raise ValueError(f"{len(missing)} changed products are not in the products file, e.g. {missing[0]}")
+    removed, updated = set(changes["removed"]), set(changes["updated"])
+    # An "added" product that is already indexed (e.g. after a change set was lost) is updated in place.
+    updated |= set(changes["added"])
+    result = []
+    for doc in documents:
+        if doc["source"] in removed:
+            continue
+        result.append(product_document(by_link[doc["source"]], 0) if doc["source"] in updated else doc)
+    known = {doc["source"] for doc in result}
+    result += [product_document(by_link[link], 0) for link in changes["added"] if link not in known]
+    return [{**doc, "id": i} for i, doc in enumerate(result)]
+
+
+def write_json_atomic(data, path):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def prune_bundles(bundles_dir, keep):
+    """Delete all but the newest `keep` bundles, never the one CURRENT points at."""
+    current = read_current(bundles_dir)
+    versions = sorted(
+        name for name in os.listdir(bundles_dir)
+        if not name.startswith(".") and name != CURRENT_NAME
+        and os.path.isdir(os.path.join(bundles_dir, name))
+    )
+    for name in versions[:-keep] if keep > 0 else []:
+        if name != current:
+            shutil.rmtree(os.path.join(bundles_dir, name), ignore_errors=True)
+            print(f"🧹 Removed old bundle {name}")
+
+
+def index_param(pair):
+    key, sep, value = pair.partition("=")
+    if not sep or not value.isdigit():
+        raise argparse.ArgumentTypeError(f"expected KEY=INTEGER, got {pair!r}")
+    return key, int(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the FAISS index and catalog artifacts incrementally.")
+    parser.add_argument("--docstore", default=os.path.join(DATA_DIR, "docstore.json"))
+    parser.add_argument("--products", default=os.path.join(DATA_DIR, "shl_product_details_full.json"))
+    parser.add_argument("--out", default=os.path.join(DATA_DIR, "bundles"), help="bundles directory")
+    parser.add_argument("--no-activate", action="store_true", help="build the bundle but leave CURRENT alone")
+    parser.add_argument("--keep", type=int, default=3, help="bundles to keep (0 keeps all)")
+    parser.add_argument("--changes", help="change set from scraping/fast_scraper.py to apply to the docstore first")
+    parser.add_argument("--vector-store", default=os.path.join(DATA_DIR, "vector_store.sqlite"))
+    parser.add_argument("--embedder", default="gemini", help='"gemini", "local" (LOCAL_EMBED_MODEL on this CPU), "hash" or "package.module:Class"')
+    parser.add_argument("--index-type", default="flat", choices=INDEX_TYPES)
+    parser.add_argument("--index-param", type=index_param, action="append", default=[], metavar="KEY=VALUE",
+                        help="override an index parameter, e.g. M=48, nlist=1024, nprobe=32, ef_search=128")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--retries", type=int, default=4)
+    args = parser.parse_args()
+
+    embedder = get_embedder(args.embedder)
+    store = VectorStore(args.vector_store)
+
+    with open(args.docstore, "r", encoding="utf-8") as f:
+        documents = json.load(f)
+    print(f"📄 Total items in docstore: {len(documents)}")
+
+    if args.changes:
+        with open(args.changes, "r", encoding="utf-8") as f:
+            changes = json.load(f)
+        with open(args.products, "r", encoding="utf-8") as f:
+            products = json.load(f)
+        documents = apply_changes(documents, changes, products)
+        write_json_atomic(documents, args.docstore)
+        print(f"🧾 Applied {args.changes}: {len(changes['added'])} added, {len(changes['updated'])} updated, "
+              f"{len(changes['removed'])} removed -> {len(documents)} items in {args.docstore}")
+
+    texts = [document_text(item) for item in documents]
+    hashes = [content_hash(embedder.name, text) for text in texts]
+    stored = store.get_many(sorted(set(hashes)))
+    pending = list({h: t for h, t in zip(hashes, texts) if h not in stored}.items())
+    print(f"♻️ Reusing {len(documents) - sum(1 for h in hashes if h not in stored)} stored vectors, "
+          f"embedding {len(pending)} new/changed documents with {embedder.name}")
+
+    if pending:
+        failed = embed_missing(embedder, store, pending, args.batch_size, args.concurrency, args.retries)
+        if failed:
+            # Dropping documents would shift every later row; refuse to publish instead.
+            print(f"❌ {len(failed)} documents could not be embedded; nothing was published. Re-run to resume.")
+            sys.exit(1)
+        stored = store.get_many(sorted(set(hashes)))
+
+    vectors = np.stack([stored[h] for h in hashes]).astype("float32")
+    dims = {len(v) for v in vectors}
+    if len(dims) != 1:
+        raise ValueError(f"Vector store returned mixed dimensions {dims}")
+
+    metadata = [{**item, "id": i} for i, item in enumerate(documents)]
+    index, index_params = build_index(vectors, args.index_type, **dict(args.index_param))
+
+    with open(args.products, "r", encoding="utf-8") as f:
+        products = json.load(f)
+    version = build_bundle(
+        args.out, index, metadata, products,
+        build_key="".join(hashes) + json.dumps([args.index_type, index_params], sort_keys=True),
+        embedding_model=embedder.name,
+        index_type=args.index_type,
+        index_params=index_params,
+    )
+    print(f"✅ Bundle {version} built with {index.ntotal} vectors "
+          f"(dim {index.d}, {embedder.name}, {args.index_type} {index_params}).")
 
-# Create and save FAISS index
-dimension = len(vectors[0])
-index = faiss.IndexFlatL2(dimension)
-index.add(np.array(vectors).astype("float32"))
+    if not args.no_activate:
+        set_current(args.out, version)
+        print(f"📌 {CURRENT_NAME} -> {version}")
+    prune_bundles(args.out, args.keep)
 
-faiss.write_index(index, "shl/data/faiss_index.idx")
-with open("shl/data/index_metadata.json", "w", encoding="utf-8") as f:
-    json.dump(metadata, f, indent=2)
 
-print(f"✅ FAISS index built and saved with {len(vectors)} vectors.")
+if __name__ == "__main__":
+    main()
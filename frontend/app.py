@@ -3,10 +3,13 @@
 import streamlit as st
 import pandas as pd
 import requests
+import json
+import time
 import os
 
 # ===== CONFIG =====
 API_URL = "https://assessmentrecommendation.onrender.com/recommend"
+STREAM_URL = API_URL + "/stream"
 
 # ===== Setup =====
 st.set_page_config(page_title="SHL Assessment Recommender", layout="wide")
@@ -15,6 +18,32 @@ st.markdown("""
 Enter a **natural language query** or paste a **job description**, and we'll recommend up to 10 SHL assessments.
 """)
 
+
+def to_table(results):
+    return pd.DataFrame(results).rename(columns={
+        "description": "Assessment Description",
+        "url": "Assessment URL",
+        "remote_support": "Remote Support",
+        "adaptive_support": "Adaptive Support",
+        "duration": "Duration (mins)",
+        "test_type": "Test Types"
+    })
+
+
+def render(slot, event, started):
+    results = event["recommended_assessments"]
+    with slot.container():
+        if not results:
+            st.info("No recommendations found.")
+            return
+        if event["final"]:
+            st.markdown("### 📋 Top Recommendations")
+        else:
+            st.markdown("### 📋 Top Recommendations _(refining with AI reranking…)_")
+        st.dataframe(to_table(results), use_container_width=True)
+        st.caption(f"⏱️ {event['event']} results after {time.perf_counter() - started:.2f}s")
+
+
 # ===== Input field =====
 query = st.text_area("Paste Job Description or Query", height=150)
 
@@ -23,28 +52,17 @@ if st.button("Get Recommendations"):
     if not query.strip():
         st.warning("Please enter a query or job description.")
     else:
-        with st.spinner("🔍 Sending query to backend..."):
-            try:
-                response = requests.post(API_URL, json={"query": query})
+        # The search results are shown as soon as they arrive, then replaced by the reranked list.
+        slot = st.empty()
+        started = time.perf_counter()
+        try:
+            with st.spinner("🔍 Sending query to backend..."):
+                response = requests.post(STREAM_URL, json={"query": query}, stream=True, timeout=60)
                 response.raise_for_status()
-                results = response.json()["recommended_assessments"]
-
-                if not results:
-                    st.info("No recommendations found.")
-                else:
-                    df = pd.DataFrame(results)
-
-                    df = df.rename(columns={
-                        "description": "Assessment Description",
-                        "url": "Assessment URL",
-                        "remote_support": "Remote Support",
-                        "adaptive_support": "Adaptive Support",
-                        "duration": "Duration (mins)",
-                        "test_type": "Test Types"
-                    })
-
-                    st.markdown("### 📋 Top Recommendations")
-                    st.dataframe(df, use_container_width=True)
-
-            except Exception as e:
-                st.error(f"❌ Error: {str(e)}")
+                lines = response.iter_lines()
+                render(slot, json.loads(next(lines)), started)
+            for line in lines:
+                if line:
+                    render(slot, json.loads(line), started)
+        except Exception as e:
+            st.error(f"❌ Error: {str(e)}")
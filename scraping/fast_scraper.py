@@ -0,0 +1,424 @@
+# 📁 fast_scraper.py — SHL catalog scraper over pooled async HTTP (no browser, no fixed sleeps)
+#
+#   python fast_scraper.py                                  # links + details, same files as step0.py / step1.py
+#   python fast_scraper.py --stage links                    # only shl_product_links_final.json
+#   python fast_scraper.py --concurrency 16 --rate 8        # at most 8 requests/s per host
+#   python fixture_server.py --port 8765 &                  # offline, against saved HTML
+#   python fast_scraper.py --base-url http://127.0.0.1:8765 --prepackaged-pages 1 --individual-pages 2
+#
+# Pages are parsed with lxml using the XPath selectors of step0.py's
+# extract_table_data and step1.py's extract_product_details, and the output
+# JSON has the same schema. Requests share one keep-alive connection pool,
+# at most --concurrency are in flight and each host gets at most --rate
+# requests per second; 429/5xx answers and network errors are retried with
+# backoff (honouring Retry-After).
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from urllib.parse import urljoin, urlsplit
+
+import httpx
+from lxml import html
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fixture_server import fixture_name
+from scrape_state import ScrapeState, record_hash
+
+SHL_BASE_URL = "https://www.shl.com"
+CATALOG_PATH = "/solutions/products/product-catalog/"
+USER_AGENT = "Mozilla/5.0 (compatible; shl-catalog-scraper/1.0)"
+
+# Same as step1.py
+TEST_TYPE_MAPPING = {
+    "A": "Ability & Aptitude",
+    "B": "Biodata & Situational Judgement",
+    "C": "Competencies",
+    "D": "Development & 360",
+    "E": "Assessment Exercises",
+    "K": "Knowledge & Skills",
+    "P": "Personality & Behavior",
+    "S": "Simulations"
+}
+
+ROW_XPATH = "//div[contains(@class, 'product-catalogue-training-calendar__row')][h4='{}']/p"
+
+
+_BLOCK_TAGS = {"p", "div", "li", "ul", "ol", "tr", "table", "section", "h1", "h2", "h3", "h4", "h5", "h6"}
+
+
+def _rendered_parts(element, parts):
+    if not isinstance(element.tag, str) or element.tag in ("script", "style"):
+        return  # comments, processing instructions and invisible elements render no text
+    if element.tag == "br" or element.tag in _BLOCK_TAGS:
+        parts.append("\n")
+    # Newlines in the source are plain whitespace; only markup breaks lines.
+    parts.append((element.text or "").replace("\n", " "))
+    for child in element:
+        _rendered_parts(child, parts)
+        parts.append((child.tail or "").replace("\n", " "))
+    if element.tag in _BLOCK_TAGS:
+        parts.append("\n")
+
+
+def text_of(element):
+    """Selenium's .text: spaces collapsed within lines, line breaks kept at <br> and block elements.
+
+    Each line is trimmed and blank lines are dropped, so "a<br>b" reads
+    "a\nb" as in the Selenium scrapes, not "a b".
+    """
+    parts = []
+    _rendered_parts(element, parts)
+    lines = (" ".join(line.split()) for line in "".join(parts).split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+# === Parsing (lxml, same selectors as the Selenium scripts) ===
+def extract_table_data(table, page_url):
+    rows = table.xpath(".//tr")[1:]  # skip header
+    data = []
+
+    for row in rows:
+        try:
+            name_elem = row.xpath(".//td[1]/a")[0]
+            cells = {i: html.tostring(row.xpath(f".//td[{i}]")[0], encoding="unicode") for i in (2, 3)}
+            data.append({
+                "name": text_of(name_elem),
+                "link": urljoin(page_url, name_elem.get("href")),  # like get_attribute("href"): absolute
+                "remote_testing": "Yes" if "catalogue__circle -yes" in cells[2] else "No",
+                "adaptive_irt": "Yes" if "catalogue__circle -yes" in cells[3] else "No",
+                "test_types": [text_of(el) for el in row.xpath(".//td[4]//span[@class='product-catalogue__key']")],
+            })
+        except Exception as e:
+            print(f"⚠️ Skipping row due to error: {e}")
+            continue
+    return data
+
+
+def extract_listing(page_html, page_url, table_number):
+    tree = html.fromstring(page_html)
+    tables = tree.xpath("//div[@class='custom__table-responsive']/table")
+    if len(tables) < table_number:
+        raise ValueError(f"table {table_number} not found")
+    return extract_table_data(tables[table_number - 1], page_url)
+
+
+def safe_xpath(tree, xpath):
+    found = tree.xpath(xpath)
+    return text_of(found[0]) if found else ""
+
+
+def get_downloads(tree, page_url):
+    downloads = []
+    for li in tree.xpath("//ul[@class='product-catalogue__downloads']//li"):
+        links = li.xpath(".//a")
+        langs = li.xpath(".//*[contains(concat(' ', normalize-space(@class), ' '), ' product-catalogue__download-language ')]")
+        if not links or not langs:
+            continue
+        downloads.append({
+            "title": text_of(links[0]),
+            "url": urljoin(page_url, links[0].get("href")),
+            "language": text_of(langs[0]),
+        })
+    return downloads
+
+
+def extract_product_details(page_html, page_url):
+    tree = html.fromstring(page_html)
+    return {
+        "title": safe_xpath(tree, "//h1"),
+        "description": safe_xpath(tree, ROW_XPATH.format("Description")),
+        "job_levels": safe_xpath(tree, ROW_XPATH.format("Job levels")).rstrip(","),
+        "languages": safe_xpath(tree, ROW_XPATH.format("Languages")).rstrip(","),
+        "assessment_length": safe_xpath(tree, ROW_XPATH.format("Assessment length")),
+        "downloads": get_downloads(tree, page_url),
+    }
+
+
+def map_test_types(codes):
+    return [TEST_TYPE_MAPPING.get(code, code) for code in codes]
+
+
+# === Fetching ===
+class HostRateLimiter:
+    """Spaces request starts to the same host at least 1/rate seconds apart."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_slot = {}
+        self.lock = asyncio.Lock()
+
+    async def wait(self, url):
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        async with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class Fetcher:
+    def __init__(self, concurrency=8, rate=4.0, retries=3, timeout=30.0, save_dir=None):
+        self.client = httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT},
+            timeout=timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        )
+        self.slots = asyncio.Semaphore(concurrency)
+        self.limiter = HostRateLimiter(rate)
+        self.retries = retries
+        self.save_dir = save_dir
+        self.requests = 0
+        self.retried = 0
+        self.not_modified = 0
+
+    async def get(self, url, headers=None):
+        """Response (200, or 304 for a conditional request) for `url`; raises after `retries` failed retries."""
+        for attempt in range(self.retries + 1):
+            delay = 2 ** attempt
+            try:
+                async with self.slots:
+                    await self.limiter.wait(url)
+                    self.requests += 1
+                    response = await self.client.get(url, headers=headers)
+                if response.status_code == 429 or response.status_code >= 500:
+                    retry_after = response.headers.get("Retry-After", "")
+                    delay = float(retry_after) if retry_after.isdigit() else delay
+                    raise httpx.HTTPStatusError(f"HTTP {response.status_code}", request=response.request, response=response)
+                if response.status_code == 304:
+                    self.not_modified += 1
+                    return response
+                response.raise_for_status()
+                if self.save_dir:
+                    self._save(url, response.text)
+                return response
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                retryable = not isinstance(e, httpx.HTTPStatusError) or e.response.status_code == 429 or e.response.status_code >= 500
+                if not retryable or attempt == self.retries:
+                    raise
+                self.retried += 1
+                await asyncio.sleep(delay)
+
+    def _save(self, url, text):
+        path = os.path.join(self.save_dir, fixture_name(url))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def describe(error):
+    if isinstance(error, httpx.HTTPStatusError):
+        return f"HTTP {error.response.status_code}"
+    return str(error) or type(error).__name__
+
+
+# === Catalog ===
+def listing_url(base_url, start, type_id):
+    return f"{base_url}{CATALOG_PATH}?start={start}&type={type_id}"
+
+
+def rebase(url, base_url):
+    # Links are recorded as www.shl.com URLs whatever site served them (e.g. the fixture server).
+    return base_url + url[len(SHL_BASE_URL):] if url.startswith(SHL_BASE_URL) else url
+
+
+class PageSource:
+    """Fetches and parses pages, through the scrape state when there is one.
+
+    With a state, a page fetched earlier in the current (resumed) run is not
+    requested again, other known pages are requested conditionally and a 304
+    reuses the stored parse. Every page is checkpointed as soon as it is parsed.
+    """
+
+    def __init__(self, fetcher, base_url, state=None, full=False):
+        self.fetcher = fetcher
+        self.base_url = base_url
+        self.state = state
+        self.full = full
+        self.resumed = 0
+
+    async def parsed(self, url, kind, parse):
+        """(parsed page, state entry or None, response or None when resumed) for the www.shl.com `url`."""
+        entry = self.state.get(url) if self.state else None
+        if entry and not self.full and self.state.fetched_this_run(entry):
+            self.resumed += 1
+            return entry["parsed"], entry, None
+        headers = {} if self.full else ScrapeState.conditional_headers(entry)
+        response = await self.fetcher.get(rebase(url, self.base_url), headers)
+        if response.status_code == 304:
+            return entry["parsed"], entry, response
+        return parse(response.text), entry, response
+
+    def checkpoint(self, url, kind, parsed, entry, response, content_hash=None):
+        if self.state is None:
+            return
+        if response is None:  # resumed: only the record hash can have changed (new listing data)
+            if entry["content_hash"] == content_hash:
+                return
+            etag, last_modified = entry["etag"], entry["last_modified"]
+        elif response.status_code == 304:
+            etag = response.headers.get("ETag") or entry["etag"]
+            last_modified = response.headers.get("Last-Modified") or entry["last_modified"]
+        else:
+            etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+        self.state.put(url, kind, parsed, etag, last_modified, content_hash)
+
+
+async def scrape_listing(source, label, type_id, page_count, first_page_table=1):
+    """Rows of all listing pages, and whether every page could be read."""
+    print(f"{label} ({page_count} pages)")
+
+    async def page(i):
+        url = listing_url(SHL_BASE_URL, i * 12, type_id)
+        # On the first Individual Test Solutions page the pre-packaged table comes first.
+        table = first_page_table if i == 0 else 1
+        try:
+            rows, entry, response = await source.parsed(url, "listing", lambda text: extract_listing(text, url, table))
+            source.checkpoint(url, "listing", rows, entry, response)
+            return rows
+        except Exception as e:
+            entry = source.state.get(url) if source.state else None
+            stale = entry["parsed"] if entry else None
+            print(f"❌ Error on page {i+1}: {url}: {describe(e)}" + (" (keeping the last scraped rows)" if stale is not None else ""))
+            return stale
+
+    pages = await asyncio.gather(*(page(i) for i in range(page_count)))
+    return [row for rows in pages if rows for row in rows], all(rows is not None for rows in pages)
+
+
+async def scrape_links(source, prepackaged_pages=12, individual_pages=32):
+    """Product links per category, and whether every listing page could be read."""
+    (prepackaged, ok_prepackaged), (individual, ok_individual) = await asyncio.gather(
+        scrape_listing(source, "📘 Scraping Pre-packaged Job Solutions", 2, prepackaged_pages),
+        scrape_listing(source, "📗 Scraping Individual Test Solutions", 1, individual_pages, first_page_table=2),
+    )
+    return {
+        "pre_packaged_solutions": prepackaged,
+        "individual_test_solutions": individual,
+    }, ok_prepackaged and ok_individual
+
+
+async def scrape_details(source, product_data):
+    """Product records with their page details, per category.
+
+    A product whose page cannot be fetched keeps the last scraped details;
+    one that was never scraped is left out, so it is not published with
+    empty text, and is picked up as added by a later run.
+    """
+    total = sum(len(products) for products in product_data.values())
+    done = 0
+
+    async def details(product):
+        nonlocal done
+        product = dict(product)
+        if "test_types" in product:
+            product["test_types"] = map_test_types(product["test_types"])
+        link = product["link"]
+        try:
+            product_details, entry, response = await source.parsed(
+                link, "product", lambda text: extract_product_details(text, link)
+            )
+            product.update(product_details)
+            source.checkpoint(link, "product", product_details, entry, response, record_hash(product))
+        except Exception as e:
+            entry = source.state.get(link) if source.state else None
+            stale = entry and entry["parsed"]
+            print(f"❌ {link}: {describe(e)}" + (" (keeping the last scraped details)" if stale else " (left out)"))
+            if stale:
+                product.update(stale)
+            else:
+                product = None
+        done += 1
+        if done % 25 == 0 or done == total:
+            print(f"[{done}/{total}] product pages scraped")
+        return product
+
+    results = {}
+    for category, products in product_data.items():
+        results[category] = [p for p in await asyncio.gather(*(details(p) for p in products)) if p is not None]
+    return results
+
+
+def write_json(data, path):
+    # Replaced in one step: a crash never leaves a half-written file behind.
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+async def run(args):
+    fetcher = Fetcher(args.concurrency, args.rate, args.retries, args.timeout, args.save_fixtures)
+    state = None if args.no_state else ScrapeState(args.state or os.path.join(args.out_dir, "scrape_state.sqlite"))
+    if state is not None and state.begin_run(resume=not args.restart):
+        print(f"↩️ Resuming the run started {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(state.run_started))}")
+    source = PageSource(fetcher, args.base_url.rstrip("/"), state, args.full)
+    links_path = os.path.join(args.out_dir, "shl_product_links_final.json")
+    details_path = os.path.join(args.out_dir, "shl_product_details_full.json")
+    changes_path = os.path.join(args.out_dir, "shl_product_changes.json")
+    started = time.perf_counter()
+    complete = True
+    try:
+        if args.stage in ("links", "all"):
+            product_data, complete = await scrape_links(source, args.prepackaged_pages, args.individual_pages)
+            write_json(product_data, links_path)
+            print(f"✅ {sum(map(len, product_data.values()))} products saved to '{links_path}'")
+        else:
+            with open(links_path, "r", encoding="utf-8") as f:
+                product_data = json.load(f)
+        if args.stage in ("details", "all"):
+            scraped = await scrape_details(source, product_data)
+            write_json(scraped, details_path)
+            left_out = sum(map(len, product_data.values())) - sum(map(len, scraped.values()))
+            print(f"✅ Product details saved to '{details_path}'" + (f" ({left_out} never scraped, left out)" if left_out else ""))
+            # Products left out are not in this run's change set either.
+            product_data = scraped
+    finally:
+        await fetcher.close()
+    print(f"⏱️ {fetcher.requests} requests ({fetcher.not_modified} not modified, {fetcher.retried} retried, "
+          f"{source.resumed} pages resumed) in {time.perf_counter() - started:.1f}s")
+
+    if state is None or args.stage == "links":
+        return
+    if not complete:
+        # A missing listing page would look like removed products; finish the run on a later attempt.
+        print("⚠️ Some listing pages failed: no change set written. Re-run to resume.")
+        return
+    links = [p["link"] for products in product_data.values() for p in products]
+    changes = state.finish_run(links)
+    write_json({"created": time.strftime("%Y-%m-%dT%H:%M:%S%z"), **changes}, changes_path)
+    print(f"🧾 Changes: {len(changes['added'])} added, {len(changes['updated'])} updated, "
+          f"{len(changes['removed'])} removed, {changes['unchanged']} unchanged -> '{changes_path}'")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape the SHL product catalog over async HTTP.")
+    parser.add_argument("--stage", choices=["links", "details", "all"], default="all")
+    parser.add_argument("--base-url", default=SHL_BASE_URL, help="site root; point at fixture_server.py to run offline")
+    parser.add_argument("--prepackaged-pages", type=int, default=12)
+    parser.add_argument("--individual-pages", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight")
+    parser.add_argument("--rate", type=float, default=4.0, help="max requests per second per host (0 = unlimited)")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--out-dir", default=".")
+    parser.add_argument("--save-fixtures", metavar="DIR", help="also save every fetched page here, in fixture_server.py's layout")
+    parser.add_argument("--state", help="scrape state database (default: <out-dir>/scrape_state.sqlite)")
+    parser.add_argument("--no-state", action="store_true", help="fetch everything, keep no state, write no change set")
+    parser.add_argument("--full", action="store_true", help="refetch every page unconditionally (state and change set are still kept)")
+    parser.add_argument("--restart", action="store_true", help="start a new run instead of resuming an unfinished one")
+    asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# 📁 fixture_server.py — serve saved SHL catalog pages locally, for running fast_scraper.py offline
+#
+#   python fixture_server.py --port 8765                     # serves scraping/fixtures/
+#   python fixture_server.py --dir my_capture --latency 0.2  # pages captured with fast_scraper.py --save-fixtures
+#
+# URLs map to files as fixture_name() says: catalog listings to
+# catalog/type<T>_start<N>.html and product pages to products/<slug>.html.
+# Anything else is a 404, which the scraper reports like a failed page.
+# Responses carry ETag/Last-Modified and answer If-None-Match with 304.
+
+import os
+import time
+import hashlib
+import argparse
+import threading
+from email.utils import formatdate
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+CATALOG_PATH = "/solutions/products/product-catalog/"
+
+
+def fixture_name(url):
+    """Relative fixture path of a catalog listing or product page URL."""
+    parts = urlsplit(url)
+    if parts.path.startswith(CATALOG_PATH + "view/"):
+        slug = parts.path[len(CATALOG_PATH + "view/"):].strip("/").replace("/", "_")
+        return os.path.join("products", f"{slug}.html")
+    if parts.path.rstrip("/") == CATALOG_PATH.rstrip("/"):
+        query = parse_qs(parts.query)
+        return os.path.join("catalog", f"type{query.get('type', ['0'])[0]}_start{query.get('start', ['0'])[0]}.html")
+    return os.path.join("other", parts.path.strip("/").replace("/", "_") or "index") + ".html"
+
+
+def make_handler(directory, latency):
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+            path = os.path.join(directory, fixture_name(self.path))
+            if not os.path.isfile(path):
+                self.send_error(404, "No fixture for this page")
+                return
+            with open(path, "rb") as f:
+                body = f.read()
+            # Validators like a real web server's, so conditional requests can be exercised.
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            last_modified = formatdate(os.path.getmtime(path), usegmt=True)
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", last_modified)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return FixtureHandler
+
+
+def serve(directory=FIXTURES_DIR, port=0, latency=0.0):
+    """Start the server in a background thread; returns (server, base URL)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(directory, latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve saved SHL catalog pages.")
+    parser.add_argument("--dir", default=FIXTURES_DIR)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    args = parser.parse_args()
+    server, url = serve(args.dir, args.port, args.latency)
+    print(f"🗂️ Serving {args.dir} at {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
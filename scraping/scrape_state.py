@@ -0,0 +1,121 @@
+import json
+import time
+import sqlite3
+import hashlib
+
+
+def record_hash(record):
+    return hashlib.sha256(json.dumps(record, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class ScrapeState:
+    """Per-URL scrape state in SQLite, committed after every page.
+
+    For each listing or product page: the validators for conditional requests
+    (ETag, Last-Modified), the parsed result, the hash of the product record
+    built from it, and when it was fetched. `published_hash` is the hash as
+    of the last completed run, so the change set of the current run survives
+    a crash: a resumed run skips pages already fetched since the run started
+    and still reports every change relative to what downstream last saw.
+    """
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, kind TEXT NOT NULL, etag TEXT, last_modified TEXT, "
+            "parsed TEXT, content_hash TEXT, published_hash TEXT, fetched_at REAL)"
+        )
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.run_started = None
+
+    # === Runs ===
+    def _meta(self, key):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, items):
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", items)
+
+    def begin_run(self, resume=True):
+        """Start a run, or continue the unfinished one; returns True when resuming."""
+        started = self._meta("run_started")
+        if resume and started and self._meta("run_finished") != started:
+            self.run_started = float(started)
+            return True
+        self.run_started = time.time()
+        self._set_meta([("run_started", repr(self.run_started))])
+        return False
+
+    def finish_run(self, links):
+        """Compute the change set against the last finished run, then publish the current hashes."""
+        changes = self.change_set(links)
+        with self.db:
+            self.db.executemany(
+                "UPDATE pages SET published_hash = content_hash WHERE url = ?", [(link,) for link in links]
+            )
+            self.db.executemany("DELETE FROM pages WHERE url = ?", [(link,) for link in changes["removed"]])
+        self._set_meta([("run_finished", repr(self.run_started))])
+        return changes
+
+    # === Pages ===
+    def get(self, url):
+        row = self.db.execute(
+            "SELECT etag, last_modified, parsed, content_hash, fetched_at FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, parsed, content_hash, fetched_at = row
+        return {
+            "etag": etag,
+            "last_modified": last_modified,
+            "parsed": json.loads(parsed) if parsed else None,
+            "content_hash": content_hash,
+            "fetched_at": fetched_at,
+        }
+
+    def fetched_this_run(self, entry):
+        return entry is not None and self.run_started is not None and (entry["fetched_at"] or 0) >= self.run_started
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if entry and entry["parsed"] is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def put(self, url, kind, parsed, etag=None, last_modified=None, content_hash=None):
+        with self.db:
+            self.db.execute(
+                "INSERT INTO pages (url, kind, etag, last_modified, parsed, content_hash, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET kind = excluded.kind, etag = excluded.etag, "
+                "last_modified = excluded.last_modified, parsed = excluded.parsed, "
+                "content_hash = excluded.content_hash, fetched_at = excluded.fetched_at",
+                (url, kind, etag, last_modified, json.dumps(parsed, ensure_ascii=False), content_hash, time.time()),
+            )
+
+    def change_set(self, links):
+        """{"added", "updated", "removed", "unchanged"} product links relative to the last finished run."""
+        rows = dict(
+            (url, (content_hash, published_hash)) for url, content_hash, published_hash in self.db.execute(
+                "SELECT url, content_hash, published_hash FROM pages WHERE kind = 'product'"
+            )
+        )
+        current = set(links)
+        added, updated, unchanged = [], [], 0
+        for link in links:
+            content_hash, published_hash = rows.get(link, (None, None))
+            if published_hash is None:
+                added.append(link)
+            elif content_hash != published_hash:
+                updated.append(link)
+            else:
+                unchanged += 1
+        removed = sorted(url for url, (_, published) in rows.items() if published is not None and url not in current)
+        return {"added": added, "updated": updated, "removed": removed, "unchanged": unchanged}
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The backend runs from its own directory with flat imports (see the Procfile).
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
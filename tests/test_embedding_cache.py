@@ -0,0 +1,45 @@
+import asyncio
+
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+
+def vector(i, dim=4):
+    return np.full(dim, i, dtype="float32")
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = EmbeddingCache("model", 4, path=path)
+    cache.set("Java developer", vector(1))
+    cache.close()
+
+    reopened = EmbeddingCache("model", 4, path=path)
+    found = asyncio.run(reopened.get_many_async(["java   DEVELOPER", "python"]))
+    assert np.array_equal(found[0], vector(1))
+    assert found[1] is None
+    assert reopened.stats()["disk_hits"] == 1
+    assert reopened.stats()["misses"] == 1
+
+
+def test_disk_tier_is_wiped_for_another_model(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = EmbeddingCache("model", 4, path=path)
+    cache.set("java", vector(1))
+    cache.close()
+    assert asyncio.run(EmbeddingCache("other-model", 4, path=path).get_async("java")) is None
+
+
+def test_disk_tier_keeps_the_newest_rows(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = EmbeddingCache("model", 4, path=path, max_rows=3)
+    for i in range(5):
+        cache.set(f"query {i}", vector(i))
+        cache.flush()
+    cache.close()
+
+    reopened = EmbeddingCache("model", 4, path=path, max_rows=3)
+    assert reopened.db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] == 3
+    found = asyncio.run(reopened.get_many_async([f"query {i}" for i in range(5)]))
+    assert [v is not None for v in found] == [False, False, True, True, True]
@@ -0,0 +1,45 @@
+import json
+import os
+import sys
+
+from lxml import html
+
+# The scrapers run from scraping/ with flat imports, like the backend.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scraping"))
+import fast_scraper  # noqa: E402
+from fixture_server import serve  # noqa: E402
+
+
+def test_text_of_keeps_selenium_line_breaks():
+    element = html.fragment_fromstring("<div><p>  One  line.<br>Two\n  <b>words</b> </p><script>x()</script></div>")
+    assert fast_scraper.text_of(element) == "One line.\nTwo words"
+
+
+def test_rescrape_of_unchanged_site_is_all_not_modified(tmp_path, capsys):
+    server, base_url = serve()
+    argv = [
+        "--base-url", base_url, "--out-dir", str(tmp_path), "--rate", "0",
+        "--prepackaged-pages", "1", "--individual-pages", "2",
+    ]
+    try:
+        fast_scraper.main(argv)
+        with open(tmp_path / "shl_product_changes.json", "r", encoding="utf-8") as f:
+            first = json.load(f)
+        with open(tmp_path / "shl_product_details_full.json", "r", encoding="utf-8") as f:
+            products = json.load(f)
+        links = [p["link"] for category in products.values() for p in category]
+        assert links
+        assert sorted(first["added"]) == sorted(links)
+        assert first["updated"] == first["removed"] == [] and first["unchanged"] == 0
+        capsys.readouterr()
+
+        fast_scraper.main(argv)
+        with open(tmp_path / "shl_product_changes.json", "r", encoding="utf-8") as f:
+            second = json.load(f)
+        assert second["added"] == second["updated"] == second["removed"] == []
+        assert second["unchanged"] == len(links)
+        out = capsys.readouterr().out
+        requests = out.split("⏱️ ")[1].split(" requests")[0]
+        assert f"{requests} requests ({requests} not modified" in out
+    finally:
+        server.shutdown()
@@ -0,0 +1,28 @@
+import pytest
+
+from filters import parse_query_filters, parse_query_hints
+
+
+@pytest.mark.parametrize("query", [
+    "need a personality assessment for managers",
+    "skills test for java developers",
+    "adaptive team lead for a remote-first company",
+])
+def test_mentions_are_preferences_not_filters(query):
+    assert parse_query_filters(query) == {}
+    assert parse_query_hints(query)
+
+
+@pytest.mark.parametrize("query", [
+    "only personality tests please",
+    "personality tests only",
+    "just short personality assessments",
+])
+def test_stated_test_type_limits_are_filters(query):
+    assert parse_query_filters(query) == {"test_types": ["Personality & Behavior"]}
+
+
+def test_assessment_constraints_are_filters():
+    assert parse_query_filters("remote testing, adaptive tests, under 30 minutes") == {
+        "max_duration": 30, "remote": True, "adaptive": True,
+    }
@@ -0,0 +1,167 @@
+import asyncio
+
+import pytest
+
+from resilience import AttemptTimeout, CircuitBreaker, CircuitOpen, DeadlineExceeded, RetryBudget, hedged, resilient_call
+
+
+class Flaky(Exception):
+    pass
+
+
+def failing():
+    async def attempt():
+        raise Flaky("503")
+    return attempt
+
+
+def test_breaker_opens_half_opens_and_closes(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("resilience.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker("test", failures=2, reset_after=30)
+    for _ in range(2):
+        assert breaker.allow() == "call"
+        breaker.failure()
+    assert breaker.state == breaker.OPEN
+    assert breaker.allow() is None
+
+    now[0] += 30
+    assert breaker.allow() == "probe"
+    assert breaker.state == breaker.HALF_OPEN
+    assert breaker.allow() is None  # only one probe at a time
+    breaker.success()
+    assert breaker.state == breaker.CLOSED
+    assert breaker.allow() == "call"
+
+
+def test_failed_probe_reopens(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("resilience.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker("test", failures=1, reset_after=10)
+    breaker.failure()
+    now[0] += 10
+    assert breaker.allow() == "probe"
+    breaker.failure()
+    assert breaker.state == breaker.OPEN
+    assert breaker.allow() is None
+    assert breaker.opened == 2
+
+
+def test_open_breaker_fails_fast():
+    breaker = CircuitBreaker("test", failures=1)
+    breaker.failure()
+    calls = 0
+
+    async def attempt():
+        nonlocal calls
+        calls += 1
+
+    with pytest.raises(CircuitOpen):
+        asyncio.run(resilient_call("test", attempt, breaker, RetryBudget(), 1.0, 1.0))
+    assert calls == 0
+
+
+def test_retry_budget_exhaustion_stops_retries(monkeypatch):
+    monkeypatch.setattr("resilience.backoff", lambda n: 0)
+    budget = RetryBudget(ratio=0.0, reserve=2)
+    breaker = CircuitBreaker("test", failures=100)
+    calls = 0
+
+    async def attempt():
+        nonlocal calls
+        calls += 1
+        raise Flaky("503")
+
+    with pytest.raises(Flaky):
+        asyncio.run(resilient_call("test", attempt, breaker, budget, 5.0, 1.0, retries=5))
+    assert calls == 3  # the first try and the two retries the reserve paid for
+    assert budget.tokens == 0
+    assert breaker.consecutive == 1
+
+
+def test_non_retryable_errors_are_not_retried_and_keep_the_breaker_closed():
+    breaker = CircuitBreaker("test", failures=1)
+    budget = RetryBudget()
+    with pytest.raises(Flaky):
+        asyncio.run(resilient_call("test", failing(), breaker, budget, 5.0, 1.0, retries=3, retryable=lambda e: False))
+    assert breaker.state == breaker.CLOSED
+    assert budget.tokens == budget.reserve
+
+
+def test_attempt_timeout_is_not_an_asyncio_timeout():
+    async def slow():
+        await asyncio.sleep(1)
+
+    breaker = CircuitBreaker("test", failures=1)
+    with pytest.raises(AttemptTimeout) as raised:
+        asyncio.run(resilient_call("test", slow, breaker, RetryBudget(), 5.0, 0.01))
+    assert not isinstance(raised.value, (asyncio.TimeoutError, DeadlineExceeded))
+    assert breaker.state == breaker.OPEN
+
+
+def test_deadline_below_the_attempt_timeout_still_counts_against_the_breaker():
+    async def slow():
+        await asyncio.sleep(1)
+
+    breaker = CircuitBreaker("test", failures=1)
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(resilient_call("test", slow, breaker, RetryBudget(), 0.02, 15.0, retries=1))
+    assert breaker.state == breaker.OPEN
+
+
+def test_hedge_wins_and_cancels_the_slow_attempt():
+    started, cancelled = [], []
+
+    async def attempt():
+        n = len(started)
+        started.append(n)
+        try:
+            await asyncio.sleep(1.0 if n == 0 else 0.01)
+            return n
+        except asyncio.CancelledError:
+            cancelled.append(n)
+            raise
+
+    async def main():
+        result = await hedged("test", attempt, 0.02, RetryBudget())
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(main()) == 1
+    assert started == [0, 1]
+    assert cancelled == [0]
+
+
+def test_hedge_needs_budget():
+    started = []
+
+    async def attempt():
+        started.append(len(started))
+        await asyncio.sleep(0.05)
+        return "first"
+
+    budget = RetryBudget(reserve=0)
+    assert asyncio.run(hedged("test", attempt, 0.01, budget)) == "first"
+    assert started == [0]
+
+
+def test_cancelling_the_caller_cancels_both_attempts():
+    cancelled = []
+
+    async def attempt():
+        try:
+            await asyncio.sleep(1.0)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def main():
+        task = asyncio.ensure_future(hedged("test", attempt, 0.01, RetryBudget()))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+    assert cancelled == [True, True]
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+from upstream import _count
+
+
+def test_concurrent_identical_calls_share_one_computation():
+    flight = SingleFlight()
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        _count("gemini")
+        await asyncio.sleep(0.05)
+        return ["answer"]
+
+    async def main():
+        return await asyncio.gather(*(flight.do("java developer", compute) for _ in range(10)))
+
+    results = asyncio.run(main())
+    assert calls == 1
+    assert [result for result, _ in results] == [["answer"]] * 10
+    assert sorted(shared for _, shared in results) == [False] + [True] * 9
+    assert flight.stats() == {"leaders": 1, "followers": 9, "in_flight": 0}
+
+
+def test_exception_reaches_every_waiter():
+    flight = SingleFlight()
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        raise RuntimeError("upstream down")
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", compute) for _ in range(5)), return_exceptions=True)
+
+    errors = asyncio.run(main())
+    assert calls == 1
+    assert all(isinstance(e, RuntimeError) and str(e) == "upstream down" for e in errors)
+
+
+def test_key_is_released_after_the_flight_lands():
+    flight = SingleFlight()
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise RuntimeError("first call fails")
+        return calls
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            await flight.do("key", compute)
+        assert flight.stats()["in_flight"] == 0
+        return await flight.do("key", compute)
+
+    assert asyncio.run(main()) == (2, False)
+    assert calls == 2
+
+
+def test_cancelled_follower_does_not_cancel_the_flight():
+    flight = SingleFlight()
+
+    async def compute():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do("key", compute))
+        follower = asyncio.ensure_future(flight.do("key", compute))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        return await leader
+
+    assert asyncio.run(main()) == ("done", False)
@@ -0,0 +1,42 @@
+from types import SimpleNamespace
+
+import pytest
+
+from spell import SpellIndex
+from recommender import SHLRecommender
+
+TEXTS = [
+    "Candidates must scale their solutions; sift through logs.",
+    "Java 8 for programmers. Java frameworks and Java programmers must know SQL.",
+    "Leadership and communication skills for managers; soft skills and leadership at scale.",
+]
+
+
+@pytest.fixture
+def speller():
+    return SpellIndex.from_texts(TEXTS)
+
+
+@pytest.mark.parametrize("word", ["Rust", "Scala", "Swift", "programmer"])
+def test_known_words_are_not_corrected(speller, word):
+    assert speller.correct(f"{word} developer") == (f"{word} developer", {})
+
+
+@pytest.mark.parametrize("typo, fix", [("Jva", "java"), ("javva", "java"), ("leadrship", "leadership"), ("skils", "skills")])
+def test_typos_are_corrected(speller, typo, fix):
+    text, corrections = speller.correct(f"{typo} test")
+    assert corrections == {typo: fix}
+    assert text == f"{fix} test"
+
+
+def test_rare_words_do_not_attract_typos():
+    speller = SpellIndex.from_texts(["sift", "sift", "shift"])
+    assert speller.correct("shfit") == ("shfit", {})
+
+
+def test_corrections_are_extra_bm25_terms(speller):
+    recommender = SHLRecommender.__new__(SHLRecommender)
+    recommender.spell_correction, recommender.spell_threshold = True, 0.75
+    bundle = SimpleNamespace(speller=speller)
+    assert recommender._spell("Jva and Rust", bundle) == ("Jva and Rust java", {"Jva": "java"})
+    assert recommender._spell("Rust", bundle) == ("Rust", {})